@@ -1,20 +1,18 @@
+from .utils import startup # imported first so the start-up timeline covers every other import.
 from PySide6.QtWidgets import (
     QMainWindow, QApplication, QWidget, QGridLayout,
     QLabel, QStackedLayout, QStyleFactory,
     QSizePolicy,
 )
 from PySide6.QtGui import QIcon, QPixmap
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, Signal
 import qasync
 import asyncio
-import matplotlib.pyplot as plt
-import at
 import signal
 import sys
 import os
 import time
 import psutil
-from cpuinfo import get_cpu_info
 import subprocess
 from datetime import datetime
 from pathlib import Path
@@ -22,8 +20,7 @@ from threading import Thread
 import faulthandler
 faulthandler.enable()
 import shutil
-import matplotlib
-import matplotlib.pyplot as plt
+from importlib.metadata import version
 from .inspector import Inspector
 from .ui.workspace import Workspace
 from .lattice.latticeglobal import LatticeGlobal
@@ -31,42 +28,40 @@ from .lattice import latticeutils
 from .utils.entity import Entity
 from .utils import memory
 from .utils.commands import ConnectShortcuts, Save, StopAllActions
+from .utils.multiprocessing import GetWorkerPool
 from .utils.resourcemonitor import ResourceMonitor
 from .utils.load import Load
 from . import style
 from . import shared
 
-plt.rcParams['font.size'] = 10 # Define the font size for plots.
-if shutil.which('latex') is not None:
-    plt.rcParams['text.usetex'] = True
-else:
-    plt.rcParams['text.usetex'] = False
+def ConfigurePlots():
+    '''Applies the app's plot settings. Registered as a start-up import hook so it runs once, when matplotlib is first imported for a figure.'''
+    import matplotlib
+    import matplotlib.style
+    matplotlib.style.use('fast')
+    matplotlib.rcParams['font.size'] = 10 # Define the font size for plots.
+    matplotlib.rcParams['text.usetex'] = shutil.which('latex') is not None
+startup.importHooks['matplotlib'] = ConfigurePlots
 cwd = str(Path.cwd().resolve()) # Get the current working directory.
+startup.Record('Imports', 0, startup.Elapsed())
 signal.signal(signal.SIGINT, signal.SIG_DFL) # Allow Ctrl+C interrupt from terminal.
 
 class MainWindow(Entity, QMainWindow):
+    # set from background threads during deferred initialisation.
+    titleSignal = Signal(str)
+    CPUSignal = Signal(str)
+
     def __init__(self, latticeName = ''):
         super().__init__(name = 'MainWindow', type = 'MainWindow')
         settingsPath = os.path.join(shared.cwd, 'config', 'settings.yaml')
         shared.window = self
-        appPth = Path(__file__).resolve().parent
-        appVersion = subprocess.run(
-            ['git', 'describe', '--tags', '--always'],
-            cwd = appPth,
-            capture_output = True,
-            text = True,
-        )
-        commitDateAndTime = subprocess.run(
-            ['git', 'show', '-s', '--format=%cd', '--date=iso'],
-            cwd = appPth,
-            capture_output = True,
-            text = True,
-        )
-        dt = datetime.fromisoformat(commitDateAndTime.stdout.strip())
-        self.setWindowTitle(f'{shared.windowTitle} - commit {appVersion.stdout.strip()} - {dt.strftime('%Y/%m/%d')} at {dt.strftime('%H:%M:%S')}')
+        # the commit shown in the title is looked up once the editor is interactive.
+        self.setWindowTitle(shared.windowTitle)
+        self.titleSignal.connect(self.setWindowTitle)
         self.setWindowIcon(QIcon(f'{cwd}\\pipelines\\\\gfx\\icon.png'))
         self.quitShortcutPressed = False
         # Create a compressed folder for commonly referenced frames if it doesn't already exist (first time setup).
+        phaseStart = startup.Elapsed()
         compressedFolderPath = os.path.join(shared.cwd, 'gfx\\compressed')
         if not os.path.exists(compressedFolderPath):
             print('There are no existing compressed frames. Compressing and storing them inside the \\gfx\\ folder (first time setup).')
@@ -105,6 +100,7 @@ class MainWindow(Entity, QMainWindow):
             for _ in range(shared.runningCircleNumFrames):
                 shared.runningCircleFrames[_] = QPixmap(os.path.join(defaultRunningCirclePath, f'{_}.png'))
             print(f'Finished loading compressed frames in {time.time() - t:.3f} seconds.')
+        startup.Record('Compress and load running circle frames', phaseStart, startup.Elapsed())
         # Create a folder for saving data held in blocks (not sessions)
         dataDumpPath = os.path.join(shared.cwd, 'datadump')
         if not os.path.exists(dataDumpPath):
@@ -117,6 +113,7 @@ class MainWindow(Entity, QMainWindow):
             print(f'Lattice save folder \'lattice-saves\' does not exist, creating one. Any custom lattice files should be stored here.')
             os.mkdir(shared.latticePath)
             (Path(shared.latticePath) / '.gitignore').write_text('# Store any custom .mat lattice files in this folder.')
+        phaseStart = startup.Elapsed()
         if shared.elements is None:
             formattedLatticePath = Path(shared.latticePath)
             fullPathName = ''
@@ -136,7 +133,9 @@ class MainWindow(Entity, QMainWindow):
                         shared.lattice = latticeutils.LoadLattice(files[0])
                         fullPathName = files[0]
                 shared.latticePath = fullPathName
-                shared.elements = latticeutils.GetLatticeInfo(shared.lattice)
+                startup.Record('LoadLattice', phaseStart, startup.Elapsed())
+                with startup.Phase('GetLatticeInfo'):
+                    shared.elements = latticeutils.GetLatticeInfo(shared.lattice)
                 shared.names = [a + f' [{shared.elements.Type[b]}] (Index: {str(b)}) @ {shared.elements['s (m)'].iloc[b]:.2f} m' for a, b in zip(shared.elements.Name, shared.elements.Index)]
             else:
                 print('No saved lattices found.')
@@ -190,9 +189,12 @@ class MainWindow(Entity, QMainWindow):
         # Does a save file already exist?
         if len(shared.entities) == 1: # no
             # Instantiate the main app components - lattice, editor, inspector, controls, objectives, settings
-            self.workspace = Workspace(self)
-            self.latticeGlobal = LatticeGlobal(self)
-            self.inspector = Inspector(self)
+            with startup.Phase('Build workspace'):
+                self.workspace = Workspace(self)
+            with startup.Phase('Build LatticeGlobal scene'):
+                self.latticeGlobal = LatticeGlobal(self)
+            with startup.Phase('Build inspector'):
+                self.inspector = Inspector(self)
         shared.lightModeOn = True
         # connect key shortcuts to their functions.
         ConnectShortcuts()
@@ -204,13 +206,11 @@ class MainWindow(Entity, QMainWindow):
         quickSettings.setLayout(QGridLayout())
         quickSettings.layout().setContentsMargins(0, 0, 0, 0)
         quickSettings.layout().setSpacing(1)
-        self.physicsEngine = QLabel(f'Physics Engine:\tPyAT {at.__version__} (Python Accelerator Toolbox)')
+        self.physicsEngine = QLabel(f'Physics Engine:\tPyAT {version('accelerator-toolbox')} (Python Accelerator Toolbox)')
         self.physicsEngine.setFixedHeight(20)
         quickSettings.layout().addWidget(self.physicsEngine, 0, 0, 1, 1)
-        self.CPU = get_cpu_info()['brand_raw']
-        if 'processor' in self.CPU.lower():
-            self.CPU = ' '.join(self.CPU.split(' ')[:-2])
-        self.CPUName = QLabel(f'CPU:\t\t{self.CPU}')
+        self.CPUName = QLabel('CPU:\t\t')
+        self.CPUSignal.connect(self.CPUName.setText)
         self.CPUName.setFixedHeight(20)
         self.CPUName.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         quickSettings.layout().addWidget(self.CPUName, 1, 0, 1, 1)
@@ -266,7 +266,46 @@ class MainWindow(Entity, QMainWindow):
         def DisplayWindow():
             self.setWindowOpacity(1)
             self.setEnabled(True)
+            startup.Mark('Editor interactive')
+            self.DeferredInitialisation()
         QTimer.singleShot(1500, lambda: DisplayWindow())
+
+    def DeferredInitialisation(self):
+        '''Work not needed for the editor to be usable, run in the background once it is interactive.'''
+        startup.RunDeferred(self.FetchAppVersion, name = 'Fetch app version')
+        startup.RunDeferred(self.FetchCPUName, name = 'Fetch CPU name')
+        # spawn the warm worker pool so the first action started does not wait on it.
+        startup.RunDeferred(GetWorkerPool().Start, name = 'Start worker pool')
+        # the optimisation stack is only needed by GP blocks, import it now rather than when the first one starts.
+        startup.Preload()
+
+    def FetchAppVersion(self):
+        appPth = Path(__file__).resolve().parent
+        try:
+            appVersion = subprocess.run(
+                ['git', 'describe', '--tags', '--always'],
+                cwd = appPth,
+                capture_output = True,
+                text = True,
+            )
+            commitDateAndTime = subprocess.run(
+                ['git', 'show', '-s', '--format=%cd', '--date=iso'],
+                cwd = appPth,
+                capture_output = True,
+                text = True,
+            )
+            dt = datetime.fromisoformat(commitDateAndTime.stdout.strip())
+        except Exception as e:
+            print(f'Unable to fetch the app version: {e}')
+            return
+        self.titleSignal.emit(f'{shared.windowTitle} - commit {appVersion.stdout.strip()} - {dt.strftime('%Y/%m/%d')} at {dt.strftime('%H:%M:%S')}')
+
+    def FetchCPUName(self):
+        from cpuinfo import get_cpu_info
+        self.CPU = get_cpu_info()['brand_raw']
+        if 'processor' in self.CPU.lower():
+            self.CPU = ' '.join(self.CPU.split(' ')[:-2])
+        self.CPUSignal.emit(f'CPU:\t\t{self.CPU}')
     
     async def ConfigureLoop(self):
         # Setup an event loop to handle asynchronous PV I/O without blocking the UI thread.
@@ -295,14 +334,32 @@ class MainWindow(Entity, QMainWindow):
         shared.stopCleanUpTimer = True
         self.resourceMonitor.stopEvent.set()
         StopAllActions()
+        GetWorkerPool().Shutdown()
         if not self.quitShortcutPressed:
             Save()
         if hasattr(self, 'future') and self.future and not self.future.done():
             self.future.cancel()
 
+def ParseWorkerPoolArguments(args: list) -> list:
+    '''Sets `shared.workerPoolSize` and `shared.workerPoolIdleTimeout` from `--worker-pool-size=N` and `--worker-pool-idle-timeout=S`,
+    returning the remaining command line arguments.'''
+    flags = {
+        '--worker-pool-size': ('workerPoolSize', int),
+        '--worker-pool-idle-timeout': ('workerPoolIdleTimeout', float),
+    }
+    remaining = []
+    for arg in args:
+        flag, _, value = arg.partition('=')
+        if flag in flags and value != '':
+            name, valueType = flags[flag]
+            setattr(shared, name, valueType(value))
+        else:
+            remaining.append(arg)
+    return remaining
+
 if __name__ == "__main__":
     shared.app = QApplication(sys.argv)
     shared.app.setStyle(QStyleFactory.create('Fusion'))
     # skip first arg which is app name.
-    window = MainWindow(*sys.argv[1:])
+    window = MainWindow(*ParseWorkerPoolArguments(sys.argv[1:]))
     qasync.run(window.ConfigureLoop())
\ No newline at end of file
@@ -1,5 +1,3 @@
-from PySide6.QtCore import QTimer
-from copy import deepcopy
 import numpy as np
 from ..utils.multiprocessing import *
 from ..simulator import Simulator
@@ -9,14 +7,14 @@ class Action:
     # action block types - these trigger shared memory creation by downstream blocks when propagating up the heirarchy
     actionBlockTypes = ['Single Task GP', 'ORM', 'SVD']
     
-    def __init__(self, parent, pollUpstreamRate = 5):
+    def __init__(self, parent):
         super().__init__()
-        # Get a copy of the shared lattice to play with.
-        self.lattice = deepcopy(shared.lattice)
+        # Deliberately the live lattice rather than a copy. In the main process the action only reads it, to check inputs and to build the
+        # reference handed to workers by `ShareLattice`, so it must see the latest values set by the user. Everything that modifies the
+        # lattice (`SweepCorrector`, `UpdateLinkedElement`) runs on the private copy that `__setstate__` rebuilds with `AttachLattice`.
+        self.lattice = shared.lattice
         # Instantiate a simulator.
         self.simulator = Simulator()
-        self.pollUpstreamRate = pollUpstreamRate
-        self.timeBetweenPolls = 1 / pollUpstreamRate * 1e3 # in ms
         self.dependentsResult:list = [] # store the data from reading dependents
         self.resultsWritten:bool = False
         self.independentsSet:bool = False
@@ -30,8 +28,8 @@ class Action:
     def __setstate__(self, state):
         pass
 
-    def SetIndependents(self, independents:dict, targets:dict):
-        '''Sets all independent input variables to the block before performing an action and waits for them to finish.\n
+    def SetIndependents(self, independents:dict, targets:dict, callback = None):
+        '''Sets all independent input variables to the block before performing an action and calls `callback()` on the main thread once they are set.\n
         `independents` is a dict of streams generated from incoming decision variables of the form { ID: stream }.\n
         `targets` is a dict with setpoints for the independents, of the form { \'ID\': **int/float**, ... }\n
         if `online` is True, PV names are used instead of linked idxs.'''
@@ -45,31 +43,32 @@ class Action:
             # transform the setpoints to respect the limits of the decision variables
             setpoints = lims[:, 0] + rng * .5 * (1 + np.tanh(setpoints))
             shared.entities[ID].Start(setpoints = setpoints)
-        
-        def WaitUntilInputsSet():
-            for stream in independents.values():
-                if np.isinf(stream['data']).any():
-                    return QTimer.singleShot(self.timeBetweenPolls, WaitUntilInputsSet)
+
+        def InputsSet():
             self.resultsWritten = True
-        WaitUntilInputsSet()
+            if callback is not None:
+                callback()
+        # Imported here so offline actions and headless runs do not pull in Qt, entities have already created the dispatcher on the main thread.
+        from ..utils import completion
+        completion.WhenReady([shared.entities[ID] for ID in independents], InputsSet)
 
-    async def ReadDependents(self, dependents:list[dict], actionData:np.ndarray = np.array([])) -> np.ndarray:
-        '''Records the values of incoming outputs linked to the block and waits for them to finish.\n
+    def ReadDependents(self, dependents:list[dict], actionData:np.ndarray = np.array([]), callback = None):
+        '''Records the values of incoming outputs linked to the block and calls `callback()` on the main thread once they have all written their data.\n
         `dependents` is a list of dicts generated during pickling of block data by the action, of the form [ { \'ID\': **ID**, \'stream\': **stream** }, ... ]\n
         `actionData` is a numpy array holding data generated after running the action, from which the objectives can be extracted.'''
-
         self.resultsWritten = False
-        for d in dependents:
-            await shared.entities[d['ID']].Start(downstreamData = actionData) # blindly start all inputs for now ...
+        entities = [shared.entities[d['ID']] for d in dependents]
+        for e in entities:
+            e.Start(downstreamData = actionData) # blindly start all inputs for now ...
 
-        # wait for dependents that have been run to finish -- needs more work to be error aware
-        def CheckDependentsRunning():
-            for d in dependents:
-                if np.isinf(shared.entities[d['ID']].data[1]).any():
-                    return QTimer.singleShot(self.timeBetweenPolls, CheckDependentsRunning)
+        # needs more work to be error aware
+        def DependentsRead():
             self.resultsWritten = True
-        CheckDependentsRunning()
-        print(f'{self.parent.name} is done running dependents!')
+            print(f'{self.parent.name} is done running dependents!')
+            if callback is not None:
+                callback()
+        from ..utils import completion
+        completion.WhenReady(entities, DependentsRead)
 
     def UpdateLinkedElement(self, elementInfo:dict, value:float):
         '''`elementInfo` is a dict containing a linked index `linkedIdx` and any other information relevant to the update.'''
@@ -1,13 +1,15 @@
-import at
-from at import lattice_pass
 import numpy as np
 import time
-from copy import deepcopy
+import multiprocessing as mp
 from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.connection import wait
 from ..action import Action
-from ...simulator import Simulator
+from ...simulator import Simulator, GetBeam, ShareLattice, AttachLattice
+from ...utils import startup
 from ... import shared
 
+at = startup.Lazy('at')
+
 class OrbitResponseAction(Action):
     '''Perform, manipulate and save orbit response measurements.'''
     def __init__(self, parent):
@@ -20,7 +22,7 @@ class OrbitResponseAction(Action):
 
     def __getstate__(self):
         return {
-            'lattice': self.lattice,
+            'lattice': ShareLattice(self.lattice),
             'BPMs': [
                 { 
                     'name': b.name,
@@ -43,7 +45,8 @@ class OrbitResponseAction(Action):
         }
 
     def __setstate__(self, state):
-        self.lattice = state['lattice']
+        self.latticeReference = state['lattice']
+        self.lattice = AttachLattice(self.latticeReference)
         self.BPMs = state['BPMs']
         self.correctors = state['correctors']
         self.simulator = Simulator()    
@@ -79,6 +82,11 @@ class OrbitResponseAction(Action):
         stepKick = kwargs.get('stepKick')
         repeats = kwargs.get('repeats')
         numParticles = kwargs.get('numParticles', 10000)
+        # 'Single pass' tracks once per step and reads every BPM from that pass, 'Per BPM' tracks a fresh pass for each BPM.
+        singlePass = kwargs.get('trackingMode', 'Single pass') == 'Single pass'
+        # 'Analytic' uses linear transfer matrices, 'Single-particle' tracks the central trajectory, 'Macro-particle' tracks a full beam.
+        engine = kwargs.get('engine', 'Macro-particle')
+        progress = kwargs.get('progress', None)
         sharedMemory = SharedMemory(name = sharedMemoryName)
         data = np.ndarray(shape, dtype, buffer = sharedMemory.buf)
         numBPMs = len(self.BPMs)
@@ -86,43 +94,76 @@ class OrbitResponseAction(Action):
         offset = int(numSteps / 2)
         kicks = (np.arange(0, numSteps, 1) - offset) * stepKick
         try:
-            # twiss in values for the LTB
-            # sigmaMat = at.sigma_matrix(betax = 3.731, betay = 2.128, alphax = -.0547, alphay = -.1263, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
-            # twiss in values for the BTS
-            sigmaMat = at.sigma_matrix(betax = 12.13, betay = 2.94, alphax = -2.92, alphay = .75, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
-            beam = at.beam(numParticles, sigmaMat)
-            counter = 0
+            if engine == 'Analytic':
+                ORM = self.AnalyticResponse(progress)
+                # Raw data holds the predicted centres (m) so downstream blocks see the same layout as a tracked measurement.
+                defaults = np.array([c['default'] for c in self.correctors])
+                data[:] = (ORM[:, :, None] * 1e-3 * (defaults[None, :, None] + kicks[None, None, :]))[..., None]
+                self.WriteORM(ORM,
+                    kwargs.get('postProcessedSharedMemoryName'),
+                    kwargs.get('postProcessedShape'),
+                    kwargs.get('postProcessedDType'),
+                )
+                if kwargs.get('uncertaintySharedMemoryName', None) is not None:
+                    # The linear model is exact so there is no fit uncertainty.
+                    self.WriteORM(np.zeros_like(ORM), kwargs.get('uncertaintySharedMemoryName'), kwargs.get('uncertaintyShape'), kwargs.get('uncertaintyDType'))
+                sharedMemory.close()
+                return
+            if engine == 'Single-particle':
+                # A single on-axis particle follows the central trajectory, so repeats are identical.
+                beam = np.zeros((6, 1))
+            else:
+                # twiss in values for the LTB
+                # sigmaMat = at.sigma_matrix(betax = 3.731, betay = 2.128, alphax = -.0547, alphay = -.1263, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
+                # twiss in values for the BTS
+                inputTwiss = dict(betax = 12.13, betay = 2.94, alphax = -2.92, alphay = .75, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
+                beam = GetBeam(inputTwiss, numParticles, kwargs.get('seed', None))
+            ctx = mp.get_context('spawn')
+            counter = ctx.Value('i', 0) # readings taken so far, shared across pool workers.
             totalSteps = numCorrectors * numBPMs * numSteps * repeats
-            for col, c in enumerate(self.correctors):
-                idx = 1 if c['alignment'] == 'Vertical' else 0
-                for _, k in enumerate(kicks):
-                    kickAngle = 1e-3 * (c['default'] + k) # convert the kick target value from mrad to rad.
-                    # Should errors be applied to the value? ---- this will be added in a future version.
-                    self.lattice[c['index']].KickAngle[idx] = kickAngle
-                    for row, b in enumerate(self.BPMs):
-                        BPMIdx = b['index']
-                        for r in range(repeats):
-                            beamOut = lattice_pass(self.lattice, deepcopy(beam), nturns = 1, refpts = np.array([BPMIdx])) # has shape 6 x numParticles x numRefpts x nturns
-                            centre = np.mean(beamOut[0, :, 0, 0]) if b['alignment'] == 'Horizontal' else np.mean(beamOut[2, :, 0, 0])
-                            data[row, col, _, r] = centre
-                            # print(f'On step {counter} / {totalSteps}', end = '\r', flush = True)
-                            counter += 1
-                            # check for interrupts
-                            while pause.is_set():
-                                if stop.is_set():
-                                    sharedMemory.close()
-                                    return
-                                time.sleep(.1)
-                            if stop.is_set():
-                                sharedMemory.close()
-                                return
-                    # BPMs in the model are markers so we have the full phase space information but PVs will typically be separated into BPM:X, BPM:Y
-                    self.lattice[c['index']].KickAngle[idx] = 0
+            numWorkers = min(kwargs.get('numWorkers', 1), numCorrectors)
+            if numWorkers > 1:
+                # Each worker rebuilds its own lattice copy and sweeps an interleaved subset of correctors, writing its columns of `data`.
+                state = {'lattice': self.latticeReference, 'BPMs': self.BPMs, 'correctors': self.correctors}
+                # The caller's events may be thread events or belong to another start method, neither of which can be sent to a spawned process,
+                # so workers get spawn context events that are kept in step with the caller's while they run. Progress is relayed the same way.
+                workerPause, workerStop, workerError = ctx.Event(), ctx.Event(), ctx.Event()
+                workers = [
+                    ctx.Process(target = SweepWorker, args = (state, list(range(w, numCorrectors, numWorkers)), workerPause, workerStop, workerError, None, counter, totalSteps, sharedMemoryName, shape, dtype, beam, kicks, repeats, singlePass))
+                    for w in range(numWorkers)
+                ]
+                for w in workers:
+                    w.start()
+                while any(w.is_alive() for w in workers):
+                    workerPause.set() if pause.is_set() else workerPause.clear()
+                    if stop.is_set():
+                        workerStop.set()
+                    if progress is not None:
+                        progress.value = counter.value / totalSteps
+                    wait([w.sentinel for w in workers if w.is_alive()], timeout = .05)
+                for w in workers:
+                    w.join()
+                if progress is not None:
+                    progress.value = counter.value / totalSteps
+                if workerError.is_set() or any(w.exitcode != 0 for w in workers):
+                    error.set()
+                if stop.is_set() or error.is_set():
+                    sharedMemory.close()
+                    return
+            else:
+                for col in range(numCorrectors):
+                    if not self.SweepCorrector(col, data, beam, kicks, repeats, singlePass, pause, stop, progress, counter, totalSteps):
+                        sharedMemory.close()
+                        return
             # To be consistent with units, convert kicks to units of rad to get an orbit response in m / rad = mm / mrad.
-            self.Fit(data, kicks * 1e-3, numCorrectors, numBPMs,
+            self.Fit(data, kicks * 1e-3,
                 kwargs.get('postProcessedSharedMemoryName'),
                 kwargs.get('postProcessedShape'),
                 kwargs.get('postProcessedDType'),
+                order = 2 if kwargs.get('order', 'Linear') == 'Quadratic' else 1,
+                uncertaintySharedMemoryName = kwargs.get('uncertaintySharedMemoryName', None),
+                uncertaintyShape = kwargs.get('uncertaintyShape', None),
+                uncertaintyDType = kwargs.get('uncertaintyDType', None),
             )
             sharedMemory.close() # remove this process' access to the shared data array.
         except Exception as e:
@@ -131,14 +172,119 @@ class OrbitResponseAction(Action):
             print('An error occurred inside the ORM action, here it is:', f'{e}')
             return f'{e}; Is this is the correct lattice and have all correctors and BPMs been linked correctly?'
 
-    def Fit(self, data, kicks, numCorrectors, numBPMs, postProcessedSharedMemoryName, postProcessedShape, postProcessedDType):
-        '''Generates an Orbit Response Matrix using polyfit.'''
+    def SweepCorrector(self, col, data, beam, kicks, repeats, singlePass, pause, stop, progress, counter, totalSteps) -> bool:
+        '''Steps corrector `col` through `kicks`, writing BPM centres into column `col` of `data`. Returns False if the action was stopped.'''
+        c = self.correctors[col]
+        idx = 1 if c['alignment'] == 'Vertical' else 0
+        numBPMs = len(self.BPMs)
+        # BPMs can share a lattice element (e.g. X and Y readings of the same marker) so only track to unique indices.
+        BPMIdxs, refptIdxs = np.unique(np.array([b['index'] for b in self.BPMs]), return_inverse = True)
+        planes = np.array([0 if b['alignment'] == 'Horizontal' else 2 for b in self.BPMs])
+        for _, k in enumerate(kicks):
+            kickAngle = 1e-3 * (c['default'] + k) # convert the kick target value from mrad to rad.
+            # Should errors be applied to the value? ---- this will be added in a future version.
+            self.lattice[c['index']].KickAngle[idx] = kickAngle
+            if singlePass:
+                for r in range(repeats):
+                    beamOut = at.lattice_pass(self.lattice, beam.copy(order = 'F'), nturns = 1, refpts = BPMIdxs) # has shape 6 x numParticles x numRefpts x nturns
+                    centres = np.mean(beamOut[:, :, :, 0], axis = 1) # 6 x numRefpts
+                    data[:, col, _, r] = centres[planes, refptIdxs]
+                    self.UpdateProgress(progress, counter, numBPMs, totalSteps)
+                    if self.CheckForStop(pause, stop):
+                        return False
+            else:
+                for row, b in enumerate(self.BPMs):
+                    BPMIdx = b['index']
+                    for r in range(repeats):
+                        beamOut = at.lattice_pass(self.lattice, beam.copy(order = 'F'), nturns = 1, refpts = np.array([BPMIdx])) # has shape 6 x numParticles x numRefpts x nturns
+                        centre = np.mean(beamOut[0, :, 0, 0]) if b['alignment'] == 'Horizontal' else np.mean(beamOut[2, :, 0, 0])
+                        data[row, col, _, r] = centre
+                        self.UpdateProgress(progress, counter, 1, totalSteps)
+                        if self.CheckForStop(pause, stop):
+                            return False
+        # BPMs in the model are markers so we have the full phase space information but PVs will typically be separated into BPM:X, BPM:Y
+        self.lattice[c['index']].KickAngle[idx] = 0
+        return True
+
+    def UpdateProgress(self, progress, counter, numReadings, totalSteps):
+        with counter.get_lock():
+            counter.value += numReadings
+            if progress is not None:
+                progress.value = counter.value / totalSteps
+
+    def CheckForStop(self, pause, stop) -> bool:
+        '''Blocks while the action is paused. Returns True if the action has been stopped.'''
+        while pause.is_set():
+            if stop.is_set():
+                return True
+            time.sleep(.1)
+        return stop.is_set()
+
+    def AnalyticResponse(self, progress = None) -> np.ndarray:
+        '''Returns the linear orbit response (m / rad = mm / mrad) computed from the transfer matrices of the lattice about the zero trajectory.\n
+        `progress` is advanced once each corrector's column is built.'''
+        BPMIdxs = np.array([b['index'] for b in self.BPMs])
+        correctorExits = np.array([c['index'] + 1 for c in self.correctors])
+        refpts = np.unique(np.concatenate((BPMIdxs, correctorExits)))
+        _, ms = at.find_m66(self.lattice, refpts = refpts, orbit = np.zeros(6))
+        # Cumulative transfer matrices from the start of the lattice to each reference point.
+        M = dict(zip(refpts, ms))
+        ORM = np.zeros((len(self.BPMs), len(self.correctors)))
+        for col, c in enumerate(self.correctors):
+            kickIdx = 3 if c['alignment'] == 'Vertical' else 1
+            MInv = np.linalg.inv(M[c['index'] + 1])
+            # Thick correctors kick at their centre, so the kick has drifted half a length by the exit.
+            halfLength = .5 * self.lattice[c['index']].Length
+            for row, b in enumerate(self.BPMs):
+                # BPMs upstream of the corrector do not see its kick.
+                if b['index'] <= c['index']:
+                    continue
+                readIdx = 0 if b['alignment'] == 'Horizontal' else 2
+                R = M[b['index']] @ MInv
+                ORM[row, col] = R[readIdx, kickIdx] + halfLength * R[readIdx, kickIdx - 1]
+            if progress is not None:
+                progress.value = (col + 1) / len(self.correctors)
+        return ORM
+
+    def WriteORM(self, ORM, postProcessedSharedMemoryName, postProcessedShape, postProcessedDType):
+        '''Copies `ORM` into the named shared memory array.'''
         sharedMemory = SharedMemory(name = postProcessedSharedMemoryName)
         postProcessedData = np.ndarray(postProcessedShape, postProcessedDType, buffer = sharedMemory.buf)
-        dataAveragedOverRepeats = data.mean(axis = 3)
-        for col in range(numCorrectors):
-            for row in range(numBPMs):
-                y = dataAveragedOverRepeats[row, col, :]
-                m, C = np.polyfit(kicks, y, deg = 1, cov = True)
-                postProcessedData[row, col] = m[0]
-        sharedMemory.close() # remove this process' access to the shared ORM array.
\ No newline at end of file
+        postProcessedData[:] = ORM
+        sharedMemory.close() # remove this process' access to the shared ORM array.
+
+    def Fit(self, data, kicks, postProcessedSharedMemoryName, postProcessedShape, postProcessedDType, order = 1, uncertaintySharedMemoryName = None, uncertaintyShape = None, uncertaintyDType = None):
+        '''Generates an Orbit Response Matrix with a single batched least squares solve over every (BPM, corrector) pair.\n
+        `order` is the polynomial order of the fit (1 = linear, 2 = quadratic). The ORM is the linear coefficient, i.e. the response about the nominal setting.\n
+        Slope uncertainties (standard errors) are written to the uncertainty shared memory if one is provided.'''
+        dataAveragedOverRepeats = data.mean(axis = 3) # BPM x corrector x step
+        numBPMs, numCorrectors, numSteps = dataAveragedOverRepeats.shape
+        X = np.vander(kicks, order + 1, increasing = True) # step x coefficient
+        Y = dataAveragedOverRepeats.reshape(-1, numSteps).T # step x (BPM * corrector)
+        coefficients = np.linalg.lstsq(X, Y, rcond = None)[0]
+        self.WriteORM(coefficients[1].reshape(numBPMs, numCorrectors), postProcessedSharedMemoryName, postProcessedShape, postProcessedDType)
+        if uncertaintySharedMemoryName is None:
+            return
+        degreesOfFreedom = numSteps - (order + 1)
+        if degreesOfFreedom > 0:
+            residualVariance = ((Y - X @ coefficients) ** 2).sum(axis = 0) / degreesOfFreedom
+            uncertainties = np.sqrt(residualVariance * np.linalg.inv(X.T @ X)[1, 1])
+        else:
+            # An exact fit leaves no residuals to estimate the uncertainty from.
+            uncertainties = np.full(numBPMs * numCorrectors, np.nan)
+        self.WriteORM(uncertainties.reshape(numBPMs, numCorrectors), uncertaintySharedMemoryName, uncertaintyShape, uncertaintyDType)
+
+def SweepWorker(state, columns, pause, stop, error, progress, counter, totalSteps, sharedMemoryName, shape, dtype, beam, kicks, repeats, singlePass):
+    '''Process pool target for the ORM corrector sweep. Lives at module level so spawned processes can import it.'''
+    action = OrbitResponseAction.__new__(OrbitResponseAction)
+    action.__setstate__(state)
+    sharedMemory = SharedMemory(name = sharedMemoryName)
+    data = np.ndarray(shape, dtype, buffer = sharedMemory.buf)
+    try:
+        for col in columns:
+            if not action.SweepCorrector(col, data, beam, kicks, repeats, singlePass, pause, stop, progress, counter, totalSteps):
+                break
+    except Exception as e:
+        error.set()
+        print('An error occurred inside an ORM worker, here it is:', f'{e}')
+    sharedMemory.close()
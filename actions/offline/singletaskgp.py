@@ -2,7 +2,7 @@ import time
 import numpy as np
 from multiprocessing.shared_memory import SharedMemory
 from ..action import Action
-from ...simulator import Simulator
+from ...simulator import Simulator, ShareLattice, AttachLattice, ExtractObservables
 from ... import shared
 
 class SingleTaskGPAction(Action):
@@ -12,7 +12,7 @@ class SingleTaskGPAction(Action):
 
     def __getstate__(self):
         return {
-            'lattice': shared.lattice,
+            'lattice': ShareLattice(shared.lattice),
             'decisions': [
                 {
                     'name': d.settings['linkedElement'].Name,
@@ -34,20 +34,12 @@ class SingleTaskGPAction(Action):
         }
 
     def __setstate__(self, state):
-        self.lattice = state['lattice']
+        self.lattice = AttachLattice(state['lattice'])
         self.simulator = Simulator(lattice = self.lattice)
         self.decisions:list = state['decisions']
         self.objectives:list = state['objectives']
         self.numObjectives:int = len(state['objectives'])
         self.sharedMemoryCreated = False
-        self.computations = {
-            'CHARGE': self.GetCharge,
-            'X': self.GetX,
-            'Y': self.GetY,
-            'XP': self.GetXP,
-            'YP': self.GetYP,
-            'SURVIVAL_RATE': self.GetSurvivalRate,
-        }
     
     def CheckForValidInputs(self):
         # Have both correctors AND BPMs been suppled?
@@ -83,29 +75,6 @@ class SingleTaskGPAction(Action):
         print('All decision variables and objectives are linked to lattice elements.')
         return True
     
-    def GetCharge(self, tracking, index):
-        '''Returns charge at an element in units of fundamental charge, q.'''
-        return np.sum(np.where(np.any(np.isnan(tracking[:, :, index, 0]), axis = 0), False, True))
-
-    def GetX(self, tracking, index):
-        '''Returns the centroid of the beam in the horizontal axis at an element.'''
-        return np.nanmean(tracking[0, :, index, 0])
-
-    def GetY(self, tracking, index):
-        '''Returns the centroid of the beam in the vertical axis at an element.'''
-        return np.nanmean(tracking[2, :, index, 0])
-
-    def GetXP(self, tracking, index):
-        '''Returns the horizontal momentum of the beam at an element.'''
-        return np.nanmean(tracking[1, :, index, 0])
-
-    def GetYP(self, tracking, index):
-        '''Returns the vertical momentum of the beam at an element.'''
-        return np.nanmean(tracking[3, :, index, 0])
-    
-    def GetSurvivalRate(self, tracking, index):
-        return np.sum(np.where(np.any(np.isnan(tracking[:, :, index, 0]), axis = 0), False, True)) / self.numParticles
-
     def Run(self, pause, stop, error, progress, sharedMemoryName, shape, dtype, **kwargs):
         
         '''Action does this:
@@ -114,8 +83,7 @@ class SingleTaskGPAction(Action):
             3. Return
         '''
 
-        # numRepeats = kwargs.get('numRepeats')
-        numRepeats = 20
+        numRepeats = kwargs.get('numRepeats', 20)
         self.numParticles = kwargs.get('numParticles')
         totalSteps = kwargs.get('totalSteps')
         stepOffset = kwargs.get('stepOffset', 0)
@@ -129,25 +97,25 @@ class SingleTaskGPAction(Action):
         else:
             data = np.ndarray(shape, dtype, buffer = self.sharedMemory.buf)
         
-        result = np.zeros((numRepeats, self.numObjectives))
+        columns = [self.simulator.Column(o['index']) for o in self.objectives]
+        dtypes = [o['dtype'] for o in self.objectives]
 
         try:
-            for r in range(numRepeats):
-                tracking, _ = self.simulator.TrackBeam(self.numParticles)
-                for it, o in enumerate(self.objectives):
-                    result[r, it] = self.computations[o['dtype']](tracking, o['index'])
-                    # check for interrupts
-                    while pause.is_set():
-                        if stop.is_set():
-                            self.sharedMemory.close()
-                            self.sharedMemory.unlink()
-                            return
-                        time.sleep(.1)
-                    if stop.is_set():
-                        self.sharedMemory.close()
-                        self.sharedMemory.unlink()
-                        return
-                progress.value = (r + 1 + stepOffset) / totalSteps
+            # all repeats are tracked as one beam of independent bunches.
+            tracking, _ = self.simulator.TrackBeam(self.numParticles * numRepeats)
+            result = ExtractObservables(tracking, columns, dtypes, self.numParticles, numRepeats).reshape(numRepeats, -1)
+            # check for interrupts
+            while pause.is_set():
+                if stop.is_set():
+                    self.sharedMemory.close()
+                    self.sharedMemory.unlink()
+                    return
+                time.sleep(.1)
+            if stop.is_set():
+                self.sharedMemory.close()
+                self.sharedMemory.unlink()
+                return
+            progress.value = (numRepeats + stepOffset) / totalSteps
             # return the average over repeats as an array of length len(self.objectives)
             np.copyto(data, np.mean(result, axis = 0))
         except Exception as e:
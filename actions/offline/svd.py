@@ -1,12 +1,12 @@
-import at
-from at import lattice_pass
 import numpy as np
-from copy import deepcopy
 from multiprocessing.shared_memory import SharedMemory
 from ..action import Action
-from ...simulator import Simulator
+from ...simulator import Simulator, GetBeam, ShareLattice, AttachLattice
+from ...utils import startup
 from ... import shared
 
+at = startup.Lazy('at')
+
 class SVDAction(Action):
     '''Computes the trajectory of the beam for a given set of corrector strengths\n
     or the inverse problem of finding the set of corrector strengths producing a given offset in BPMs.'''
@@ -18,7 +18,7 @@ class SVDAction(Action):
 
     def __getstate__(self):
         return {
-            'lattice': self.lattice,
+            'lattice': ShareLattice(self.lattice),
             'BPMs': [
                 {
                     'name': b.name,
@@ -46,7 +46,7 @@ class SVDAction(Action):
         }
     
     def __setstate__(self, state):
-        self.lattice = state['lattice']
+        self.lattice = AttachLattice(state['lattice'])
         self.BPMs = state['BPMs']
         self.correctors = state['correctors']
         self.U = state['U']
@@ -84,11 +84,11 @@ class SVDAction(Action):
             # twiss in values for the LTB
             # sigmaMat = at.sigma_matrix(betax = 3.731, betay = 2.128, alphax = -.0547, alphay = -.1263, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
             # twiss in values for the BTS
-            sigmaMat = at.sigma_matrix(betax = 12.13, betay = 2.94, alphax = -2.92, alphay = .75, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
-            beam = at.beam(numParticles, sigmaMat)
+            inputTwiss = dict(betax = 12.13, betay = 2.94, alphax = -2.92, alphay = .75, emitx = 2.6e-7, emity = 2.6e-7, blength = 0, espread = 1.5e-2)
+            beam = GetBeam(inputTwiss, numParticles, kwargs.get('seed', None)) # already a private copy, so safe to track in place.
             arr, idxs, inv = np.unique(np.array([b['index'] for b in self.BPMs]), return_index = True, return_inverse = True)
             # calculate the nominal trajectory through the lattice
-            beamOut = lattice_pass(self.lattice, deepcopy(beam), nturns = 1, refpts = arr) # has shape 6 x numParticles x numRefpts x nturns
+            beamOut = at.lattice_pass(self.lattice, beam, nturns = 1, refpts = arr) # has shape 6 x numParticles x numRefpts x nturns
             print(f'Ran PyAT')
             # get horizontal BPM list idxs
             xIdxs = [inv[i] for i, b in enumerate(self.BPMs) if b['alignment'] == 'Horizontal']
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import torch
+from typing import Dict, List, Optional
+from pydantic import Field
+from botorch import fit_gpytorch_mll
+from gpytorch.mlls import ExactMarginalLogLikelihood
+from xopt.generators.bayesian.models.standard import StandardModelConstructor
+
+'''
+Model construction for the Single Task GP, keeping the time between optimiser steps under control as a run grows.
+
+Warm starts: between full refits, each model is built with the hyperparameters fitted at the previous step and only given a short optimisation
+from there, rather than being fitted from the kernel's initial values. A full refit happens every `refit_period` steps, or sooner if the marginal
+likelihood per datum drops by more than `likelihood_tolerance` below its value after the last full refit. Only hyperparameters are carried over;
+input and outcome transforms are rebuilt from the new data at every step.
+
+Local models: once there are more than `max_training_points` evaluations, models are trained on a window of that many points instead of the whole run,
+half of them the nearest to the best evaluation so far (which is also where TuRBO centres its trust region) and the rest the most recent evaluations.
+Fitting and prediction costs then stop growing with the run.
+'''
+
+def MarginalLikelihood(model) -> float:
+    '''Mean marginal log likelihood per datum of the models inside a `ModelListGP`, evaluated the same way botorch does when fitting.'''
+    values = []
+    for m in model.models:
+        mll = ExactMarginalLogLikelihood(m.likelihood, m)
+        mll.train()
+        with torch.no_grad():
+            values.append(mll(m(*m.train_inputs), m.train_targets, *m.train_inputs).item())
+        mll.eval()
+    return float(np.mean(values))
+
+def LocalWindow(data: pd.DataFrame, inputNames: list, inputBounds: dict, objectiveName: str, maximise: bool, size: int) -> pd.DataFrame:
+    '''Returns `size` rows of `data`: the nearest to the best `objectiveName` in inputs scaled by `inputBounds`, then the most recent of the rest.'''
+    if len(data) <= size:
+        return data
+    objective = data[objectiveName].to_numpy(dtype = float)
+    if np.all(np.isnan(objective)):
+        return data.iloc[-size:]
+    best = np.nanargmax(objective) if maximise else np.nanargmin(objective)
+    inputs = data[inputNames].to_numpy(dtype = float)
+    lower = np.array([inputBounds[name][0] for name in inputNames], dtype = float) if inputBounds is not None else np.nanmin(inputs, axis = 0)
+    upper = np.array([inputBounds[name][1] for name in inputNames], dtype = float) if inputBounds is not None else np.nanmax(inputs, axis = 0)
+    distances = np.linalg.norm((inputs - inputs[best]) / np.where(upper > lower, upper - lower, 1), axis = 1)
+    distances[np.isnan(distances)] = np.inf
+    keep = np.zeros(len(data), dtype = bool)
+    keep[np.argsort(distances, kind = 'stable')[:size // 2]] = True
+    recent = np.flatnonzero(~keep)[-(size - keep.sum()):]
+    keep[recent] = True
+    return data[keep]
+
+class ScalableModelConstructor(StandardModelConstructor):
+    refit_period: int = Field(1, ge = 1, description = 'steps between full refits, 1 refits fully at every step')
+    warm_iterations: int = Field(25, ge = 1, description = 'optimiser iterations of a warm-started fit')
+    likelihood_tolerance: float = Field(.1, ge = 0, description = 'drop in marginal log likelihood per datum that triggers a full refit')
+    max_training_points: int = Field(0, ge = 0, description = 'train on a local window of this many points once there are more, 0 always uses every point')
+    objective_name: Optional[str] = Field(None, description = 'objective the local window is centred on the best value of')
+    maximise: bool = Field(True, description = 'whether larger objective values are better')
+    _parameters: Optional[List[Dict]] = None # fitted hyperparameters of each model at the previous step.
+    _reference_likelihood: Optional[float] = None # marginal likelihood after the last full refit.
+    _steps_since_refit: int = 0
+    _warm: bool = False
+    _built: int = 0
+
+    def build_model(self, input_names, outcome_names, data, input_bounds = None, dtype = torch.double, device = 'cpu'):
+        if self.max_training_points > 0 and self.objective_name in data:
+            data = LocalWindow(data, input_names, input_bounds, self.objective_name, self.maximise, self.max_training_points)
+        self._warm = self._parameters is not None and len(self._parameters) == len(outcome_names) and self._steps_since_refit + 1 < self.refit_period
+        self._built = 0
+        model = super().build_model(input_names, outcome_names, data, input_bounds, dtype, device)
+        if self.refit_period == 1:
+            # every step is a full refit, so there is nothing to warm-start or to check against.
+            return model
+        likelihood = MarginalLikelihood(model)
+        if self._warm:
+            if likelihood >= self._reference_likelihood - self.likelihood_tolerance:
+                self._steps_since_refit += 1
+                self._parameters = [{k: v.detach().clone() for k, v in m.named_parameters()} for m in model.models]
+                return model
+            # the warm-started fit has drifted, so fit from scratch instead.
+            self._warm = False
+            self._built = 0
+            model = super().build_model(input_names, outcome_names, data, input_bounds, dtype, device)
+            likelihood = MarginalLikelihood(model)
+        self._steps_since_refit = 0
+        self._reference_likelihood = likelihood
+        self._parameters = [{k: v.detach().clone() for k, v in m.named_parameters()} for m in model.models]
+        return model
+
+    def build_single_task_gp(self, X, Y, train = True, **kwargs):
+        model = super().build_single_task_gp(X, Y, train = train and not self._warm, **kwargs)
+        return self.WarmFit(model) if train and self._warm else model
+
+    def build_heteroskedastic_gp(self, X, Y, Yvar, train = True, **kwargs):
+        model = super().build_heteroskedastic_gp(X, Y, Yvar, train = train and not self._warm, **kwargs)
+        return self.WarmFit(model) if train and self._warm else model
+
+    def WarmFit(self, model):
+        '''Loads the previous step's hyperparameters of this outcome into `model` and continues fitting from them.'''
+        previous = self._parameters[self._built]
+        self._built += 1
+        parameters = dict(model.named_parameters())
+        with torch.no_grad():
+            for name, value in previous.items():
+                if name in parameters and parameters[name].shape == value.shape:
+                    parameters[name].copy_(value.to(parameters[name]))
+        fit_gpytorch_mll(ExactMarginalLogLikelihood(model.likelihood, model), optimizer_kwargs = {'options': {'maxiter': self.warm_iterations}})
+        return model
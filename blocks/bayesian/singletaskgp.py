@@ -7,22 +7,25 @@ import asyncio
 import aioca
 import time
 import warnings
-import pandas as pd
-from xopt import Xopt, VOCS, Evaluator
-from xopt.generators.bayesian import UpperConfidenceBoundGenerator, ExpectedImprovementGenerator
-from xopt.generators.bayesian.models.standard import StandardModelConstructor
 from multiprocessing import Event
 from threading import Event as ThreadingEvent
 from multiprocessing.shared_memory import SharedMemory
 from threading import Thread, Lock
 from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from ...simulator import Simulator
+from ...simulator import Simulator, CheckpointSimulator, ShareLattice, AttachLattice, ExtractObservables
 from ... import shared
 from ..draggable import Draggable
 from ...utils import cothread
+from ...utils import channelaccess
+from ...utils import evaluation
+from ...utils import expressions
+from ...utils import journal
+from ...utils import startup
+from ...utils.tracker import BestTracker
 # PerformAction is invoked when running tasks in offline mode to keep the UI responsive.
-from ...utils.multiprocessing import SetGlobalToggleState, TogglePause, StopAction, CreatePersistentWorkerProcess, CreatePersistentWorkerThread, runningActions
+from ...utils.multiprocessing import SetGlobalToggleState, TogglePause, StopAction, CreatePersistentWorkerProcess, CreatePersistentWorkerThread, StopPersistentWorkers, runningActions
 from ..filters.filter import Filter
 from ..constraints.constraint import Constraint
 from ..profiler import Profiler 
@@ -32,6 +35,7 @@ from ..progress import Progress
 from ... import style
 from ... import shared
 warnings.filterwarnings('ignore')
+pd = startup.Lazy('pandas')
 
 class SingleTaskGP(Draggable):
     updateProgressSignal = Signal(float)
@@ -39,10 +43,13 @@ class SingleTaskGP(Draggable):
     updateAverageSignal = Signal(float)
     updateBestSignal = Signal(float)
     updateCandidateSignal = Signal(str)
+    updateStepTimesSignal = Signal(str)
     updateTuRBOSignal = Signal(str)
     updateAssistantSignal = Signal(str, str)
 
     def __init__(self, parent, proxy, **kwargs):
+        # sessions saved before a setting existed pass it as None, so drop those to fall back on the defaults below.
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
         # sim numerical precision set to fp32 by default to allow much higher particle populations.
         simPrecision = kwargs.pop('simPrecision', None)
         if simPrecision is None or simPrecision == 'fp32':
@@ -51,7 +58,7 @@ class SingleTaskGP(Draggable):
             simPrecision = 'fp64'
 
         super().__init__(
-            proxy, name = kwargs.pop('name', 'Single Task GP'), type = 'Single Task GP', size = kwargs.pop('size', [600, 700]), 
+            proxy, name = kwargs.pop('name', 'Single Task GP'), type = 'Single Task GP', size = kwargs.pop('size', [600, 988]), 
             acqFunction = kwargs.pop('acqFunction', 'UCB'),
             acqHyperparameter = kwargs.pop('acqHyperparameter', 2),
             numSamples = kwargs.pop('numSamples', 5),
@@ -61,11 +68,19 @@ class SingleTaskGP(Draggable):
             includeNominal = kwargs.pop('includeNominal', False),
             numParticles = kwargs.pop('numParticles', 5000),
             simPrecision = simPrecision,
+            beamSampling = kwargs.pop('beamSampling', 'FRESH'),
+            retracking = kwargs.pop('retracking', 'FULL'),
+            batchSize = kwargs.pop('batchSize', 1),
+            simRepeats = kwargs.pop('simRepeats', 1),
+            refitPeriod = kwargs.pop('refitPeriod', 1),
+            latencyBudget = kwargs.pop('latencyBudget', 0),
+            localModelPoints = kwargs.pop('localModelPoints', 0),
             headerColor = "#a4243b",
             **kwargs
         )
         self.timeBetweenPolls = 1000
         self.online = False
+        self.settleTimes = dict() # running average of the seconds each magnet takes to reach its setpoint during online optimisation, see `WaitForSettle`.
         self.isReset = False
         self.actionFinished = Event()
         self.resetApplied = Event()
@@ -77,6 +92,7 @@ class SingleTaskGP(Draggable):
         self.updateAverageSignal.connect(self.UpdateAverageLabel)
         self.updateBestSignal.connect(self.UpdateBestLabel)
         self.updateCandidateSignal.connect(self.UpdateCandidateLabel)
+        self.updateStepTimesSignal.connect(self.UpdateStepTimesLabel)
         self.updateAssistantSignal.connect(self.UpdateAssistant)
         self.updateTuRBOSignal.connect(self.UpdateTuRBO)
 
@@ -110,7 +126,7 @@ class SingleTaskGP(Draggable):
 
     def __getstate__(self):
         return {
-            'lattice': shared.lattice,
+            'lattice': ShareLattice(shared.lattice),
             'decisions': [
                 {
                     'name': d.settings['linkedElement'].Name,
@@ -146,6 +162,9 @@ class SingleTaskGP(Draggable):
                 for o in self.observers
             ],
             'numParticles': self.numParticles,
+            'numRepeats': self.settings['simRepeats'],
+            'commonRandomNumbers': self.settings['beamSampling'] == 'COMMON',
+            'incrementalTracking': self.settings['retracking'] == 'INCREMENTAL',
             'totalSteps': self.settings['numSamples'] + self.settings['numSteps'],
             'numObjectives': self.numFundamentalObjectives,
             'numConstraints': self.numFundamentalConstraints,
@@ -153,27 +172,27 @@ class SingleTaskGP(Draggable):
         }
 
     def __setstate__(self, state):
-        self.lattice = state['lattice']
-        self.simulator = Simulator(lattice = self.lattice)
+        self.lattice = AttachLattice(state['lattice'])
         self.decisions:list = state['decisions']
         self.objectives:list = state['objectives']
         self.constraints:list = state['constraints']
         self.observers:list = state['observers']
+        if state.get('incrementalTracking', False):
+            # resume tracking from the first decision element that changed since the last evaluation.
+            self.simulator = CheckpointSimulator(lattice = self.lattice, commonRandomNumbers = state.get('commonRandomNumbers', False))
+            self.simulator.SetCheckpointIndices([d['index'] for d in self.decisions])
+        else:
+            self.simulator = Simulator(lattice = self.lattice, commonRandomNumbers = state.get('commonRandomNumbers', False))
+        # Only track as far as the last element any objective, constraint or observer reads.
+        self.simulator.SetObservedIndices([x['index'] for x in self.objectives + self.constraints + self.observers])
         self.numObjectives:int = state['numObjectives']
         self.numConstraints:int = state['numConstraints']
         self.numObservers:int = state['numObservers']
         self.sharedMemoryCreated = False
         self.totalSteps = state['totalSteps']
+        self.numRepeats = state.get('numRepeats', 1)
         if 'numParticles' in state:
             self.numParticles = state['numParticles']
-            self.computations = {
-                'CHARGE': self.GetCharge,
-                'X': self.GetX,
-                'Y': self.GetY,
-                'XP': self.GetXP,
-                'YP': self.GetYP,
-                'SURVIVAL_RATE': self.GetSurvivalRate,
-            }
 
     def Push(self):
         from ..composition.composition import Composition
@@ -194,7 +213,7 @@ class SingleTaskGP(Draggable):
         self.widget.layout().addWidget(self.content)
         # settings section
         settings = QWidget()
-        settings.setFixedHeight(270)
+        settings.setFixedHeight(522)
         settings.setLayout(QVBoxLayout())
         settings.layout().setContentsMargins(0, 5, 5, 0)
         settingsLabel = QLabel('<b>SETTINGS</b>')
@@ -273,6 +292,42 @@ class SingleTaskGP(Draggable):
         turboSelect.currentTextChanged.connect(lambda: turboFuncs[turboSelect.currentText()]())
         turbo.layout().addWidget(turboSelect)
         settings.layout().addWidget(turbo)
+        # beam sampling
+        beamSampling = QWidget()
+        beamSampling.setFixedHeight(30)
+        beamSampling.setLayout(QHBoxLayout())
+        beamSampling.layout().setContentsMargins(5, 0, 0, 0)
+        beamSamplingLabel = QLabel('Beam Sampling')
+        beamSamplingLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        beamSamplingLabel.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        beamSampling.layout().addWidget(beamSamplingLabel)
+        beamSamplingSelect = QComboBox()
+        beamSamplingSelect.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        beamSamplingSelect.setStyleSheet(style.ComboStyle(color = '#1e1e1e', fontColor = '#c4c4c4', borderRadius = 6, fontSize = 12))
+        beamSamplingSelect.view().parentWidget().setStyleSheet('color: transparent')
+        beamSamplingSelect.addItems(['   FRESH', '   COMMON'])
+        beamSamplingSelect.setCurrentIndex(0 if self.settings['beamSampling'] == 'FRESH' else 1)
+        beamSamplingSelect.currentTextChanged.connect(lambda: self.ChangeBeamSampling(beamSamplingSelect.currentText().strip()))
+        beamSampling.layout().addWidget(beamSamplingSelect)
+        settings.layout().addWidget(beamSampling)
+        # re-tracking
+        retracking = QWidget()
+        retracking.setFixedHeight(30)
+        retracking.setLayout(QHBoxLayout())
+        retracking.layout().setContentsMargins(5, 0, 0, 0)
+        retrackingLabel = QLabel('Re-tracking')
+        retrackingLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        retrackingLabel.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        retracking.layout().addWidget(retrackingLabel)
+        retrackingSelect = QComboBox()
+        retrackingSelect.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        retrackingSelect.setStyleSheet(style.ComboStyle(color = '#1e1e1e', fontColor = '#c4c4c4', borderRadius = 6, fontSize = 12))
+        retrackingSelect.view().parentWidget().setStyleSheet('color: transparent')
+        retrackingSelect.addItems(['   FULL', '   INCREMENTAL'])
+        retrackingSelect.setCurrentIndex(0 if self.settings['retracking'] == 'FULL' else 1)
+        retrackingSelect.currentTextChanged.connect(lambda: self.ChangeRetracking(retrackingSelect.currentText().strip()))
+        retracking.layout().addWidget(retrackingSelect)
+        settings.layout().addWidget(retracking)
         # random samples
         self.samples = QWidget()
         self.samples.setFixedHeight(30)
@@ -302,6 +357,76 @@ class SingleTaskGP(Draggable):
         self.stepsEdit.returnPressed.connect(self.ChangeSteps)
         self.steps.layout().addWidget(self.stepsEdit)
         settings.layout().addWidget(self.steps)
+        # batch size
+        self.batch = QWidget()
+        self.batch.setFixedHeight(30)
+        self.batch.setLayout(QHBoxLayout())
+        self.batch.layout().setContentsMargins(5, 0, 0, 0)
+        batchLabel = QLabel('Batch Size (offline)')
+        batchLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        self.batch.layout().addWidget(batchLabel)
+        self.batchEdit = QLineEdit(f'{self.settings['batchSize']}')
+        self.batchEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        self.batchEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.batchEdit.returnPressed.connect(self.ChangeBatchSize)
+        self.batch.layout().addWidget(self.batchEdit)
+        settings.layout().addWidget(self.batch)
+        # simulation repeats
+        self.repeats = QWidget()
+        self.repeats.setFixedHeight(30)
+        self.repeats.setLayout(QHBoxLayout())
+        self.repeats.layout().setContentsMargins(5, 0, 0, 0)
+        repeatsLabel = QLabel('Repeats (offline)')
+        repeatsLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        self.repeats.layout().addWidget(repeatsLabel)
+        self.repeatsEdit = QLineEdit(f'{self.settings['simRepeats']}')
+        self.repeatsEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        self.repeatsEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.repeatsEdit.returnPressed.connect(self.ChangeRepeats)
+        self.repeats.layout().addWidget(self.repeatsEdit)
+        settings.layout().addWidget(self.repeats)
+        # steps between full refits of the model hyperparameters
+        self.refit = QWidget()
+        self.refit.setFixedHeight(30)
+        self.refit.setLayout(QHBoxLayout())
+        self.refit.layout().setContentsMargins(5, 0, 0, 0)
+        refitLabel = QLabel('Full Refit Every (steps)')
+        refitLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        self.refit.layout().addWidget(refitLabel)
+        self.refitEdit = QLineEdit(f'{self.settings['refitPeriod']}')
+        self.refitEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        self.refitEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.refitEdit.returnPressed.connect(self.ChangeRefitPeriod)
+        self.refit.layout().addWidget(self.refitEdit)
+        settings.layout().addWidget(self.refit)
+        # target wall time of an optimiser step
+        self.latency = QWidget()
+        self.latency.setFixedHeight(30)
+        self.latency.setLayout(QHBoxLayout())
+        self.latency.layout().setContentsMargins(5, 0, 0, 0)
+        latencyLabel = QLabel('Latency Budget (s, 0 = off)')
+        latencyLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        self.latency.layout().addWidget(latencyLabel)
+        self.latencyEdit = QLineEdit(f'{self.settings['latencyBudget']}')
+        self.latencyEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        self.latencyEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.latencyEdit.returnPressed.connect(self.ChangeLatencyBudget)
+        self.latency.layout().addWidget(self.latencyEdit)
+        settings.layout().addWidget(self.latency)
+        # train on a local window of points once the run grows past this
+        self.localModel = QWidget()
+        self.localModel.setFixedHeight(30)
+        self.localModel.setLayout(QHBoxLayout())
+        self.localModel.layout().setContentsMargins(5, 0, 0, 0)
+        localModelLabel = QLabel('Local GP Above (points, 0 = off)')
+        localModelLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        self.localModel.layout().addWidget(localModelLabel)
+        self.localModelEdit = QLineEdit(f'{self.settings['localModelPoints']}')
+        self.localModelEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        self.localModelEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.localModelEdit.returnPressed.connect(self.ChangeLocalModelPoints)
+        self.localModel.layout().addWidget(self.localModelEdit)
+        settings.layout().addWidget(self.localModel)
         # Include initial candidate
         nominalCandidate = QWidget()
         nominalCandidate.setFixedHeight(30)
@@ -429,6 +554,20 @@ class SingleTaskGP(Draggable):
         self.averageEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
         average.layout().addWidget(self.averageEdit)
         metrics.layout().addWidget(average)
+        # step times
+        stepTimes = QWidget()
+        stepTimes.setFixedHeight(30)
+        stepTimes.setLayout(QHBoxLayout())
+        stepTimes.layout().setContentsMargins(5, 0, 0, 0)
+        stepTimesLabel = QLabel('Step Times (s)')
+        stepTimesLabel.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', fontSize = 12))
+        stepTimes.layout().addWidget(stepTimesLabel)
+        self.stepTimesEdit = QLineEdit('N/A')
+        self.stepTimesEdit.setReadOnly(True)
+        self.stepTimesEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, paddingLeft = 13, borderRadius = 6))
+        self.stepTimesEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        stepTimes.layout().addWidget(self.stepTimesEdit)
+        metrics.layout().addWidget(stepTimes)
         self.content.layout().addWidget(metrics)
         # progress bar
         progressWidget = QWidget()
@@ -457,6 +596,9 @@ class SingleTaskGP(Draggable):
     def UpdateCandidateLabel(self, candidate):
         self.candidateEdit.setText(candidate)
 
+    def UpdateStepTimesLabel(self, stepTimes):
+        self.stepTimesEdit.setText(stepTimes)
+
     def UpdateTuRBO(self, mode):
         shared.workspace.assistant.PushMessage(f'TuRBO mode on {self.name} was set to {mode}.')
     
@@ -489,6 +631,18 @@ class SingleTaskGP(Draggable):
             self.nominalButton.setText('No')
             shared.workspace.assistant.PushMessage(f'Nominal decision variable values will not be included in the initial dataset for {self.name}.')
 
+    def ChangeBeamSampling(self, beamSampling):
+        '''`FRESH` draws new particles for every offline evaluation, `COMMON` reuses one cached distribution (common random numbers) to reduce objective noise.'''
+        self.settings['beamSampling'] = beamSampling
+        self.updateAssistantSignal.emit(f'Successfully changed the beam sampling of {self.name} to {beamSampling}.', '')
+
+    def ChangeRetracking(self, retracking):
+        '''`FULL` tracks the whole line every offline evaluation, `INCREMENTAL` resumes from the first decision element that changed.'''
+        self.settings['retracking'] = retracking
+        self.updateAssistantSignal.emit(f'Successfully changed the re-tracking of {self.name} to {retracking}.', '')
+        if retracking == 'INCREMENTAL' and self.settings['beamSampling'] != 'COMMON':
+            self.updateAssistantSignal.emit(f'INCREMENTAL re-tracking on {self.name} only takes effect with COMMON beam sampling.', 'Warning')
+
     def ChangeMode(self):
         self.settings['mode'] = 'MAXIMISE' if self.settings['mode'] == 'MINIMISE' else 'MINIMISE'
         self.modeLabel.setText(f'Mode:\t{self.settings['mode']}')
@@ -551,6 +705,101 @@ class SingleTaskGP(Draggable):
         self.settings['numSteps'] = val
         self.updateAssistantSignal.emit(f'Successfully changed the maximum number of steps of {self.name} to {newText}.', '')
 
+    def ChangeBatchSize(self):
+        try:
+            val = max(round(float(self.batchEdit.text())), 1)
+        except:
+            self.updateAssistantSignal.emit(f'Failed to change the batch size of {self.name} because it isn\'t an int or float.', 'Error')
+            return
+        idx = self.batch.layout().indexOf(self.batchEdit)
+        self.batch.layout().removeWidget(self.batchEdit)
+        self.batchEdit.deleteLater()
+        newText = f'{val}'
+        newBatchEdit = QLineEdit(newText)
+        newBatchEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        newBatchEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        newBatchEdit.returnPressed.connect(self.ChangeBatchSize)
+        self.batch.layout().insertWidget(idx, newBatchEdit)
+        self.batchEdit = newBatchEdit
+        self.settings['batchSize'] = val
+        self.updateAssistantSignal.emit(f'Successfully changed the batch size of {self.name} to {newText}.', '')
+
+    def ChangeRepeats(self):
+        try:
+            val = max(round(float(self.repeatsEdit.text())), 1)
+        except:
+            self.updateAssistantSignal.emit(f'Failed to change the number of simulation repeats of {self.name} because it isn\'t an int or float.', 'Error')
+            return
+        idx = self.repeats.layout().indexOf(self.repeatsEdit)
+        self.repeats.layout().removeWidget(self.repeatsEdit)
+        self.repeatsEdit.deleteLater()
+        newText = f'{val}'
+        newRepeatsEdit = QLineEdit(newText)
+        newRepeatsEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        newRepeatsEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        newRepeatsEdit.returnPressed.connect(self.ChangeRepeats)
+        self.repeats.layout().insertWidget(idx, newRepeatsEdit)
+        self.repeatsEdit = newRepeatsEdit
+        self.settings['simRepeats'] = val
+        self.updateAssistantSignal.emit(f'Successfully changed the number of simulation repeats of {self.name} to {newText}.', '')
+
+    def ChangeRefitPeriod(self):
+        try:
+            val = max(round(float(self.refitEdit.text())), 1)
+        except:
+            self.updateAssistantSignal.emit(f'Failed to change the refit period of {self.name} because it isn\'t an int or float.', 'Error')
+            return
+        idx = self.refit.layout().indexOf(self.refitEdit)
+        self.refit.layout().removeWidget(self.refitEdit)
+        self.refitEdit.deleteLater()
+        newText = f'{val}'
+        newRefitEdit = QLineEdit(newText)
+        newRefitEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        newRefitEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        newRefitEdit.returnPressed.connect(self.ChangeRefitPeriod)
+        self.refit.layout().insertWidget(idx, newRefitEdit)
+        self.refitEdit = newRefitEdit
+        self.settings['refitPeriod'] = val
+        self.updateAssistantSignal.emit(f'Successfully changed the refit period of {self.name} to {newText}.', '')
+
+    def ChangeLatencyBudget(self):
+        try:
+            val = max(float(self.latencyEdit.text()), 0)
+        except:
+            self.updateAssistantSignal.emit(f'Failed to change the latency budget of {self.name} because it isn\'t an int or float.', 'Error')
+            return
+        idx = self.latency.layout().indexOf(self.latencyEdit)
+        self.latency.layout().removeWidget(self.latencyEdit)
+        self.latencyEdit.deleteLater()
+        newText = f'{val:g}'
+        newLatencyEdit = QLineEdit(newText)
+        newLatencyEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        newLatencyEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        newLatencyEdit.returnPressed.connect(self.ChangeLatencyBudget)
+        self.latency.layout().insertWidget(idx, newLatencyEdit)
+        self.latencyEdit = newLatencyEdit
+        self.settings['latencyBudget'] = val
+        self.updateAssistantSignal.emit(f'Successfully changed the latency budget of {self.name} to {newText} s.', '')
+
+    def ChangeLocalModelPoints(self):
+        try:
+            val = max(round(float(self.localModelEdit.text())), 0)
+        except:
+            self.updateAssistantSignal.emit(f'Failed to change the local GP size of {self.name} because it isn\'t an int or float.', 'Error')
+            return
+        idx = self.localModel.layout().indexOf(self.localModelEdit)
+        self.localModel.layout().removeWidget(self.localModelEdit)
+        self.localModelEdit.deleteLater()
+        newText = f'{val}'
+        newLocalModelEdit = QLineEdit(newText)
+        newLocalModelEdit.setStyleSheet(style.LineEditStyle(color = '#1e1e1e', fontColor = '#c4c4c4', fontSize = 12, borderRadius = 6, paddingLeft = 13))
+        newLocalModelEdit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        newLocalModelEdit.returnPressed.connect(self.ChangeLocalModelPoints)
+        self.localModel.layout().insertWidget(idx, newLocalModelEdit)
+        self.localModelEdit = newLocalModelEdit
+        self.settings['localModelPoints'] = val
+        self.updateAssistantSignal.emit(f'Successfully changed the local GP size of {self.name} to {newText}.', '')
+
     def SelectUCB(self):
         self.settings['acqFunction'] = 'UCB'
         self.explorationEdit.setText(f'{self.settings['acqHyperparameter']:.1f}')
@@ -648,6 +897,37 @@ class SingleTaskGP(Draggable):
             return set([ID])
         return set([])
 
+    def CompileExpressions(self):
+        '''Flattens the objective and constraint graphs into expressions over the fundamental readings, ordered as the simulated results
+        (fundamental objectives then fundamental constraints). Falls back to evaluating blocks through `Start()` if any block cannot be compiled.'''
+        self.expressionColumns = [o.ID for o in self.fundamentalObjectives] + [c.ID for c in self.fundamentalConstraints]
+        # a block feeding both objectives and constraints is read from its constraint column, as it is written last.
+        columns = {ID: col for col, ID in enumerate(self.expressionColumns)}
+        try:
+            self.objectiveExpression = expressions.Compile(self.objectives[0].ID, columns)
+            self.constraintExpressions = {
+                ID: expressions.Compile(ID, columns)
+                for c in self.constraints for ID in c.linksIn if shared.entities[ID].type != 'Group'
+            }
+        except ValueError as e:
+            print(f'{self.name} will evaluate its objective block by block: {e}')
+            self.objectiveExpression = None
+            self.constraintExpressions = dict()
+
+    def EvaluateExpressions(self, readings: np.ndarray):
+        '''Returns the objective and a dict of constraints for `readings` of shape (..., numFundamentals), in a single pass over the compiled expressions.'''
+        return self.objectiveExpression(readings), {self.constraintsIDToName[ID]: expression(readings) for ID, expression in self.constraintExpressions.items()}
+
+    def RepeatStatistics(self, name: str, values: np.ndarray) -> dict:
+        '''Returns the mean of repeat `values` under `name` and the variance of that mean (its squared standard error) under `{name}_var`,
+        which Xopt picks up as observation noise for the outcome.'''
+        values = np.asarray(values, dtype = float)
+        values = values[~np.isnan(values)]
+        if len(values) < 2:
+            return {name: float(values[0]) if len(values) > 0 else np.nan}
+        # a noise-free outcome (e.g. every particle survives in every repeat) still needs a positive noise level.
+        return {name: float(np.mean(values)), f'{name}_var': max(float(np.var(values, ddof = 1)) / len(values), 1e-12)}
+
     def CheckDecisionStatesAgree(self):
         for d in self.decisions:
             if d.online != self.decisions[0].online:
@@ -659,56 +939,40 @@ class SingleTaskGP(Draggable):
         return True
     
     def GetBestRow(self):
-        if not self.notAllNaNs:
-            self.bestRowIdx = None
-            self.bestRow = None
+        '''Feeds the optimiser rows added since the last call to the best tracker, so the work done is proportional to the new evaluations only.'''
+        rows = self.X.data.iloc[self.trackedRows:]
+        self.trackedRows += len(rows)
+        if len(rows) == 0:
             return
-        if self.numConstraints > 0:
-            try:
-                cond = []
-                for c in self.constraints:
-                    if c.type == '< (Constraint)':
-                        for ID in c.linksIn:
-                            if shared.entities[ID].type == 'Group':
-                                continue
-                            cond.append(self.X.data[self.constraintsIDToName[ID]] < c.settings['threshold'])
-                    else:
-                        for ID in c.linksIn:
-                            if shared.entities[ID].type == 'Group':
-                                continue
-                            cond.append(self.X.data[self.constraintsIDToName[ID]] > c.settings['threshold'])
-                mask = np.logical_and.reduce(cond)
-                if self.settings['mode'].upper() == 'MAXIMISE':
-                    self.bestRowIdx = self.X.data[mask][self.immediateObjectiveName].idxmax()
-                else:
-                    self.bestRowIdx = self.X.data[mask][self.immediateObjectiveName].idxmin()
-                self.bestRow = self.X.data.loc[self.bestRowIdx]
-            except:
-                self.bestRow = None
-        else:
-            try:
-                if self.settings['mode'].upper() == 'MAXIMISE':
-                    self.bestRow = self.X.data.loc[self.X.data[self.immediateObjectiveName].idxmax()]
-                else:
-                    self.bestRow = self.X.data.loc[self.X.data[self.immediateObjectiveName].idxmin()]
-            except:
-                self.bestRow = None
+        feasible = np.ones(len(rows), dtype = bool)
+        for name, (direction, threshold) in self.optimiserConstraints.items():
+            if name not in rows:
+                feasible[:] = False
+                continue
+            values = rows[name].to_numpy(dtype = float)
+            feasible &= values < threshold if direction == 'LESS_THAN' else values > threshold
+        objectives = rows[self.immediateObjectiveName].to_numpy(dtype = float)
+        candidates = rows.iloc[:, :self.numDecisions].to_numpy(dtype = float)
+        for objective, candidate, isFeasible in zip(objectives, candidates, feasible):
+            self.tracker.Update(objective, candidate, isFeasible)
 
     def UpdateBestMetrics(self):
-        if self.bestRow is not None:
-            with self.lock:
-                if self.lastValues.shape[0] > self.runningAverageWindow:
-                    self.lastValues = np.delete(self.lastValues, 0)
-                self.lastValues = np.append(self.lastValues, np.array([self.X.data[self.immediateObjectiveName].iloc[-1]]))
-            try:
-                self.bestValue = self.bestRow.iloc[self.numDecisions]
-                self.updateCandidateSignal.emit('  '.join([f'{num:.3f}' for num in self.bestRow.iloc[:self.numDecisions]]))
-                self.updateAverageSignal.emit(np.nanmean(self.lastValues))
-                self.updateBestSignal.emit(self.bestValue)
-            except:
-                pass
-            
+        if self.tracker.best is None:
+            return
+        self.bestValue = self.tracker.best
+        self.bestCandidate = self.tracker.bestCandidate
+        try:
+            self.updateCandidateSignal.emit('  '.join([f'{num:.3f}' for num in self.bestCandidate]))
+            self.updateAverageSignal.emit(self.tracker.average)
+            self.updateBestSignal.emit(self.bestValue)
+        except:
+            pass
+
     def SetupAndRunOptimiser(self, evaluateFunction):
+        # the optimisation stack is imported on first use (or preloaded in the background) to keep app start-up fast.
+        from xopt import Xopt, VOCS, Evaluator
+        from xopt.generators.bayesian import UpperConfidenceBoundGenerator, ExpectedImprovementGenerator
+        from .models import ScalableModelConstructor
         # try:
         self.updateAssistantSignal.emit(f'{self.name} is setting up for the first time, which may take a few seconds.', '')
         mode = 'MAXIMIZE' if self.settings['mode'].upper() == 'MAXIMISE' else 'MINIMIZE'
@@ -769,10 +1033,15 @@ class SingleTaskGP(Draggable):
             constraints = self.optimiserConstraints,
         )
         kernel = self.ConstructKernel()
-        constructor = StandardModelConstructor(
+        # between full refits, hyperparameters are warm-started from the previous step's fit, and long runs train on a local window of points.
+        constructor = ScalableModelConstructor(
             covar_modules = {
                 self.immediateObjectiveName: kernel,
             },
+            refit_period = self.settings['refitPeriod'],
+            max_training_points = self.settings['localModelPoints'],
+            objective_name = self.immediateObjectiveName,
+            maximise = mode == 'MAXIMIZE',
         )
         generatorKwargs = dict(
             vocs = vocs,
@@ -804,13 +1073,20 @@ class SingleTaskGP(Draggable):
             generator = generator,
             evaluator = evaluator,
         )
+        # the latency budget scales the acquisition optimisation down from these.
+        self.defaultMonteCarloSamples = self.X.generator.n_monte_carlo_samples
+        self.defaultRestarts = self.X.generator.numerical_optimizer.n_restarts
+        self.acquisitionScale = 1.
         self.bestValue = None
         self.bestCandidate = None
-        self.runningAverageWindow = 5
-        self.lastValues = np.array([])
+        self.tracker = BestTracker(maximise = mode == 'MAXIMIZE', window = 5)
+        self.trackedRows = 0
         self.initialised = False
         self.notAllNaNs = False
         timestamp = self.Timestamp(includeDate = True, stripColons = True)
+        # each evaluation is appended to the journal as it arrives, the CSV is written once the run ends.
+        self.journal = journal.RunJournal(Path(shared.cwd) / 'datadump' / f'{timestamp}.ndjson')
+        self.runPath = Path(shared.cwd) / 'datadump' / f'{timestamp}.csv'
         self.updateAssistantSignal.emit(f'{self.name} is now running.', '')
         # try:
         #     self.X.random_evaluate(1) # run once to initialise shared memory array
@@ -824,32 +1100,23 @@ class SingleTaskGP(Draggable):
         self.numEvals = 0
         # random samples
         numSamples = max(self.settings['numSamples'], 1)
-        if self.numObservers > 0:
-            insertIdx = self.numDecisions + self.numFundamentalConstraints + self.numObjectives
-            observerIDToName = {
-                o.ID: f'{o.name} (ID: {o.ID})'
-                for o in self.observers
-            }
         numEvals = 0
-        for it in range(numSamples):
-            self.X.random_evaluate(1)
-            self.notAllNaNs = self.X.data.iloc[:, self.numDecisions:-2].notna().all(axis = 1).any()
-            if self.numObservers > 0:
-                dataToSave = self.X.data.copy()
-                for it, o in enumerate(self.observers):
-                    dataToSave.insert(loc = insertIdx, column = observerIDToName[o.ID], value = self.observerValues[:self.numEvals, it])
-                dataToSave.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
+        for it in range(0, numSamples, self.batchSize):
+            batchSize = min(self.batchSize, numSamples - it)
+            if self.batchSize > 1:
+                self.EvaluateBatch(evaluateFunction, self.X.vocs.random_inputs(batchSize, include_constants = True))
             else:
-                self.X.data.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
-            self.progressAmount = (numEvals + 1) / self.maxEvals
+                self.X.random_evaluate(1)
+            self.notAllNaNs = self.X.data.iloc[:, self.numDecisions:-2].notna().all(axis = 1).any()
+            self.JournalNewRows()
+            self.progressAmount = (numEvals + batchSize) / self.maxEvals
             self.updateProgressSignal.emit(self.progressAmount)
-            numEvals += 1
+            numEvals += batchSize
             self.GetBestRow()
             self.UpdateBestMetrics()
             if self.CheckForInterrupt(runningActions[self.ID][0], runningActions[self.ID][1]):
-                self.inQueue.put(None)
-                self.inQueue.join()
-                self.outQueue.join()
+                self.CloseJournal()
+                self.StopWorkers()
                 return
         message = f'{self.name} has taken initial random samples.'
         messageType = ''
@@ -871,45 +1138,43 @@ class SingleTaskGP(Draggable):
         self.updateAssistantSignal.emit(message, messageType)
         # optimiser steps
         if self.settings['numSteps'] > 0:
-            for it in range(self.settings['numSteps']):
-                print(f'Step {it + 1}/{self.settings['numSteps']}')
+            # in batch mode each step proposes up to `batchSize` candidates, so steps count evaluations.
+            for it in range(0, self.settings['numSteps'], self.batchSize):
+                batchSize = min(self.batchSize, self.settings['numSteps'] - it)
+                print(f'Step {it + batchSize}/{self.settings['numSteps']}')
+                stepStart = time.perf_counter()
                 self.notAllNaNs = self.X.data.iloc[:, self.numDecisions:-2].notna().all(axis = 1).any()
+                # the step is split into generating candidates (model fit and acquisition optimisation) and evaluating them, so each can be timed.
+                candidates = None
+                numComputations = 0 if self.X.generator.computation_time is None else len(self.X.generator.computation_time)
                 if self.notAllNaNs:
                     try:
-                        self.X.step()
+                        candidates = pd.DataFrame(self.X.generator.generate(batchSize))
                     except:
-                        self.X.random_evaluate(1)
+                        candidates = None
+                generated = time.perf_counter()
+                if candidates is None:
+                    candidates = self.X.vocs.random_inputs(batchSize, include_constants = True)
+                if self.batchSize > 1:
+                    self.EvaluateBatch(evaluateFunction, candidates)
                 else:
-                    self.X.random_evaluate(1)
-                # Handle observers if they exist.
-                if self.numObservers > 0:
-                    dataToSave = self.X.data.copy()
-                    for it, o in enumerate(self.observers):
-                        dataToSave.insert(loc = insertIdx, column = observerIDToName[o.ID], value = self.observerValues[:self.numEvals, it])
-                    dataToSave.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
-                else:
-                    self.X.data.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
+                    self.X.evaluate_data(pd.DataFrame(candidates))
+                evaluated = time.perf_counter()
                 self.notAllNaNs = self.X.data.iloc[:, self.numDecisions:-2].notna().all(axis = 1).any()
                 self.progressAmount = self.numEvals / self.maxEvals
                 self.updateProgressSignal.emit(self.progressAmount)
                 try:
                     self.GetBestRow()
-                    if self.bestRow is not None:
-                        self.bestValue = self.bestRow.iloc[self.numDecisions]
-                        with self.lock:
-                            if self.lastValues.shape[0] > self.runningAverageWindow:
-                                self.lastValues = np.delete(self.lastValues, 0)
-                            self.lastValues = np.append(self.lastValues, np.array([self.X.data[self.immediateObjectiveName].iloc[-1]]))
-                        self.updateCandidateSignal.emit('  '.join([f'{num:.3f}' for num in self.bestRow.iloc[:self.numDecisions]]))
-                        self.updateAverageSignal.emit(np.nanmean(self.lastValues))
-                        self.updateBestSignal.emit(self.bestValue)
+                    self.UpdateBestMetrics()
                 except Exception as e:
                     print(e)
+                stepTimes = self.StepTimes(stepStart, generated, evaluated, numComputations)
+                self.JournalNewRows(stepTimes)
+                self.ApplyLatencyBudget(stepTimes)
                 try:
                     if self.CheckForInterrupt(runningActions[self.ID][0], runningActions[self.ID][1], timeout = .1):
-                        self.inQueue.put(None)
-                        self.inQueue.join()
-                        self.outQueue.join()
+                        self.CloseJournal()
+                        self.StopWorkers()
                         return
                 except:
                     pass
@@ -917,7 +1182,7 @@ class SingleTaskGP(Draggable):
                 print(self.X.generator.turbo_controller.get_trust_region(self.X.generator))
                 print('Centre:', self.X.generator.turbo_controller.center_x)
                 print('= = = = = = = = = = = = =')
-        if self.bestRow is None:
+        if self.tracker.best is None:
             if self.numConstraints > 0:
                 self.updateAssistantSignal.emit(f'{self.name} has finished, but it failed to find a candidate satisfying the constraints.', 'Warning')
             else:
@@ -928,14 +1193,7 @@ class SingleTaskGP(Draggable):
             else:
                 self.updateAssistantSignal.emit(f'{self.name} has finished and found a solution.', '')
         print('Done with optimiser steps!')
-        # Handle observers if they exist.
-        if self.numObservers > 0:
-            dataToSave = self.X.data.copy()
-            for it, o in enumerate(self.observers):
-                dataToSave.insert(loc = insertIdx, column = observerIDToName[o.ID], value = self.observerValues[:self.numEvals, it])
-            dataToSave.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
-        else:
-            self.X.data.to_csv(Path(shared.cwd) / 'datadump' / f'{timestamp}.csv', index = False)
+        self.CloseJournal()
         # except Exception as e:
         #     pass
         try:
@@ -944,12 +1202,91 @@ class SingleTaskGP(Draggable):
         except:
             pass
         try:
-            self.inQueue.put(None)
-            self.inQueue.join()
-            self.outQueue.join()
+            self.StopWorkers()
         except:
             pass
 
+    def StepTimes(self, stepStart, generated, evaluated, numComputations) -> dict:
+        '''Splits the wall time of the optimiser step that started at `stepStart` into model fitting, acquisition optimisation, evaluation
+        and bookkeeping, shows it on the block and returns it. `numComputations` is the number of generator timings recorded before the step.'''
+        stepTimes = {'fit': 0., 'acquisition': 0., 'evaluation': evaluated - generated, 'bookkeeping': 0.}
+        computationTime = self.X.generator.computation_time
+        if computationTime is not None and len(computationTime) > numComputations:
+            # Xopt times model training and acquisition optimisation inside `generate`.
+            stepTimes['fit'] = float(computationTime['training'].iloc[-1])
+            stepTimes['acquisition'] = float(computationTime['acquisition_optimization'].iloc[-1])
+        # everything else, including candidate post-processing, data handling and UI updates.
+        stepTimes['bookkeeping'] = max(time.perf_counter() - stepStart - stepTimes['fit'] - stepTimes['acquisition'] - stepTimes['evaluation'], 0)
+        self.updateStepTimesSignal.emit(f'fit {stepTimes['fit']:.2f}  acq {stepTimes['acquisition']:.2f}  eval {stepTimes['evaluation']:.2f}  other {stepTimes['bookkeeping']:.2f}')
+        return stepTimes
+
+    def ApplyLatencyBudget(self, stepTimes: dict):
+        '''Scales the Monte Carlo samples and restarts of the acquisition optimisation so a step fits inside the latency budget, giving them back
+        as time allows. Acquisition cost grows with the product of the two, so each is scaled by the square root of the time ratio.'''
+        if self.settings['latencyBudget'] <= 0 or stepTimes['acquisition'] <= 0:
+            return
+        available = self.settings['latencyBudget'] - stepTimes['fit'] - stepTimes['evaluation'] - stepTimes['bookkeeping']
+        ratio = np.clip(available / stepTimes['acquisition'], .25, 4)
+        self.acquisitionScale = float(np.clip(self.acquisitionScale * np.sqrt(ratio), .05, 1))
+        self.X.generator.n_monte_carlo_samples = max(round(self.defaultMonteCarloSamples * self.acquisitionScale), 16)
+        self.X.generator.numerical_optimizer.n_restarts = max(round(self.defaultRestarts * self.acquisitionScale), 1)
+
+    def JournalNewRows(self, stepTimes: dict = None):
+        '''Appends optimiser rows not yet in the run journal, with observer readings inserted after the objectives and constraints
+        and, for optimiser steps, the time taken by each phase of the step in seconds.'''
+        start = self.journal.numRows
+        rows = self.X.data.iloc[start:].copy()
+        if stepTimes is not None:
+            for k, v in stepTimes.items():
+                rows[f'{k} time (s)'] = v
+        if self.numObservers > 0:
+            # observer readings are recorded by row, rows without a reading (e.g. the nominal candidate) are left as NaN.
+            values = np.full((len(rows), self.numObservers), np.nan)
+            recorded = self.observerValues[start:min(start + len(rows), self.numEvals)]
+            values[:len(recorded)] = recorded
+            insertIdx = self.numDecisions + self.numFundamentalConstraints + self.numObjectives
+            for it, o in enumerate(self.observers):
+                name = f'{o.name} (ID: {o.ID})'
+                if name in rows:
+                    rows[name] = rows[name].fillna(pd.Series(values[:, it], index = rows.index))
+                else:
+                    rows.insert(loc = min(insertIdx, len(rows.columns)), column = name, value = values[:, it])
+        self.journal.Append(rows)
+
+    def CloseJournal(self):
+        '''Journals any remaining rows, waits for them to reach disk and writes the whole run to its CSV once.'''
+        try:
+            self.JournalNewRows()
+            self.journal.Close()
+            journal.Read(self.journal.path).to_csv(self.runPath, index = False)
+        except Exception as e:
+            print(f'{self.name} failed to save its run, here is the error:', f'{e}')
+
+    def EvaluateBatch(self, evaluateFunction, candidates):
+        '''Evaluates every candidate (row) of `candidates` concurrently across the worker pool and adds the results to the optimiser.'''
+        candidates = pd.DataFrame(candidates).reset_index(drop = True)
+        firstRow = self.numEvals # observer rows follow evaluation order, batches run one after another.
+
+        def EvaluateCandidate(row, dictIn):
+            t0 = time.time()
+            try:
+                output = evaluateFunction(dictIn, row = firstRow + row)
+                error = False
+            except Exception as e:
+                print(e)
+                output = {self.immediateObjectiveName: np.nan}
+                error = True
+            return {**output, 'xopt_runtime': time.time() - t0, 'xopt_error': error}
+
+        with ThreadPoolExecutor(max_workers = self.batchSize) as executor:
+            outputs = list(executor.map(EvaluateCandidate, range(len(candidates)), candidates.to_dict('records')))
+        self.X.add_data(pd.concat([candidates, pd.DataFrame(outputs)], axis = 1))
+
+    def StopWorkers(self):
+        '''Sends the stop signal to every worker and waits for them to finish.'''
+        # the extra result slots of batch workers are released here, the first slot is handled like any other block data.
+        StopPersistentWorkers(self, self.inQueues, self.workerThreads, [f'batchData{w}' for w in range(1, len(self.inQueues))])
+
     def Start(self, changeGlobalToggleState = True, **kwargs):
         if self.ID in runningActions:
             if runningActions[self.ID][0].is_set():
@@ -1002,6 +1339,7 @@ class SingleTaskGP(Draggable):
                 if numLinksIn == 0 and (numLinksOut == 0 or (numLinksOut == 1 and next(iter(shared.entities[ID].linksOut)) == 'free')):
                     self.observers.append(shared.entities[ID])
         self.numObservers = len(self.observers)
+        self.CompileExpressions()
         self.online = self.decisions[0].online
         self.numParticles = 5000
         self.numEvals = 0
@@ -1012,57 +1350,122 @@ class SingleTaskGP(Draggable):
 
         precision = np.float32 if self.settings['simPrecision'] == 'fp32' else np.float64
         emptyArray = np.empty(self.numFundamentalObjectives + self.numFundamentalConstraints + self.numObservers, dtype = precision)
-        self.inQueue, self.outQueue = Queue(), Queue()
+        # Offline batches are evaluated concurrently, one persistent worker process (and result slot) per candidate.
+        self.batchSize = 1 if self.online else self.settings['batchSize']
+        self.inQueues, self.outQueues = [Queue() for _ in range(self.batchSize)], [Queue() for _ in range(self.batchSize)]
+        self.inQueue, self.outQueue = self.inQueues[0], self.outQueues[0]
+        self.freeWorkers = Queue()
+        for w in range(self.batchSize):
+            self.freeWorkers.put(w)
+        self.evaluationLock = Lock()
 
         if self.online:
             runningActions[self.ID] = [ThreadingEvent(), ThreadingEvent(), ThreadingEvent(), 0.] # pause, stop, error, progress
         else:
             runningActions[self.ID] = [Event(), Event(), Event(), 0.] # pause, stop, error, progress
         if self.online:
-            Thread(target = CreatePersistentWorkerThread, args = (self, self.inQueue, self.outQueue, self.SendMachineInstructions)).start()
+            self.workerThreads = [Thread(target = CreatePersistentWorkerThread, args = (self, self.inQueue, self.outQueue, self.SendMachineInstructions))]
         else:
-            Thread(target = CreatePersistentWorkerProcess, args = (self, emptyArray, self.inQueue, self.outQueue, self.Simulate), kwargs = {'dtype': precision}).start()
+            self.workerThreads = [
+                Thread(target = CreatePersistentWorkerProcess, args = (self, emptyArray, self.inQueues[w], self.outQueues[w], self.Simulate), kwargs = {'dtype': precision, 'attrName': 'data' if w == 0 else f'batchData{w}'})
+                for w in range(self.batchSize)
+            ]
+        for thread in self.workerThreads:
+            thread.start()
         # SetGlobalToggleState()
         numFundamentalObjectives = len(self.fundamentalObjectives)
 
-        def Evaluate(dictIn: dict):
+        def ReadOutOffline(dictIn: dict, result, row: int):
+            '''Writes decisions and simulated readings into their blocks and evaluates the pipeline.\n
+            Repeat-averaged simulations return a reading per repeat, in which case blocks hold the means and the objective and constraints
+            are returned with their variances as `{name}_var` entries.'''
+            repeats = None
+            if np.ndim(result) == 2:
+                repeats = result
+                result = np.nanmean(repeats, axis = 0)
+            for v in dictIn:
+                shared.entities[self.variableNameToID[v]].data[0] = dictIn[v]
+                shared.entities[self.variableNameToID[v]].data[1] = dictIn[v]
+            for it, o in enumerate(self.fundamentalObjectives):
+                o.data[1] = result[it]
+            for it, c in enumerate(self.fundamentalConstraints):
+                c.data[1] = result[it + numFundamentalObjectives]
+            for it, o in enumerate(self.observers):
+                o.data[1] = result[it + numFundamentalObjectives + self.numFundamentalConstraints]
+                self.observerValues[row, it] = o.data[1]
+            evaluation.Invalidate()
+            if self.objectiveExpression is not None:
+                if repeats is not None:
+                    objectives, constraints = self.EvaluateExpressions(repeats[:, :numFundamentalObjectives + self.numFundamentalConstraints])
+                    statistics = self.RepeatStatistics(immediateObjectiveName, objectives)
+                    for k, v in constraints.items():
+                        statistics.update(self.RepeatStatistics(k, v))
+                    return statistics.pop(immediateObjectiveName), statistics
+                objective, constraints = self.EvaluateExpressions(result[:numFundamentalObjectives + self.numFundamentalConstraints])
+                return float(objective), {k: float(v) for k, v in constraints.items()}
+            return self.objectives[0].Start(), dict([[self.constraintsIDToName[k], v] for c in self.constraints for k, v in c.Start().items()])
+
+        def EvaluateOnWorker(dictIn: dict, row: int):
+            '''Simulates on the next free worker. Blocks share their data arrays, so the pipeline is read out one candidate at a time.'''
+            worker = self.freeWorkers.get()
+            self.inQueues[worker].put(dictIn)
+            result = self.outQueues[worker].get()
+            self.outQueues[worker].task_done()
+            self.freeWorkers.put(worker)
+            if result is None: # stop was triggered
+                return {immediateObjectiveName: np.nan}
+            with self.evaluationLock:
+                result, constraints = ReadOutOffline(dictIn, result, row)
+            with self.lock:
+                self.numEvals += 1
+            return {immediateObjectiveName: result, **constraints}
+
+        def Evaluate(dictIn: dict, row: int = None):
+            '''`row` is the row of this candidate in the optimiser data, it defaults to the next row.'''
+            if self.batchSize > 1:
+                return EvaluateOnWorker(dictIn, row)
             for v in dictIn:
                 shared.entities[self.variableNameToID[v]].data[0] = dictIn[v]
                 if not self.online:
                     shared.entities[self.variableNameToID[v]].data[1] = dictIn[v]
+            evaluation.Invalidate()
             self.inQueue.put(dictIn)
             result = self.outQueue.get()
             self.outQueue.task_done()
             if result is None: # stop was triggered
                 return {immediateObjectiveName: np.nan}
             if not self.online:
-                for it, o in enumerate(self.fundamentalObjectives):
-                    o.data[1] = result[it]
-                for it, c in enumerate(self.fundamentalConstraints):
-                    c.data[1] = result[it + numFundamentalObjectives]
-                for it, o in enumerate(self.observers):
-                    o.data[1] = result[it + numFundamentalObjectives + self.numFundamentalConstraints]
-                    self.observerValues[self.numEvals, it] = o.data[1]
-                result = self.objectives[0].Start()
-                constraints = dict([[self.constraintsIDToName[k], v] for c in self.constraints for k, v in c.Start().items()])
+                result, constraints = ReadOutOffline(dictIn, result, self.numEvals if row is None else row)
             else:
                 numRepeats = 5 if 'numRepeats' not in self.settings else self.settings['numRepeats']
-                result = np.zeros(numRepeats)
-                constraints = []
-                for r in range(numRepeats):
-                    result[r] = self.objectives[0].Start()
-                    constraints.append(dict([[self.constraintsIDToName[k], v] for c in self.constraints for k, v in c.Start().items()]))
-                    # PVs in-app update their values at 5Hz, so poll less frequently than this to guarantee a new value appears if is due to do so.
-                    if self.CheckForInterrupt(runningActions[self.ID][0], runningActions[self.ID][1], timeout = .25):
-                        break
-                # average over repeat observations
-                result = np.nanmean(result)
-                # average constraints across repeats
-                newConstraints = {
-                    k: sum(constraintDict[k] for constraintDict in constraints) / numRepeats
-                    for k in constraints[0]
-                }
-                constraints = newConstraints
+                if self.objectiveExpression is not None:
+                    # record the fundamental readings of every repeat, then evaluate them all at once.
+                    readings = np.full((numRepeats, len(self.expressionColumns)), np.nan)
+                    for r in range(numRepeats):
+                        readings[r] = [shared.entities[ID].data[1] for ID in self.expressionColumns]
+                        # PVs in-app update their values at 5Hz, so poll less frequently than this to guarantee a new value appears if is due to do so.
+                        if self.CheckForInterrupt(runningActions[self.ID][0], runningActions[self.ID][1], timeout = .25):
+                            break
+                    result, constraints = self.EvaluateExpressions(readings)
+                    result = float(np.nanmean(result))
+                    constraints = {k: float(np.nanmean(v)) for k, v in constraints.items()}
+                else:
+                    result = np.zeros(numRepeats)
+                    constraints = []
+                    for r in range(numRepeats):
+                        result[r] = self.objectives[0].Start()
+                        constraints.append(dict([[self.constraintsIDToName[k], v] for c in self.constraints for k, v in c.Start().items()]))
+                        # PVs in-app update their values at 5Hz, so poll less frequently than this to guarantee a new value appears if is due to do so.
+                        if self.CheckForInterrupt(runningActions[self.ID][0], runningActions[self.ID][1], timeout = .25):
+                            break
+                    # average over repeat observations
+                    result = np.nanmean(result)
+                    # average constraints across repeats
+                    newConstraints = {
+                        k: sum(constraintDict[k] for constraintDict in constraints) / numRepeats
+                        for k in constraints[0]
+                    }
+                    constraints = newConstraints
             with self.lock:
                 self.numEvals += 1
             return {immediateObjectiveName: result, **constraints}
@@ -1100,31 +1503,58 @@ class SingleTaskGP(Draggable):
         StopAction(self)
 
     def SendMachineInstructions(self, pause, stop, error, parameters, **kwargs):
-        '''Results do not need to be sent back to the optimiser from here during online optimisation.'''
+        '''Results do not need to be sent back to the optimiser from here during online optimisation.\n
+        Readbacks and setpoints for every magnet are sent together in one bulk request, then each magnet is waited on until it settles.'''
+        if len(parameters) == 0:
+            return 1
         try:
-            for d, target in parameters.items():
-                nm = d.split()[0] # strip the index attached to this PV name in the inDict
-                try:
-                    if target < asyncio.run(aioca.caget(nm + ':I')):
-                        asyncio.run(
-                            aioca.caput(nm + ':SETI', target - .2)
-                        )
-                except:
-                    stop.set()
-                    self.updateAssistantSignal.emit(f'{self.name} was unable to communicate with {nm}.', 'Warning')
-                    return None
-            if self.CheckForInterrupt(pause, stop, timeout = 2):
-                return 1
-            for d, target in parameters.items():
-                nm = d.split()[0]
-                asyncio.run(
-                    aioca.caput(nm + ':SETI', target)
-                )
-            self.CheckForInterrupt(pause, stop, timeout = 1)
+            names = np.array([d.split()[0] for d in parameters]) # strip the index attached to this PV name in the inDict
+            targets = np.array(list(parameters.values()), dtype = float)
+            try:
+                readbacks = np.array(channelaccess.Run(aioca.caget([nm + ':I' for nm in names])), dtype = float)
+            except:
+                stop.set()
+                self.updateAssistantSignal.emit(f'{self.name} was unable to communicate with one or more of {', '.join(names)}.', 'Warning')
+                return None
+            # approach targets from below to account for hysteresis.
+            below = targets < readbacks
+            if np.any(below):
+                channelaccess.Run(aioca.caput([nm + ':SETI' for nm in names[below]], list(targets[below] - .2)))
+                if self.WaitForSettle(pause, stop, names[below], targets[below] - .2):
+                    return 1
+            channelaccess.Run(aioca.caput([nm + ':SETI' for nm in names], list(targets)))
+            self.WaitForSettle(pause, stop, names, targets)
         except :
             pass
         return 1
 
+    def WaitForSettle(self, pause, stop, names, targets, tolerance = .02, timeout = 2):
+        '''Polls the readbacks of `names` together until each is within `tolerance` of its target, or `timeout` seconds pass.\n
+        A running average of how long each magnet takes is kept in `settleTimes`, and a magnet is only polled once most of its average settle time
+        has passed (at most half of `timeout`), so slow magnets are not read back repeatedly while they are still ramping, and a single long move
+        does not hold up the next small step. Returns True if stop is triggered otherwise False.'''
+        t0 = time.time()
+        settled = np.zeros(len(names), dtype = bool)
+        expected = np.minimum(.8 * np.array([self.settleTimes.get(nm, 0) for nm in names]), .5 * timeout)
+        while not np.all(settled):
+            if self.CheckForInterrupt(pause, stop, timeout = .1):
+                return True
+            due = ~settled & (expected <= time.time() - t0)
+            try:
+                readbacks = np.array(channelaccess.Run(aioca.caget([nm + ':I' for nm in names[due]])), dtype = float) if np.any(due) else np.array([])
+                justSettled = np.flatnonzero(due)[np.abs(readbacks - targets[due]) <= tolerance]
+            except:
+                justSettled = []
+            elapsed = time.time() - t0
+            for idx in justSettled:
+                previous = self.settleTimes.get(names[idx], elapsed)
+                self.settleTimes[names[idx]] = .5 * (previous + elapsed)
+            settled[justSettled] = True
+            if elapsed > timeout:
+                print(f'{', '.join(names[~settled])} did not settle within {timeout} s.')
+                break
+        return False
+
     def CheckForInterrupt(self, pause, stop, timeout = 0):
         '''Returns True if stop is triggered otherwise False'''
         t0 = time.time()
@@ -1167,13 +1597,11 @@ class SingleTaskGP(Draggable):
             3. Return
         '''
         dtype = kwargs.pop('dtype', np.float32)
-        numRepeats = 1
         self.simulator.numParticles = self.numParticles
         if not self.sharedMemoryCreated:
             self.sharedMemory = SharedMemory(name = sharedMemoryName)
             self.sharedMemoryCreated = True
         data = np.ndarray(shape = shape, dtype = dtype, buffer = self.sharedMemory.buf)
-        result = np.zeros((numRepeats, self.numObjectives + self.numConstraints + self.numObservers))
         for d in parameters:
             idx = int(d.split('Index: ')[1].split(')')[0])
             # convert steerer values to mrad.
@@ -1183,45 +1611,20 @@ class SingleTaskGP(Draggable):
             elif 'VSTR' in d:
                 self.simulator.lattice[idx].KickAngle[1] = parameters[d] * 1e-3
                 self.simulator.lattice[idx].KickAngle[1] = parameters[d] * 1e-3
-        for r in range(numRepeats):
-            tracking, _ = self.simulator.TrackBeam(self.numParticles)
-            # Important - set columns to NaN if any entries in column are NaN
-            tracking[:, np.isnan(tracking).any(axis = 0)] = np.nan
-            # Compute results
-            for it, o in enumerate(self.objectives):
-                result[r, it] = self.computations[o['dtype']](tracking, o['index'])
-                self.CheckForInterrupt(pause, stop)
-            for it, c in enumerate(self.constraints):
-                result[r, it + self.numObjectives] = self.computations[c['dtype']](tracking, c['index'])
-                self.CheckForInterrupt(pause, stop)
-            for it, ob in enumerate(self.observers):
-                result[r, it + self.numObjectives + self.numConstraints] = self.computations[ob['dtype']](tracking, ob['index'])
-                self.CheckForInterrupt(pause, stop)
+        # objectives, then constraints, then observers.
+        observed = self.objectives + self.constraints + self.observers
+        columns = [self.simulator.Column(o['index']) for o in observed]
+        dtypes = [o['dtype'] for o in observed]
+        # all repeats are tracked as one beam of independent bunches, particles lost at an element are excluded there.
+        tracking, _ = self.simulator.TrackBeam(self.numParticles * self.numRepeats)
+        result = ExtractObservables(tracking, columns, dtypes, self.numParticles, self.numRepeats)
+        self.CheckForInterrupt(pause, stop)
+        if self.numRepeats == 1:
+            np.copyto(data, result)
+            return data
         np.copyto(data, np.nanmean(result, axis = 0))
-        return data
-
-    def GetCharge(self, tracking, index):
-        '''Returns charge at an element in units of fundamental charge, q.'''
-        return np.sum(np.where(np.any(np.isnan(tracking[:, :, index, 0]), axis = 0), False, True))
-
-    def GetX(self, tracking, index):
-        '''Returns the centroid of the beam in the horizontal axis at an element.'''
-        return np.nanmean(tracking[0, :, index, 0])
-
-    def GetY(self, tracking, index):
-        '''Returns the centroid of the beam in the vertical axis at an element.'''
-        return np.nanmean(tracking[2, :, index, 0])
-
-    def GetXP(self, tracking, index):
-        '''Returns the horizontal momentum of the beam at an element.'''
-        return np.nanmean(tracking[1, :, index, 0])
-
-    def GetYP(self, tracking, index):
-        '''Returns the vertical momentum of the beam at an element.'''
-        return np.nanmean(tracking[3, :, index, 0])
-    
-    def GetSurvivalRate(self, tracking, index):
-        return np.sum(np.where(np.any(np.isnan(tracking[:, :, index, 0]), axis = 0), False, True)) / self.numParticles
+        # return every repeat so their spread can be passed to the optimiser as observation noise.
+        return result
 
     def SwitchMode(self):
         if cothread.AVAILABLE:
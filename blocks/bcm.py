@@ -32,6 +32,7 @@ class BCM(PV):
             yMask = np.isinf(downstreamData[2, :, self.settings['linkedElement'].Index])
             finalMask = ~xMask & ~yMask # bitwise AND on the negated xMask and yMask, so only entries that are not NaN in both are recorded.
             self.data = finalMask.sum()
+            self.MarkDataReady()
 
     def UpdateColors(self):
         pass
\ No newline at end of file
@@ -1,12 +1,14 @@
 from PySide6.QtWidgets import QWidget, QGraphicsProxyWidget, QLineEdit, QVBoxLayout, QSizePolicy
 from PySide6.QtCore import Qt, Signal
-from threading import Thread, Event, Lock
+from threading import Event, Lock
+import numpy as np
 from ..draggable import Draggable
 from ..pv import PV
 from ..number import Number
 from ..kernels.kernel import Kernel
 from ..filters.filter import Filter
 from ...utils import commands
+from ...utils import evaluation
 from ... import style
 from ... import shared
 
@@ -24,6 +26,8 @@ class Composition(Draggable):
         self.checkDone = Event()
         self.lock = Lock()
         self.blockType = 'Add'
+        self.evaluatedTick = None # evaluation tick the value in `data` was computed on.
+        self.displayedTick = None
         self.widget = QWidget()
         self.widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.widget.setLayout(QVBoxLayout())
@@ -172,12 +176,45 @@ class Composition(Draggable):
     def CheckState(self):
         pass
 
+    def Start(self):
+        '''Returns this block\'s value, computed from its inputs at most once per evaluation tick.'''
+        tick = evaluation.tick
+        with self.lock:
+            if self.evaluatedTick != tick:
+                inputs = [ID for ID in self.linksIn if shared.entities[ID].type != 'Group']
+                if len(inputs) > 0:
+                    try:
+                        self.data[1] = self.Combine([shared.entities[ID].Start() for ID in inputs])
+                    except:
+                        pass
+                self.evaluatedTick = tick
+            return self.data[1]
+
+    def Combine(self, values: list):
+        '''To be overriden by child class, combines the values of this block\'s inputs.'''
+        pass
+
+    def RefreshDisplay(self):
+        '''Called periodically by the channel access service to display this block\'s value, which is only recomputed if an input has changed since it was last shown.\n
+        Returns False once the block is closed.'''
+        if self.stopCheckThread.is_set():
+            self.checkThreadIsClosed.set()
+            return False
+        if not hasattr(self, 'edit'):
+            return True
+        if len(self.linksIn) == 0:
+            self.editSignal.emit('N/A')
+            return True
+        if isinstance(shared.entities[next(iter(self.linksIn.keys()))], Kernel) or self.displayedTick == evaluation.tick:
+            return True
+        self.displayedTick = evaluation.tick
+        result = self.Start()
+        self.editSignal.emit(f'{result:.3f}') if not np.isinf(result) and not np.isnan(result) else self.editSignal.emit('N/A')
+        return True
+
     def BaseStyling(self):
         super().BaseStyling()
         if shared.lightModeOn:
             pass
         else:
             self.widget.setStyleSheet(style.WidgetStyle(color = '#2e2e2e', borderRadiusBottomLeft = 8, borderRadiusBottomRight = 8))
-
-    def CheckValue(self):
-        pass
\ No newline at end of file
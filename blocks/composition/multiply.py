@@ -1,13 +1,10 @@
 from PySide6.QtWidgets import QGraphicsProxyWidget
 from PySide6.QtCore import Signal
-import matplotlib.style as mplstyle
-mplstyle.use('fast')
-from threading import Thread
 import numpy as np
-from ..kernels.kernel import Kernel
 from .composition import Composition
 from ..draggable import Draggable
 from ...utils.entity import Entity
+from ...utils import channelaccess
 from ... import shared
 
 class Multiply(Composition):
@@ -16,48 +13,15 @@ class Multiply(Composition):
         super().__init__(parent, proxy, name = kwargs.pop('name', 'Multiply'), type = 'Multiply', size = kwargs.pop('size', [250, 100]), **kwargs)
         self.hasBeenPushed = False
         self.CreateEmptySharedData(np.empty(2))
-        Thread(target = self.CheckValue, daemon = True).start()
+        channelaccess.Watch(self.ID, self.RefreshDisplay)
     
     def Push(self):
         super().Push()
         self.AddSocket('in', 'F', acceptableTypes = [Draggable])
 
-    def Start(self):
-        with self.lock:
-            self.valueRequest.set()
-        self.valueReady.wait()
-        with self.lock:
-            self.valueRequest.clear()
-            self.valueReady.clear()
-        return self.data[1]
-    
-    def CheckValue(self):
-        '''Periodically computes this block\'s value.'''
-        returnNewValue = False
-        while True:
-            if self.stopCheckThread.is_set():
-                break
-            if len(self.linksIn) > 0:
-                if not isinstance(shared.entities[next(iter(self.linksIn.keys()))], (Kernel)):
-                    if hasattr(self, 'edit'):
-                        try:
-                            with self.lock:
-                                if self.valueRequest.is_set():
-                                    returnNewValue = True
-                            result = np.prod([shared.entities[ID].Start() for ID in self.linksIn if shared.entities[ID].type != 'Group'])
-                            self.editSignal.emit(f'{result:.3f}') if not np.isinf(result) and not np.isnan(result) else self.editSignal.emit('N/A')
-                            self.data[1] = result
-                        except:
-                            pass
-                        with self.lock:
-                            if returnNewValue:
-                                self.valueReady.set()
-                        returnNewValue = False
-            else:
-                if hasattr(self, 'edit'):
-                    self.editSignal.emit('N/A')
-            self.stopCheckThread.wait(timeout = .1)
-    
+    def Combine(self, values: list):
+        return np.prod(values)
+
     def k(self, X1, X2):
         result = 1
         for ID in self.linksIn:
@@ -1,13 +1,13 @@
 from PySide6.QtWidgets import QGraphicsProxyWidget, QSpacerItem, QSizePolicy
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt
 import numpy as np
 from scipy.linalg import svd
-from copy import deepcopy
 from .composition import Composition
 from ...components.slider import SliderComponent
 from ...ui.runningcircle import RunningCircle
 from ...actions.offline.svd import SVDAction
-# from ...utils.multiprocessing import PerformAction
+from ...utils import completion
+from ...utils.multiprocessing import PerformAction
 from ... import shared
 
 class SVD(Composition):
@@ -86,46 +86,41 @@ class SVD(Composition):
             if shared.entities[ID].type == 'View':
                 shared.entities[ID].firstDraw = True
         
+        def RunTrajectory():
+            self.PerformSVD()
+            self.offlineAction.correctors = self.correctors
+            self.offlineAction.BPMs = self.BPMs
+            self.offlineAction.lattice = shared.lattice
+            self.offlineAction.U = self.U
+            self.offlineAction.s = self.s
+            self.offlineAction.VT = self.VT
+            if not self.offlineAction.CheckForValidInputs():
+                return
+            if not PerformAction(
+                self, 
+                np.empty((len(self.BPMs), 2)), # list of tuples where x0 = x, and x1...n are y values for different methods.
+            ):
+                shared.workspace.assistant.PushMessage('SVD trajectory calculation already running.', 'Error')
+            self.title.setText(f'{self.title.text().split(' (')[0]} (Running)')
+            ResetTitle = lambda: self.title.setText(self.title.text().split(' (')[0])
+            completion.WhenReady([self], ResetTitle, onFailure = ResetTitle)
+
         if setpoints is None:
             # will be deprecated in the future ...
             inputs = [{'ID': ORMEntity.ID, 'stream': self.streamTypesIn[ORMEntity.ID]}]
-            self.offlineAction.ReadDependents(inputs)
+            self.title.setText(f'{self.title.text().split(' (')[0]} (Waiting)')
+            if not self.online:
+                self.offlineAction.ReadDependents(inputs, callback = RunTrajectory)
+            else:
+                self.offlineAction.ReadDependents(inputs)
         else:
             if not self.online:
-                for it, c in enumerate(ORMEntity.correctors.values()):
+                # as an independent, the SVD is set once all of its correctors hold their setpoints.
+                self.dataReady.clear()
+                correctors = list(ORMEntity.correctors.values())
+                for it, c in enumerate(correctors):
                     c.Start(setpoint = setpoints[it], child = self)
-
-        def WaitForResults():
-            if not self.offlineAction.resultsWritten:
-                self.title.setText(f'{self.title.text().split(' (')[0]} (Waiting)')
-                return QTimer.singleShot(self.offlineAction.timeBetweenPolls, WaitForResults)
-            else:
-                if not self.online:
-                    if setpoints is None:
-                        self.PerformSVD()
-                        self.offlineAction.correctors = self.correctors
-                        self.offlineAction.BPMs = self.BPMs
-                        self.offlineAction.lattice = deepcopy(shared.lattice)
-                        self.offlineAction.U = self.U
-                        self.offlineAction.s = self.s
-                        self.offlineAction.VT = self.VT
-                        if not self.offlineAction.CheckForValidInputs():
-                            return
-                        if not PerformAction(
-                            self, 
-                            np.empty((len(self.BPMs), 2)), # list of tuples where x0 = x, and x1...n are y values for different methods.
-                        ):
-                            shared.workspace.assistant.PushMessage('SVD trajectory calculation already running.', 'Error')
-                        
-                        def WaitForActionToFinish():
-                            if np.isinf(self.data).any():
-                                self.title.setText(f'{self.title.text().split(' (')[0]} (Running)')
-                                QTimer.singleShot(100, WaitForActionToFinish)
-                                return
-                            
-                        WaitForActionToFinish()
-
-        WaitForResults()
+                completion.WhenReady(correctors, self.MarkDataReady)
         print('Finished setting / getting setpoints of correctors.')
 
     def AddLinkIn(self, ID, socket):
@@ -40,6 +40,7 @@ class Corrector(PV):
             self.sharedMemory = SharedMemory(name = self.dataSharedMemoryName)
             self.data = np.ndarray(self.dataSharedMemoryShape, self.dataSharedMemoryDType, buffer = self.sharedMemory.buf)
         self.data[:] = np.inf
+        self.dataReady.clear()
         child = kwargs.get('child', None)
         if child is None or (child is not None and not child.online):
             if setpoint is not None:
@@ -48,6 +49,7 @@ class Corrector(PV):
                 self.data[0] = setpoint
             else:
                 self.data[0] = self.settings['components']['value']['value']
+            self.MarkDataReady()
 
     def UpdateColors(self):
         super().UpdateColors()
@@ -10,6 +10,7 @@ from ..utils.entity import Entity
 from ..utils.transforms import MapDraggableRectToScene
 from .socket import Socket
 from ..utils.multiprocessing import TogglePause, StopAction
+from ..utils import evaluation
 from .. import style
 from .. import shared
 
@@ -27,7 +28,6 @@ class Draggable(Entity, QWidget):
         self.fundamental = True
         self.proxy = proxy
         self.lock = Lock()
-        self.valueRequest, self.valueReady = Event(), Event()
         self.checkThread = None # every draggable has an optional check thread responsible for updating its value displayed to the user regularly.
         self.stopCheckThread = Event() # force the check thread to close when exiting and saving.
         self.checkThreadIsClosed = Event()
@@ -94,6 +94,12 @@ class Draggable(Entity, QWidget):
             shared.workspace.assistant.PushMessage(f'Entity {self.ID} name changed to: {value}')
         super().__setattr__(name, value)
 
+    def Rename(self, name: str):
+        '''Renames the block, updating its settings and title.'''
+        self.name = name
+        self.settings['name'] = name
+        self.title.setText(name)
+
     def Push(self):
         # Add widget sections to the layout.
         self.layout().addWidget(self.FSocketWidgets)
@@ -440,6 +446,7 @@ class Draggable(Entity, QWidget):
         if self.type != 'Group' and shared.entities[ID].groupID is not None and shared.entities[ID].groupID != self.groupID:
             self.AddLinkIn(shared.entities[ID].groupID, socket, Z = -101, hide = True)
             shared.entities[shared.entities[ID].groupID].AddLinkOut(self.ID, socket)
+        evaluation.Invalidate() # the inputs of this block have changed.
         return True
 
     # this can be overridden to trigger logic that should run when removing incoming links to a block.
@@ -447,6 +454,7 @@ class Draggable(Entity, QWidget):
         shared.editors[0].scene.removeItem(self.linksIn[ID]['link'])
         self.linksIn.pop(ID)
         self.settings['linksIn'].pop(ID)
+        evaluation.Invalidate()
         # Check to see if any group links should be removed.
         if shared.entities[ID].type != 'Group' and shared.entities[ID].groupID is not None:
             shouldRemoveGroupLink = True
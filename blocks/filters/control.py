@@ -3,6 +3,7 @@ from PySide6.QtCore import Qt
 import numpy as np
 from .filter import Filter
 from ..draggable import Draggable
+from ...utils import evaluation
 from ... import shared
 from ... import style
 
@@ -60,6 +61,7 @@ class Control(Filter):
 
     def Switch(self):
         self.settings['onControl'] = not self.settings['onControl']
+        evaluation.Invalidate()
         if self.settings['onControl']:
             shared.workspace.assistant.PushMessage(f'{self.name} now ALLOWS input signal propagation upon detecting any non-zero control signals.')
             self.switch.setText('Allow')
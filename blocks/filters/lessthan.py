@@ -2,6 +2,7 @@ from PySide6.QtWidgets import QLineEdit, QGraphicsProxyWidget
 from PySide6.QtCore import Qt
 import numpy as np
 from .filter import Filter
+from ...utils import evaluation
 from ... import shared
 from ... import style
 
@@ -51,4 +52,5 @@ class LessThan(Filter):
         newEdit.returnPressed.connect(self.ChangeEdit)
         self.edit = newEdit
         self.widget.layout().insertWidget(editIdx, newEdit, alignment = Qt.AlignCenter)
-        self.settings['threshold'] = value
\ No newline at end of file
+        self.settings['threshold'] = value
+        evaluation.Invalidate()
\ No newline at end of file
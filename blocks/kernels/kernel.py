@@ -1,19 +1,16 @@
 from PySide6.QtWidgets import QWidget, QPushButton, QLabel, QGridLayout, QHBoxLayout, QSizePolicy, QLineEdit, QGraphicsProxyWidget
 from PySide6.QtCore import Qt, QPointF
 import numpy as np
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-import matplotlib.style as mplstyle
-mplstyle.use('fast')
 from ..draggable import Draggable
 from ...components.kernel import KernelComponent
 from ... import shared
 from ...ui.kernelmenu import KernelMenu
+from ...utils import startup
 from ... import style
 
-# plt.rcParams['text.usetex'] = True
-plt.rcParams['font.size'] = 14
+# imported on the first figure, plot settings are applied then by the hook registered in __main__.
+mplFigure = startup.Lazy('matplotlib.figure')
+mplBackend = startup.Lazy('matplotlib.backends.backend_qtagg')
 
 class Kernel(Draggable):
     def __init__(self, parent, proxy: QGraphicsProxyWidget, **kwargs):
@@ -206,11 +203,11 @@ class Kernel(Draggable):
         self.widget.layout().setContentsMargins(5, 5, 5, 5)
         self.widget.layout().setSpacing(5)
         # setup figure
-        self.figure = Figure(figsize = (8, 8), dpi = 100)
+        self.figure = mplFigure.Figure(figsize = (8, 8), dpi = 100)
         self.figure.subplots_adjust(left = .015, right = .985, top = .985, bottom = .015)
         self.figure.set_facecolor('none')
         self.ax = self.figure.add_subplot(111)
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = mplBackend.FigureCanvasQTAgg(self.figure)
         self.canvas.setAttribute(Qt.WA_TransparentForMouseEvents)
         self.canvas.setStyleSheet('background: transparent')
         self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -1,13 +1,7 @@
 from PySide6.QtWidgets import QGraphicsProxyWidget
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.style as mplstyle
-mplstyle.use('fast')
 from .kernel import Kernel
 
-# plt.rcParams['text.usetex'] = True
-plt.rcParams['font.size'] = 14
-
 class PeriodicKernel(Kernel):
     def __init__(self, parent, proxy: QGraphicsProxyWidget, **kwargs):
         '''Accepts `name` and `type` overrides for entity.'''
@@ -3,6 +3,7 @@ from PySide6.QtCore import Qt
 import numpy as np
 from .draggable import Draggable
 from ..utils.entity import Entity
+from ..utils import evaluation
 from .. import shared
 from .. import style
 
@@ -50,6 +51,7 @@ class Number(Draggable):
         self.edit.deleteLater()
         self.data[0] = value
         self.settings['numberValue'] = value
+        evaluation.Invalidate()
         newEdit = QLineEdit(f'{value:.3f}')
         newEdit.setFixedSize(100, 40)
         newEdit.setAlignment(Qt.AlignCenter)
@@ -1,7 +1,7 @@
 from PySide6.QtWidgets import QWidget, QLabel, QMenu, QSpacerItem, QGraphicsProxyWidget, QSizePolicy, QPushButton, QVBoxLayout, QHBoxLayout
 from PySide6.QtCore import Qt, QPoint
 import numpy as np
-from copy import deepcopy
+import multiprocessing
 from .draggable import Draggable
 from .pv import PV
 from .. import shared
@@ -10,7 +10,7 @@ from ..components.slider import SliderComponent
 from ..actions.offline.orbitresponse import OrbitResponseAction
 from ..ui.runningcircle import RunningCircle
 from ..utils import cothread
-# from ..utils.multiprocessing import PerformAction, TogglePause, StopAction
+from ..utils.multiprocessing import PerformAction, TogglePause, StopAction
 
 '''
 Orbit Response Block handles orbit response measurements off(on)line. It has two F sockets, one for Correctors, one for BPMs. 
@@ -21,11 +21,14 @@ to save the data, or for further processing in a pipeline.
 
 class OrbitResponse(Draggable):
     def __init__(self, parent, proxy: QGraphicsProxyWidget, **kwargs):
-        super().__init__(proxy, name = kwargs.pop('name', 'Orbit Response'), type = 'Orbit Response', size = kwargs.pop('size', [575, 440]), **kwargs)
+        # sessions saved before a setting existed pass it as None, so drop those to fall back on the defaults below.
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        super().__init__(proxy, name = kwargs.pop('name', 'Orbit Response'), type = 'Orbit Response', size = kwargs.pop('size', [575, 560]), trackingMode = kwargs.pop('trackingMode', 'Single pass'), engine = kwargs.pop('engine', 'Macro-particle'), parallel = kwargs.pop('parallel', 'Serial'), order = kwargs.pop('order', 'Linear'), **kwargs)
         self.parent = parent
         self.correctors = dict()
         self.BPMs = dict()
         self.ORM = np.empty((0,))
+        self.ORMUncertainty = np.empty((0,))
         self.setStyleSheet('background: none')
         self.settings['components'] = {
             'current': dict(name = 'Current', value = .5, min = .01, max = 5, default = .5, units = 'mrad', type = SliderComponent),
@@ -74,6 +77,20 @@ class OrbitResponse(Draggable):
                 'cmapLabel': r'$\Delta~$mm / mrad',
                 'data': self.ORM
             },
+            'uncertainty': lambda: {
+                'xlabel': 'Corrector Number',
+                'ylabel': 'BPM Number',
+                'xticks': np.arange(len(self.correctors)),
+                'yticks': np.arange(len(self.BPMs)),
+                'xticklabels': [c.name for c in self.correctors.values()],
+                'yticklabels': [b.name for b in self.BPMs.values()],
+                'xunits': '',
+                'yunits': '',
+                'plottype': 'imshow',
+                'cmap': 'viridis',
+                'cmapLabel': r'$\sigma~$mm / mrad',
+                'data': self.ORMUncertainty
+            },
         }
         shared.runnableBlocks[self.ID] = self
         self.Push()
@@ -119,7 +136,7 @@ class OrbitResponse(Draggable):
         self.orderTitle = QLabel('Fit (least squares)')
         self.orderTitle.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', padding = 0))
         self.orderMenu = QMenu()
-        self.orderOptions = QPushButton('Linear        \u25BC')
+        self.orderOptions = QPushButton(f'{self.settings['order']:<14}\u25BC')
         self.orderOptions.setStyleSheet(style.PushButtonStyle(color = '#1e1e1e', fontColor = '#c4c4c4', padding = 5, textAlign = 'right'))
         self.orderOptions.setFixedWidth(115)
         self.orderOptions.clicked.connect(self.ShowMenu)
@@ -129,6 +146,58 @@ class OrbitResponse(Draggable):
         self.order.layout().addItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Preferred))
         self.order.layout().addWidget(self.orderOptions)
         self.widget.layout().addWidget(self.order)
+        # Model engine (offline only)
+        self.engine = QWidget()
+        self.engine.setLayout(QHBoxLayout())
+        self.engine.layout().setContentsMargins(15, 10, 15, 0)
+        self.engineTitle = QLabel('Engine (offline)')
+        self.engineTitle.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', padding = 0))
+        self.engineMenu = QMenu()
+        self.engineOptions = QPushButton(f'{self.settings['engine']:<16}\u25BC')
+        self.engineOptions.setStyleSheet(style.PushButtonStyle(color = '#1e1e1e', fontColor = '#c4c4c4', padding = 5, textAlign = 'right'))
+        self.engineOptions.setFixedWidth(135)
+        self.engineOptions.clicked.connect(self.ShowEngineMenu)
+        self.engineMenu.addAction('Analytic', lambda: self.SetEngine('Analytic'))
+        self.engineMenu.addAction('Single-particle', lambda: self.SetEngine('Single-particle'))
+        self.engineMenu.addAction('Macro-particle', lambda: self.SetEngine('Macro-particle'))
+        self.engine.layout().addWidget(self.engineTitle)
+        self.engine.layout().addItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Preferred))
+        self.engine.layout().addWidget(self.engineOptions)
+        self.widget.layout().addWidget(self.engine)
+        # Tracking mode (offline only)
+        self.tracking = QWidget()
+        self.tracking.setLayout(QHBoxLayout())
+        self.tracking.layout().setContentsMargins(15, 10, 15, 0)
+        self.trackingTitle = QLabel('Tracking (offline)')
+        self.trackingTitle.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', padding = 0))
+        self.trackingMenu = QMenu()
+        self.trackingOptions = QPushButton(f'{self.settings['trackingMode']:<14}\u25BC')
+        self.trackingOptions.setStyleSheet(style.PushButtonStyle(color = '#1e1e1e', fontColor = '#c4c4c4', padding = 5, textAlign = 'right'))
+        self.trackingOptions.setFixedWidth(115)
+        self.trackingOptions.clicked.connect(self.ShowTrackingMenu)
+        self.trackingMenu.addAction('Single pass', lambda: self.SetTrackingMode('Single pass'))
+        self.trackingMenu.addAction('Per BPM', lambda: self.SetTrackingMode('Per BPM'))
+        self.tracking.layout().addWidget(self.trackingTitle)
+        self.tracking.layout().addItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Preferred))
+        self.tracking.layout().addWidget(self.trackingOptions)
+        self.widget.layout().addWidget(self.tracking)
+        # Serial or process pool corrector sweep (offline only)
+        self.parallel = QWidget()
+        self.parallel.setLayout(QHBoxLayout())
+        self.parallel.layout().setContentsMargins(15, 10, 15, 0)
+        self.parallelTitle = QLabel(f'Corrector sweep (offline, {multiprocessing.cpu_count()} cores)')
+        self.parallelTitle.setStyleSheet(style.LabelStyle(fontColor = '#c4c4c4', padding = 0))
+        self.parallelMenu = QMenu()
+        self.parallelOptions = QPushButton(f'{self.settings['parallel']:<16}\u25BC')
+        self.parallelOptions.setStyleSheet(style.PushButtonStyle(color = '#1e1e1e', fontColor = '#c4c4c4', padding = 5, textAlign = 'right'))
+        self.parallelOptions.setFixedWidth(135)
+        self.parallelOptions.clicked.connect(self.ShowParallelMenu)
+        self.parallelMenu.addAction('Serial', lambda: self.SetParallel('Serial'))
+        self.parallelMenu.addAction('Process pool', lambda: self.SetParallel('Process pool'))
+        self.parallel.layout().addWidget(self.parallelTitle)
+        self.parallel.layout().addItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Preferred))
+        self.parallel.layout().addWidget(self.parallelOptions)
+        self.widget.layout().addWidget(self.parallel)
         # # Corrector step current / kick
         self.CreateSection('current', 'Kick / step (mrad)', 1e6, 3)
         # Corrector steps
@@ -157,13 +226,17 @@ class OrbitResponse(Draggable):
         if not self.online:
             self.offlineAction.correctors = self.correctors
             self.offlineAction.BPMs = self.BPMs
-            self.offlineAction.lattice = deepcopy(shared.lattice)
+            self.offlineAction.lattice = shared.lattice
             if not self.offlineAction.CheckForValidInputs():
                 return
             onlineText = 'offline'
             shared.workspace.assistant.PushMessage(f'Running orbit response measurement ({onlineText}).')
             numBPMs = len(self.BPMs.keys())
             numCorrectors = len(self.correctors.keys())
+            # Slope uncertainties from the fit are written to a second shared array alongside the ORM.
+            if hasattr(self, 'ORMUncertaintySharedMemory'):
+                self.ORMUncertaintySharedMemory.unlink()
+            self.CreateEmptySharedData(np.empty((numBPMs, numCorrectors)), attrName = 'ORMUncertainty')
             # Invoke Start() methods of children to generate data
             if not PerformAction(
                 self,
@@ -175,7 +248,13 @@ class OrbitResponse(Draggable):
                 numSteps = self.settings['components']['steps']['value'],
                 stepKick = self.settings['components']['current']['value'],
                 repeats = self.settings['components']['repeats']['value'],
-                getRawData = False,
+                trackingMode = self.settings['trackingMode'],
+                engine = self.settings['engine'],
+                numWorkers = multiprocessing.cpu_count() if self.settings['parallel'] == 'Process pool' else 1,
+                order = self.settings['order'],
+                uncertaintySharedMemoryName = self.ORMUncertaintySharedMemory.name,
+                uncertaintyShape = self.ORMUncertainty.shape,
+                uncertaintyDType = self.ORMUncertainty.dtype,
             ):
                 shared.workspace.assistant.PushMessage('Orbit response measurement already running.', 'Error')
 
@@ -190,6 +269,8 @@ class OrbitResponse(Draggable):
         # remove the data from memory to stop it persisting after closing the application.
         self.dataSharedMemory.unlink()
         self.ORMSharedMemory.unlink()
+        if hasattr(self, 'ORMUncertaintySharedMemory'):
+            self.ORMUncertaintySharedMemory.unlink()
 
     def SwitchMode(self):
         if cothread.AVAILABLE:
@@ -203,15 +284,44 @@ class OrbitResponse(Draggable):
             shared.workspace.assistant.PushMessage(f'Online mode has been disabled because cothread is not available on your machine.', 'Warning')
 
     def SetOrderLinear(self):
+        self.settings['order'] = 'Linear'
         self.orderOptions.setText('Linear        \u25BC')
     
     def SetOrderQuadratic(self):
+        self.settings['order'] = 'Quadratic'
         self.orderOptions.setText('Quadratic     \u25BC')
 
     def ShowMenu(self):
         position = self.orderOptions.mapToGlobal(QPoint(0, self.orderOptions.height()))
         self.orderMenu.popup(position)
 
+    def SetTrackingMode(self, trackingMode):
+        '''`Single pass` reads every BPM from one tracking pass per step, `Per BPM` tracks a separate pass for each BPM.'''
+        self.settings['trackingMode'] = trackingMode
+        self.trackingOptions.setText(f'{trackingMode:<14}\u25BC')
+
+    def SetEngine(self, engine):
+        '''`Analytic` builds the ORM from linear transfer matrices, `Single-particle` tracks the central trajectory and `Macro-particle` tracks a full beam.'''
+        self.settings['engine'] = engine
+        self.engineOptions.setText(f'{engine:<16}\u25BC')
+
+    def ShowEngineMenu(self):
+        position = self.engineOptions.mapToGlobal(QPoint(0, self.engineOptions.height()))
+        self.engineMenu.popup(position)
+
+    def SetParallel(self, parallel):
+        '''`Process pool` splits the offline corrector sweep across one worker process per CPU core.'''
+        self.settings['parallel'] = parallel
+        self.parallelOptions.setText(f'{parallel:<16}\u25BC')
+
+    def ShowParallelMenu(self):
+        position = self.parallelOptions.mapToGlobal(QPoint(0, self.parallelOptions.height()))
+        self.parallelMenu.popup(position)
+
+    def ShowTrackingMenu(self):
+        position = self.trackingOptions.mapToGlobal(QPoint(0, self.trackingOptions.height()))
+        self.trackingMenu.popup(position)
+
     def mousePressEvent(self, event):
         self.startPos = event.pos()
         if self.canDrag or (self.hoveringSocket and self.hoveringSocket.name != 'Output'):
@@ -1,24 +1,22 @@
 from PySide6.QtWidgets import QWidget, QLabel, QPushButton, QSizePolicy, QGridLayout, QHBoxLayout, QVBoxLayout, QSpacerItem
 from PySide6.QtCore import Qt, Signal
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-import matplotlib.style as mplstyle
-from matplotlib import ticker
 from threading import Thread
 from cycler import cycler
-mplstyle.use('fast')
 from collections import deque
 import time
-import pandas as pd
 import numpy as np
 from pathlib import Path
 from .draggable import Draggable
+from ..utils import startup
 from .. import shared
 from .. import style
 
-# plt.rcParams['text.usetex'] = True
-plt.rcParams['font.size'] = 2
+# imported on the first figure, plot settings are applied then by the hook registered in __main__.
+mplFigure = startup.Lazy('matplotlib.figure')
+mplBackend = startup.Lazy('matplotlib.backends.backend_qtagg')
+ticker = startup.Lazy('matplotlib.ticker')
+mpl = startup.Lazy('matplotlib')
+pd = startup.Lazy('pandas')
 
 class Profiler(Draggable):
     updatePlotSignal = Signal()
@@ -127,7 +125,7 @@ class Profiler(Draggable):
         self.widget.setLayout(QGridLayout())
         self.widget.layout().setContentsMargins(10, 10, 10, 10)
         self.widget.layout().setSpacing(15)
-        self.figure = Figure(figsize = (11, 5), dpi = 300)
+        self.figure = mplFigure.Figure(figsize = (11, 5), dpi = 300)
         self.figure.set_animated(True)  # Enable blitting for faster redraws
         self.figure.subplots_adjust(left = .135, right = .95, top = .975, bottom = .275)
         self.figure.set_facecolor('none')
@@ -143,7 +141,7 @@ class Profiler(Draggable):
         for label in self.ax.get_xticklabels() + self.ax.get_yticklabels():
             label.set_color('#6e6e6e')
         self.ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins = 10))
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = mplBackend.FigureCanvasQTAgg(self.figure)
         self.canvas.setFixedHeight(300)
         self.canvas.setAttribute(Qt.WA_TransparentForMouseEvents)
         self.canvas.setStyleSheet('background-color: transparent')
@@ -291,7 +289,7 @@ class Profiler(Draggable):
     def RemoveLinkIn(self, ID):
         super().RemoveLinkIn(ID)
         self.plotLines[ID].remove()
-        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        colors = mpl.rcParams['axes.prop_cycle'].by_key()['color']
         self.ax.set_prop_cycle(cycler(color = colors[len(self.plotLines) - 1:]))
         self.plotLines.pop(ID)
         self.data.drop(columns = [ID], inplace = True)
@@ -2,12 +2,12 @@ from PySide6.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QHBoxLa
 from PySide6.QtCore import Qt, Signal
 import numpy as np
 import aioca
-import asyncio
-from threading import Thread
 from .draggable import Draggable
 from ..indicator import Indicator
 from ..clickablewidget import ClickableWidget
 from .. import shared
+from ..utils import channelaccess
+from ..utils import evaluation
 from ..components import slider
 from ..components import link
 from .socket import Socket
@@ -70,11 +70,17 @@ class PV(Draggable):
         }
 
         self.PVMatch = False
-        self.checkStateOfDownstreamBlocks = False
+        self.lastMatch = ''
         self.Push()
 
-        self.checkThread = Thread(target = self.FetchAndReadValue)
-        self.checkThread.start()
+        # values are pushed in by the shared channel access service instead of being polled by a thread per block.
+        self.Subscribe()
+        channelaccess.Watch(self.ID, self.RefreshDisplay)
+
+    def Rename(self, name: str):
+        '''Renames the block and resubscribes, as the monitored PVs follow its name.'''
+        super().Rename(name)
+        self.Subscribe()
 
     def ChangeGetText(self, s):
         self.get.setText(s)
@@ -167,11 +173,8 @@ class PV(Draggable):
                 self.defaultReadOnlySignal.emit(False)
         else:
             try:
-                mn = asyncio.run(
-                    aioca.caget(PVName + ':IMIN')
-                )
-                mx = asyncio.run(
-                    aioca.caget(PVName + ':IMAX')
+                mn, mx = channelaccess.Run(
+                    aioca.caget([PVName + ':IMIN', PVName + ':IMAX']), timeout = timeout
                 )
                 if mx > mn:
                     if self.active:
@@ -199,115 +202,92 @@ class PV(Draggable):
         else:
             return self.data[0]
     
-    def FetchAndReadValue(self, timeout = .5):
-        '''Asynchronously fetch and update current value, without blocking the UI thread.'''
-        lastMatch = ''
-        # create event loop used solely by this thread to await aioca command responses.
-        while True:
-            if self.stopCheckThread.is_set():
-                break
-            try:
-                PVName = self.name
-                try:
-                    asyncio.run(
-                        aioca.caget(self.name, timeout = .25)
-                    )
-                    if self.stopCheckThread.wait(timeout = .25):
-                        break
-                    self.data[1] = asyncio.run(
-                        aioca.caget(self.name, timeout = .25)
-                    )
-                except:
-                    PVName = self.name.split(':')[0]
-                    asyncio.run(
-                        aioca.caget(PVName + ':I', timeout = .25)
-                    )
-                    if self.stopCheckThread.wait(timeout = .25):
-                        break
-                    # set value
-                    self.data[0] = asyncio.run(
-                        aioca.caget(PVName + ':SETI', timeout = .25)
-                    )
-                    # read value
-                    self.data[1] = asyncio.run(
-                        aioca.caget(PVName + ':I', timeout = .25)
-                    )
-                if self.stopCheckThread.is_set():
-                    break
-                try:
-                    self.settings['components']['value']['default'] = self.data[1]
-                    if PVName != lastMatch:
-                        try:
-                            self.PVMatch = True
-                            self.settings['components']['value']['units'] = ''
-                            shared.workspace.assistant.PushMessage(f'{PVName} is a valid PV and is now linked.') # need to move this to Signal system
-                            self.checkStateOfDownstreamBlocks = True
-                            self.online = True
-                            if self.stopCheckThread.is_set():
-                                break
-                            s = f'{self.data[1]:.3f}' if not np.isnan(self.data[1]) else 'N/A'
-                            self.getTextSignal.emit(s)
-                            self.setTextSignal.emit(s)
-                            self.UpdateUnits(PVName)
-                            try:
-                                self.UpdateInspectorLimits(PVName)
-                            except: pass
-                            lastMatch = PVName
-                        except Exception as e:
-                            print(e)
-                    else:
-                        s = f'{self.data[1]:.3f}' if not np.isnan(self.data[1]) else 'N/A'
-                        self.getTextSignal.emit(s)
-                        self.setTextSignal.emit(s)
-                except Exception as e:
-                    print(e)
-            except:
+    def Subscribe(self):
+        '''(Re)subscribe to the PV under this block's name. Both the name itself and the :I (read) and :SETI (set) records of its base name are monitored.'''
+        PVName = self.name.split(':')[0]
+        self.subscribedNames = [self.name, PVName + ':I', PVName + ':SETI']
+        self.connected = [False] * len(self.subscribedNames)
+        if self.PVMatch:
+            self.PVMatch = False
+            self.online = False
+        self.lastMatch = ''
+        try:
+            channelaccess.Subscribe(self.ID, self.subscribedNames, self.OnUpdate, notify_disconnect = True)
+        except Exception as e:
+            print(e)
+        channelaccess.RunInBackground(self.OnUnlinked, self.name)
+
+    def OnUpdate(self, value, index):
+        '''camonitor callback, runs on the channel access loop so must not block.'''
+        if self.stopCheckThread.is_set():
+            return
+        self.connected[index] = value.ok
+        if not value.ok:
+            if self.PVMatch and not any(self.connected[:2]):
                 self.PVMatch = False
                 self.online = False
-                if not np.isinf(self.data[1]) and not np.isnan(self.data[1]):
-                    try:
-                        s = f'{self.data[1]:.3f}'
-                        if lastMatch != PVName:
-                            if self.online:
-                                if self.stopCheckThread.is_set():
-                                    break
-                                self.getTextSignal.emit(s)
-                                self.setTextSignal.emit(s)
-                            else:
-                                if self.stopCheckThread.is_set():
-                                    break
-                                self.getTextSignal.emit(s)
-                                self.setTextSignal.emit(s)
-                        else:
-                            if self.stopCheckThread.is_set():
-                                break
-                            self.getTextSignal.emit(s)
-                            self.setTextSignal.emit(s)
-                    except: pass
-                else:
-                    with self.lock:
-                        if self.stopCheckThread.is_set():
-                            break
-                        self.getTextSignal.emit('N/A')
+                self.lastMatch = ''
+                channelaccess.RunInBackground(self.OnUnlinked, self.name)
+            return
+        if index == 2:
+            self.data[0] = value # set value
+            return
+        self.data[1] = value # read value
+        evaluation.Invalidate()
+        self.settings['components']['value']['default'] = self.data[1]
+        PVName = self.name if index == 0 else self.name.split(':')[0]
+        if PVName != self.lastMatch:
+            self.lastMatch = PVName
+            channelaccess.RunInBackground(self.OnLinked, PVName)
+            return
+        s = f'{self.data[1]:.3f}' if not np.isnan(self.data[1]) else 'N/A'
+        self.getTextSignal.emit(s)
+        self.setTextSignal.emit(s)
 
-                if self.active:
-                    try:
-                        if lastMatch != PVName:
-                            self.UpdateUnits(PVName)
-                            shared.inspector.expandables['value'].updateHeaderTextSignal.emit(self.settings['components']['value']['name'], self.settings['components']['value']['units'])
-                            self.UpdateInspectorLimits(PVName, makeReadOnly = False)
-                        if self.stopCheckThread.is_set():
-                                break
-                    except: pass
-            lastMatch = PVName
-            if self.checkStateOfDownstreamBlocks:
-                for ID in self.linksOut:
-                    if type(ID) == int:
-                        shared.entities[ID].CheckState()
-            self.checkStateOfDownstreamBlocks = False
-            if self.stopCheckThread.wait(timeout = timeout):
-                break
-        self.checkThreadIsClosed.set()
+    def OnLinked(self, PVName):
+        try:
+            self.PVMatch = True
+            self.settings['components']['value']['units'] = ''
+            shared.workspace.assistant.PushMessage(f'{PVName} is a valid PV and is now linked.') # need to move this to Signal system
+            self.online = True
+            if self.stopCheckThread.is_set():
+                return
+            s = f'{self.data[1]:.3f}' if not np.isnan(self.data[1]) else 'N/A'
+            self.getTextSignal.emit(s)
+            self.setTextSignal.emit(s)
+            self.UpdateUnits(PVName)
+            try:
+                self.UpdateInspectorLimits(PVName)
+            except: pass
+        except Exception as e:
+            print(e)
+        for ID in self.linksOut:
+            if type(ID) == int:
+                shared.entities[ID].CheckState()
+
+    def OnUnlinked(self, PVName):
+        if self.active:
+            try:
+                self.UpdateUnits(PVName)
+                shared.inspector.expandables['value'].updateHeaderTextSignal.emit(self.settings['components']['value']['name'], self.settings['components']['value']['units'])
+                self.UpdateInspectorLimits(PVName, makeReadOnly = False)
+            except: pass
+
+    def RefreshDisplay(self):
+        '''Called periodically by the channel access service to display values of PVs without a live link, e.g. those written by offline simulations.\n
+        Returns False once the block is closed, which also ends its subscriptions.'''
+        if self.stopCheckThread.is_set():
+            self.checkThreadIsClosed.set()
+            return False
+        if self.PVMatch:
+            return True
+        if not np.isinf(self.data[1]) and not np.isnan(self.data[1]):
+            s = f'{self.data[1]:.3f}'
+            self.getTextSignal.emit(s)
+            self.setTextSignal.emit(s)
+        else:
+            self.getTextSignal.emit('N/A')
+        return True
 
     def UpdateUnits(self, name):
         if 'STR' in name:
@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 import time
 import numpy as np
@@ -11,9 +10,12 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QTimer, QModelIndex, QSortFilterProxyModel, QItemSelectionModel
 from .draggable import Draggable
+from ..utils import startup
 from .. import shared
 from .. import style
 
+pd = startup.Lazy('pandas')
+
 class Save(Draggable):
     def __init__(self, parent, proxy: QGraphicsProxyWidget, **kwargs):
         super().__init__(
@@ -1,21 +1,18 @@
 from PySide6.QtWidgets import QWidget, QPushButton, QLabel, QSpacerItem, QGraphicsProxyWidget, QSizePolicy, QVBoxLayout, QHBoxLayout
 from PySide6.QtCore import Qt, QTimer
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-from matplotlib.colors import TwoSlopeNorm
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-import matplotlib.style as mplstyle
-mplstyle.use('fast')
 import numpy as np
 from .draggable import Draggable
 from ..ui.runningcircle import RunningCircle
 from ..ui.blitmanager import BlitManager
+from ..utils import startup
 from .. import shared
 from .. import style
 
-# plt.rcParams['text.usetex'] = True
-plt.rcParams['font.size'] = 14
+# imported on the first figure, plot settings are applied then by the hook registered in __main__.
+mplFigure = startup.Lazy('matplotlib.figure')
+mplBackend = startup.Lazy('matplotlib.backends.backend_qtagg')
+mplColors = startup.Lazy('matplotlib.colors')
+axesGrid = startup.Lazy('mpl_toolkits.axes_grid1')
 
 class View(Draggable):
     '''Displays the data of arbitrary blocks.'''
@@ -66,7 +63,7 @@ class View(Draggable):
         self.plot = QWidget()
         self.plot.setLayout(QVBoxLayout())
         self.plot.layout().setContentsMargins(15, 15, 15, 15)
-        self.figure = Figure(figsize = (6.75, 7.25), dpi = 100)
+        self.figure = mplFigure.Figure(figsize = (6.75, 7.25), dpi = 100)
         self.figure.set_facecolor('none')
         self.axes = self.figure.add_subplot(111)
         self.axes.set_aspect('auto')
@@ -77,7 +74,7 @@ class View(Draggable):
             labelsize = self.fontsize,
         )
         # self.axes.set_facecolor('none')
-        self.canvas = FigureCanvas(self.figure)
+        self.canvas = mplBackend.FigureCanvasQTAgg(self.figure)
         self.canvas.setAttribute(Qt.WA_TransparentForMouseEvents)
         self.canvas.setStyleSheet('background: transparent')
         self.plot.layout().addWidget(self.canvas)
@@ -142,10 +139,10 @@ class View(Draggable):
         
         if self.stream['plottype'] == 'imshow':
             if 'norm' in self.stream.keys():
-                im = self.axes.imshow(self.stream['data'], cmap = self.stream['cmap'], norm = TwoSlopeNorm(vcenter = self.stream['vcenter']))
+                im = self.axes.imshow(self.stream['data'], cmap = self.stream['cmap'], norm = mplColors.TwoSlopeNorm(vcenter = self.stream['vcenter']))
             else:
                 im = self.axes.imshow(self.stream['data'], cmap = self.stream['cmap'])
-            divider = make_axes_locatable(self.axes)
+            divider = axesGrid.make_axes_locatable(self.axes)
             cax = divider.append_axes("right", size = "5%", pad = 0.075)
             self.cb = self.figure.colorbar(im, cax = cax, ax = self.axes)
             self.cb.set_label(self.stream['cmapLabel'], rotation = 270, fontsize = self.fontsize, labelpad = 20, color = '#c4c4c4')
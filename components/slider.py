@@ -5,6 +5,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, Signal
 import numpy as np
 from .component import Component
+from ..utils import evaluation
 from .. import shared
 from .. import style
 
@@ -200,6 +201,7 @@ class SliderComponent(Component):
         originalState = shared.activeEditor.area.selectedBlocks[0].settings['magnitudeOnly']
         for block in shared.activeEditor.area.selectedBlocks:
             block.settings['magnitudeOnly'] = not originalState
+        evaluation.Invalidate()
         if originalState:
             self.magnitudeState.setText('No')
         else:
@@ -0,0 +1,326 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from datetime import datetime
+import multiprocessing as mp
+from multiprocessing import cpu_count
+from multiprocessing.shared_memory import SharedMemory
+from scipy.linalg import svd
+from .lattice import latticeutils
+from .simulator import ShareLattice, ExtractObservables
+from .actions.offline.orbitresponse import OrbitResponseAction
+from .actions.offline.svd import SVDAction
+from .actions.offline.singletaskgp import SingleTaskGPAction
+from .utils import journal
+from . import shared
+
+'''
+Headless pipeline runner. Loads a saved session, rebuilds the block graph as plain data and runs its
+Single Task GP, Orbit Response and SVD blocks offline without a GUI, writing results to the datadump folder.
+
+Navigate up a level to the folder containing the repository and run:
+    python -m pipelines.headless [--session PATH] [--lattice NAME] [--block NAME_OR_ID ...]
+'''
+
+runnableTypes = ['Orbit Response', 'SVD', 'Single Task GP']
+
+class Node:
+    '''Plain data stand-in for a block in a saved session.'''
+    def __init__(self, ID, settings: dict):
+        self.ID = ID
+        self.settings = settings
+        self.name = settings['name']
+        self.type = settings['type']
+        self.linksIn = settings.get('linksIn', dict()) # { source ID: socket name }
+        self.linksOut = settings.get('linksOut', dict())
+
+    def Inputs(self, graph: dict, socket: str) -> list:
+        '''Returns the nodes linked into `socket`, skipping groups.'''
+        return [graph[ID] for ID, s in self.linksIn.items() if s == socket and ID in graph and graph[ID].type != 'Group']
+
+    @property
+    def index(self) -> int:
+        return self.settings['linkedElement']
+
+    @property
+    def value(self) -> dict:
+        return self.settings['components']['value']
+
+    def __str__(self) -> str:
+        return f'{self.name} (ID: {self.ID})'
+
+def LoadSession(path) -> dict:
+    '''Returns a dict of { ID: Node } from a saved session.'''
+    with open(path, 'r') as f:
+        settings = yaml.safe_load(f)
+    return {ID: Node(ID, v) for ID, v in settings.items() if isinstance(v, dict) and 'type' in v}
+
+def LoadLattice(latticeName = ''):
+    '''Loads a lattice from the lattice-saves folder the same way the app does on start-up.'''
+    files = sorted(list(Path(shared.cwd, 'lattice-saves').glob('*.mat')))
+    if not files:
+        raise FileNotFoundError(f'No saved lattices found in {Path(shared.cwd, 'lattice-saves')}.')
+    path = files[0]
+    if latticeName != '':
+        candidate = Path(shared.cwd, 'lattice-saves', latticeName.split('.')[0] + '.mat')
+        if candidate.exists():
+            path = candidate
+        else:
+            print(f'No saved lattices were found with the name \'{latticeName}\'. Defaulting to first alphabetical lattice \'{files[0]}\'.')
+    shared.lattice = latticeutils.LoadLattice(path)
+    shared.latticePath = path
+    shared.elements = latticeutils.GetLatticeInfo(shared.lattice)
+    print(f'Loaded lattice {path} ({len(shared.lattice)} elements).')
+
+def CheckLinked(nodes: list, role: str) -> bool:
+    for n in nodes:
+        if 'linkedElement' not in n.settings:
+            print(f'{n} is a {role} but has not been linked to a lattice element.')
+            return False
+    return True
+
+def Timestamp() -> str:
+    return datetime.now().strftime('%Y-%m-%d__%H-%M-%S')
+
+def CreateSharedArray(shape, dtype = np.float64):
+    sharedMemory = SharedMemory(create = True, size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+    return sharedMemory, np.ndarray(shape, dtype = dtype, buffer = sharedMemory.buf)
+
+def ReleaseSharedArray(sharedMemory):
+    sharedMemory.close()
+    sharedMemory.unlink()
+
+class Runner:
+    '''Runs the actions of a session graph, remembering results so blocks downstream of an ORM do not repeat it.'''
+    def __init__(self, graph: dict, outputPath, seed = None):
+        self.graph = graph
+        self.outputPath = Path(outputPath)
+        self.outputPath.mkdir(parents = True, exist_ok = True)
+        self.seed = seed
+        self.results = dict()
+        # Actions hand these to spawned worker processes, so they must come from the spawn context rather than `threading`.
+        ctx = mp.get_context('spawn')
+        self.pause, self.stop, self.error = ctx.Event(), ctx.Event(), ctx.Event()
+
+    def Run(self, node: Node):
+        if node.ID in self.results:
+            return self.results[node.ID]
+        t0 = time.time()
+        print(f'Running {node} ...')
+        if node.type == 'Orbit Response':
+            result = self.RunORM(node)
+        elif node.type == 'SVD':
+            result = self.RunSVD(node)
+        elif node.type == 'Single Task GP':
+            result = self.RunGP(node)
+        else:
+            raise ValueError(f'{node.type} blocks cannot be run headless.')
+        print(f'{node} finished in {time.time() - t0:.2f} seconds.')
+        self.results[node.ID] = result
+        return result
+
+    def Save(self, node: Node, suffix: str, df: pd.DataFrame, index = False):
+        path = self.outputPath / f'{Timestamp()} {node.name}{suffix}.csv'
+        df.to_csv(path, index = index)
+        print(f'Saved {path}')
+
+    def SortedORMInputs(self, node: Node):
+        # sorted by index then alignment, as the ORM block does.
+        key = lambda n: (n.settings.get('alignment', 'Horizontal'), n.index)
+        return sorted(node.Inputs(self.graph, 'corrector'), key = key), sorted(node.Inputs(self.graph, 'BPM'), key = key)
+
+    def RunORM(self, node: Node):
+        correctors, BPMs = self.SortedORMInputs(node)
+        if len(correctors) == 0 or len(BPMs) == 0:
+            raise ValueError(f'{node} needs both correctors and BPMs.')
+        if not CheckLinked(correctors, 'corrector') or not CheckLinked(BPMs, 'BPM'):
+            raise ValueError(f'{node} has inputs without linked lattice elements.')
+        action = OrbitResponseAction.__new__(OrbitResponseAction)
+        action.__setstate__({
+            'lattice': ShareLattice(shared.lattice),
+            'BPMs': [{'name': b.name, 'index': b.index, 'alignment': b.settings['alignment'], 'linkedElementAttrs': dict()} for b in BPMs],
+            'correctors': [{'name': c.name, 'index': c.index, 'alignment': c.settings['alignment'], 'default': c.value['default'], 'linkedElementAttrs': dict()} for c in correctors],
+        })
+        components = node.settings['components']
+        numSteps, repeats = int(components['steps']['value']), int(components['repeats']['value'])
+        rawSharedMemory, raw = CreateSharedArray((len(BPMs), len(correctors), numSteps, repeats))
+        ORMSharedMemory, ORM = CreateSharedArray((len(BPMs), len(correctors)))
+        uncertaintySharedMemory, uncertainty = CreateSharedArray((len(BPMs), len(correctors)))
+        try:
+            message = action.Run(
+                self.pause, self.stop, self.error,
+                rawSharedMemory.name, raw.shape, raw.dtype,
+                numSteps = numSteps,
+                stepKick = components['current']['value'],
+                repeats = repeats,
+                trackingMode = node.settings.get('trackingMode', 'Single pass'),
+                engine = node.settings.get('engine', 'Macro-particle'),
+                numWorkers = cpu_count() if node.settings.get('parallel', 'Serial') == 'Process pool' else 1,
+                order = node.settings.get('order', 'Linear'),
+                seed = self.seed,
+                postProcessedSharedMemoryName = ORMSharedMemory.name,
+                postProcessedShape = ORM.shape,
+                postProcessedDType = ORM.dtype,
+                uncertaintySharedMemoryName = uncertaintySharedMemory.name,
+                uncertaintyShape = uncertainty.shape,
+                uncertaintyDType = uncertainty.dtype,
+            )
+            if self.error.is_set():
+                raise RuntimeError(message)
+            result = dict(ORM = ORM.copy(), uncertainty = uncertainty.copy(), correctors = correctors, BPMs = BPMs)
+        finally:
+            for sharedMemory in [rawSharedMemory, ORMSharedMemory, uncertaintySharedMemory]:
+                ReleaseSharedArray(sharedMemory)
+        rows, columns = [str(b) for b in BPMs], [str(c) for c in correctors]
+        self.Save(node, ' ORM', pd.DataFrame(result['ORM'], index = rows, columns = columns), index = True)
+        self.Save(node, ' ORM uncertainty', pd.DataFrame(result['uncertainty'], index = rows, columns = columns), index = True)
+        return result
+
+    def RunSVD(self, node: Node):
+        upstream = [self.graph[ID] for ID in node.linksIn if ID in self.graph and self.graph[ID].type == 'Orbit Response']
+        if len(upstream) == 0:
+            raise ValueError(f'{node} needs an Orbit Response block linked in.')
+        ORMResult = self.Run(upstream[0])
+        U, s, VT = svd(ORMResult['ORM'])
+        correctors, BPMs = ORMResult['correctors'], ORMResult['BPMs']
+        action = SVDAction.__new__(SVDAction)
+        action.__setstate__({
+            'lattice': ShareLattice(shared.lattice),
+            'BPMs': [{'name': b.name, 'index': b.index, 'pos': float(shared.elements['s (m)'].iloc[b.index]), 'alignment': b.settings['alignment'], 'linkedElementAttrs': dict()} for b in BPMs],
+            'correctors': [{'name': c.name, 'index': c.index, 'alignment': c.settings['alignment'], 'value': c.value['value'], 'default': c.value['default'], 'linkedElementAttrs': dict()} for c in correctors],
+            'U': U,
+            's': s,
+            'VT': VT,
+        })
+        sharedMemory, trajectory = CreateSharedArray((len(BPMs), 2))
+        try:
+            message = action.Run(self.pause, self.stop, self.error, sharedMemory.name, trajectory.shape, trajectory.dtype, seed = self.seed)
+            if self.error.is_set():
+                raise RuntimeError(message)
+            trajectory = trajectory.copy()
+        finally:
+            ReleaseSharedArray(sharedMemory)
+        self.Save(node, ' singular values', pd.DataFrame({'s': s}))
+        self.Save(node, ' VT', pd.DataFrame(VT, columns = [str(c) for c in correctors]))
+        self.Save(node, ' trajectory', pd.DataFrame(trajectory, index = [str(b) for b in BPMs], columns = ['s (m)', 'centre (mm)']), index = True)
+        return dict(U = U, s = s, VT = VT, trajectory = trajectory)
+
+    def RunGP(self, node: Node):
+        from xopt import Xopt, VOCS, Evaluator
+        from xopt.generators.bayesian import UpperConfidenceBoundGenerator, ExpectedImprovementGenerator
+        from .blocks.bayesian.models import ScalableModelConstructor
+        settings = node.settings
+        decisions = node.Inputs(self.graph, 'decision')
+        objectives = node.Inputs(self.graph, 'objective')
+        constraints = [(c, source) for c in node.Inputs(self.graph, 'constraint') for source in self.graph.values() if source.ID in c.linksIn and source.type != 'Group']
+        if len(decisions) == 0 or len(objectives) == 0:
+            raise ValueError(f'{node} needs decision variables and an objective.')
+        if len(objectives) > 1 or 'linkedElement' not in objectives[0].settings:
+            raise ValueError(f'Headless runs of {node} need a single objective linked directly to a lattice element; compositions are only evaluated in the app.')
+        if not CheckLinked(decisions, 'decision variable') or not CheckLinked([source for _, source in constraints], 'constraint input'):
+            raise ValueError(f'{node} has inputs without linked lattice elements.')
+        measured = objectives + [source for _, source in constraints]
+        action = SingleTaskGPAction.__new__(SingleTaskGPAction)
+        action.__setstate__({
+            'lattice': ShareLattice(shared.lattice),
+            'decisions': [{'name': d.name, 'index': d.index} for d in decisions],
+            'objectives': [{'name': m.name, 'index': m.index, 'dtype': m.settings['dtype']} for m in measured],
+        })
+        action.numParticles = settings.get('numParticles', 5000)
+        action.simulator.commonRandomNumbers = settings.get('beamSampling', 'FRESH') == 'COMMON'
+        if self.seed is not None:
+            action.simulator.seed = self.seed
+        action.simulator.SetObservedIndices([m.index for m in measured])
+        objectiveName = str(objectives[0])
+        constraintNames = {source.ID: str(source) for _, source in constraints}
+
+        numRepeats = settings.get('simRepeats', 1)
+
+        def Evaluate(dictIn: dict):
+            for d in decisions:
+                action.UpdateLinkedElement({'linkedIdx': d.index, 'alignment': d.settings.get('alignment', 'Horizontal')}, dictIn[str(d)])
+            tracking, _ = action.simulator.TrackBeam(action.numParticles * numRepeats)
+            values = ExtractObservables(tracking, [action.simulator.Column(m.index) for m in measured], [m.settings['dtype'] for m in measured], action.numParticles, numRepeats)
+            if numRepeats == 1:
+                return {objectiveName: values[0], **{str(source): v for (_, source), v in zip(constraints, values[1:])}}
+            # report the variance of each mean so Xopt treats it as observation noise.
+            means, variances = np.nanmean(values, axis = 0), np.maximum(np.nanvar(values, axis = 0, ddof = 1) / numRepeats, 1e-12)
+            names = [objectiveName] + [str(source) for _, source in constraints]
+            return {**dict(zip(names, means)), **{f'{name}_var': v for name, v in zip(names, variances)}}
+
+        vocs = VOCS(
+            variables = {str(d): [d.value['min'], d.value['max']] for d in decisions},
+            objectives = {objectiveName: 'MAXIMIZE' if settings.get('mode', 'MAXIMISE') == 'MAXIMISE' else 'MINIMIZE'},
+            constraints = {constraintNames[source.ID]: ['LESS_THAN' if c.type == '< (Constraint)' else 'GREATER_THAN', c.settings['threshold']] for c, source in constraints},
+        )
+        constructor = ScalableModelConstructor(
+            refit_period = settings.get('refitPeriod', 1),
+            max_training_points = settings.get('localModelPoints', 0),
+            objective_name = objectiveName,
+            maximise = settings.get('mode', 'MAXIMISE') == 'MAXIMISE',
+        )
+        generatorKwargs = dict(vocs = vocs, gp_constructor = constructor, n_monte_carlo_samples = 256, n_candidates = 10)
+        # TuRBO
+        if settings.get('turbo', 'DISABLED') != 'DISABLED':
+            generatorKwargs['turbo_controller'] = 'safety' if settings['turbo'] == 'SAFETY' and len(constraints) > 0 else 'optimize'
+        if settings.get('acqFunction', 'UCB') == 'UCB':
+            generator = UpperConfidenceBoundGenerator(beta = settings.get('acqHyperparameter', 2), **generatorKwargs)
+        else:
+            generator = ExpectedImprovementGenerator(**generatorKwargs)
+        if settings.get('turbo', 'DISABLED') != 'DISABLED':
+            generator.turbo_controller.length = .1 # 10% of the range.
+        X = Xopt(vocs = vocs, generator = generator, evaluator = Evaluator(function = Evaluate))
+        numSamples, numSteps = max(settings.get('numSamples', 5), 1), settings.get('numSteps', 20)
+        path = self.outputPath / f'{Timestamp()} {node.name}.csv'
+        # evaluations are journalled as they arrive, the CSV is written once the run ends.
+        runJournal = journal.RunJournal(path.with_suffix('.ndjson'))
+        X.random_evaluate(numSamples)
+        runJournal.Append(X.data.iloc[runJournal.numRows:].copy())
+        for step in range(numSteps):
+            try:
+                X.step()
+            except Exception as e:
+                print(f'Step {step + 1} fell back to a random sample: {e}')
+                X.random_evaluate(1)
+            runJournal.Append(X.data.iloc[runJournal.numRows:].copy())
+            print(f'Step {step + 1}/{numSteps}')
+        runJournal.Close()
+        journal.Read(runJournal.path).to_csv(path, index = False)
+        print(f'Saved {path}')
+        return X.data
+
+def Main(args = None):
+    parser = argparse.ArgumentParser(prog = 'python -m pipelines.headless', description = 'Run the GP, ORM and SVD blocks of a saved session without the GUI.')
+    parser.add_argument('--session', default = os.path.join(shared.cwd, 'config', 'settings.yaml'), help = 'saved session to load (default: config/settings.yaml).')
+    parser.add_argument('--lattice', default = '', help = 'name of a lattice in lattice-saves (default: first alphabetical).')
+    parser.add_argument('--block', action = 'append', default = None, help = 'name or ID of a block to run, can be repeated (default: every runnable block).')
+    parser.add_argument('--output', default = os.path.join(shared.cwd, 'datadump'), help = 'folder results are written to (default: datadump).')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed used for particle distributions.')
+    args = parser.parse_args(args)
+    graph = LoadSession(args.session)
+    LoadLattice(args.lattice)
+    if args.block is None:
+        # ORMs first so SVDs downstream of them reuse their results.
+        nodes = sorted([n for n in graph.values() if n.type in runnableTypes], key = lambda n: runnableTypes.index(n.type))
+    else:
+        nodes = [n for n in graph.values() if n.name in args.block or str(n.ID) in args.block]
+    if len(nodes) == 0:
+        print('No runnable blocks found.')
+        return 1
+    runner = Runner(graph, args.output, seed = args.seed)
+    failed = 0
+    for node in nodes:
+        try:
+            runner.Run(node)
+        except Exception as e:
+            failed += 1
+            print(f'{node} failed: {e}')
+    return 1 if failed > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(Main())
@@ -149,9 +149,7 @@ class Inspector(Entity, QTabWidget):
     def TextChanged(self):
         if shared.selectedPV is None or self.ignoreTextChange:
             return
-        shared.selectedPV.name = self.mainWindowTitle.text()
-        shared.selectedPV.settings['name'] = shared.selectedPV.name
-        shared.selectedPV.title.setText(shared.selectedPV.name)
+        shared.selectedPV.Rename(self.mainWindowTitle.text())
 
     def TextSet(self):
         self.TextChanged()
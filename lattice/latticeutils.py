@@ -1,11 +1,12 @@
-import at
-from at import linopt2
-from at import elements as emnts
 import numpy as np
 from copy import deepcopy
-import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+from ..utils import startup
+
+# imported on the first lattice load or figure.
+at = startup.Lazy('at')
+pd = startup.Lazy('pandas')
+mpl = startup.Lazy('matplotlib')
+plt = startup.Lazy('matplotlib.pyplot')
 
 def GetLatticeInfo(lattice):
     elements = [[None for _ in range(5)] for _ in range(len(lattice))]
@@ -130,7 +131,7 @@ def DrawLattice(canvas, lattice, ylim = None, alpha = 1, scale = .15, offset = 0
     if showTwiss:
         # Extract the twiss parameters of the beamline
         # twiss is a rec array (numpy array that can be indexed like ndarray.abc = xyz) with an entry for each lattice element
-        twiss = linopt2(lattice, refpts = np.arange(len(lattice) + 1)) # twiss parameters contained in final returned element (idx 2)
+        twiss = at.linopt2(lattice, refpts = np.arange(len(lattice) + 1)) # twiss parameters contained in final returned element (idx 2)
         # Plot the twiss parameters along the beamline
         sPos, betaX, betaY, dispersionX, dispersionY = np.empty(len(twiss[2])), np.empty(len(twiss[2])), np.empty(len(twiss[2])), np.empty(len(twiss[2])), np.empty(len(twiss[2]))
 
@@ -300,8 +301,8 @@ def LoadLattice(pth, energy = 1e8):
 
 def UpdateAperture(apertureBounds, lattice, disable6D = True):
     latticeWithFinalAperture = deepcopy(lattice)
-    latticeWithFinalAperture.append(emnts.Aperture('AP', apertureBounds))
-    latticeWithFinalAperture.append(emnts.Drift('Drift', 1e-5)) 
+    latticeWithFinalAperture.append(at.elements.Aperture('AP', apertureBounds))
+    latticeWithFinalAperture.append(at.elements.Drift('Drift', 1e-5)) 
     if disable6D:
         latticeWithFinalAperture.disable_6d()
     return latticeWithFinalAperture
\ No newline at end of file
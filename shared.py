@@ -1,6 +1,5 @@
 import os
 from pathlib import Path
-from PySide6.QtCore import QPoint
 
 '''Globally relevant variables that are shared between all package scripts.'''
 cwd = os.path.join(str(Path.cwd().resolve()), 'pipelines') # Get the current working directory.
@@ -44,11 +43,13 @@ mousePosUponRelease = None # used to determine if the user released the mouse in
 kernelMenu = None # store a reference to the existing open kernel menu if it exists inside the editor.
 kernelContext = None # a reference to the button that opened the kernel context view.
 lastActionPerformed = None
-editorMenuOffset = QPoint(30, 30)
+editorMenuOffset = (30, 30) # (x, y) offset of the editor menu from the mouse, kept free of Qt so headless runs can import this module.
 editorSelectMode = False
 selected = [] # list of selected entity IDs
 kernels = [] # list of kernels
 toggleState = False # should blocks be run (True) or paused (False) when Spacebar is pressed?
 changeToggleState = True # override the change toggle state logic
 stopCleanUpTimer = False
-numGroups = 0
\ No newline at end of file
+numGroups = 0
+workerPoolSize = 2 # number of pre-imported worker processes kept warm for actions to borrow, set with --worker-pool-size=N.
+workerPoolIdleTimeout = 1800 # in seconds, pooled workers left idle for this long exit to free their memory, set with --worker-pool-idle-timeout=S.
\ No newline at end of file
@@ -1,17 +1,135 @@
-import at
+import os
+import atexit
+import pickle
+import shutil
+import hashlib
+import tempfile
 import numpy as np
 from copy import deepcopy
 import logging
+from .utils import startup
 from . import shared
 
+at = startup.Lazy('at') # imported on the first lattice load or tracking call.
 logging.getLogger('at').setLevel(logging.CRITICAL)
 
+# Sigma matrices keyed by input twiss, and particle distributions keyed by (input twiss, number of particles, seed).
+sigmaCache = dict()
+beamCache = dict()
+
+def GetBeam(inputTwiss: dict, numParticles: int, seed: int = None) -> np.ndarray:
+    '''Returns a 6 x `numParticles` particle distribution matching `inputTwiss`.\n
+    With a `seed` the distribution is drawn once and cached, so every call sees the same particles (common random numbers).
+    Without one a fresh sample is drawn on every call. A copy is returned because tracking modifies particles in place.'''
+    twissKey = tuple(sorted(inputTwiss.items()))
+    if twissKey not in sigmaCache:
+        sigmaCache[twissKey] = at.sigma_matrix(**inputTwiss)
+    if seed is None:
+        return at.beam(numParticles, sigmaCache[twissKey])
+    key = (twissKey, numParticles, seed)
+    if key not in beamCache:
+        at.random.reset(seed)
+        beamCache[key] = at.beam(numParticles, sigmaCache[twissKey])
+    return beamCache[key].copy(order = 'F')
+
+# Row of the tracking output holding each centroid observable.
+observableCoordinates = {'X': 0, 'XP': 1, 'PX': 1, 'Y': 2, 'YP': 3, 'PY': 3}
+
+def ExtractObservables(tracking: np.ndarray, columns: list, dtypes: list, numParticles: int, numRepeats: int = 1) -> np.ndarray:
+    '''Returns observable `dtypes[i]` (e.g. X, CHARGE, SURVIVAL_RATE) at tracking output column `columns[i]` for every i, in one pass over `tracking`.\n
+    A particle counts as lost at an element if any of its coordinates is NaN there, so centroids are averaged over the surviving particles only.\n
+    With `numRepeats` > 1, the particles of `tracking` are taken as `numRepeats` independent beams of `numParticles` each and the result has shape (`numRepeats`, len(`dtypes`)).'''
+    for dtype in dtypes:
+        if dtype not in observableCoordinates and dtype not in ['CHARGE', 'SURVIVAL_RATE']:
+            raise ValueError(f'{dtype} is not an observable that can be extracted from tracking output.')
+    uniqueColumns, inverse = np.unique(np.asarray(columns, dtype = int), return_inverse = True)
+    # particles are grouped by repeat, giving shape (coordinates, repeats, particles, unique columns).
+    observed = tracking[:, :, uniqueColumns, 0].reshape(tracking.shape[0], numRepeats, -1, len(uniqueColumns))
+    # single survival mask of shape (repeats, particles, unique columns).
+    alive = ~np.isnan(observed).any(axis = 0)
+    counts = alive.sum(axis = 1)
+    result = counts[:, inverse].astype(np.float64)
+    isCentroid = np.array([dtype in observableCoordinates for dtype in dtypes], dtype = bool)
+    if isCentroid.any():
+        centroidColumns = inverse[isCentroid]
+        coordinates = [observableCoordinates[dtype] for dtype in np.asarray(dtypes)[isCentroid]]
+        values = observed[coordinates, :, :, centroidColumns] # (centroids, repeats, particles)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            result[:, isCentroid] = (np.where(alive[:, :, centroidColumns].transpose(2, 0, 1), values, 0).sum(axis = 2) / counts[:, centroidColumns].T).T
+    result[:, np.array([dtype == 'SURVIVAL_RATE' for dtype in dtypes], dtype = bool)] /= numParticles
+    return result[0] if numRepeats == 1 else result
+
+# Lattice files written for spawned workers keyed by lattice path, and lattices read back from them in this process.
+latticeDirectory = None # private (0700) directory holding the lattice files of this process, made on first use.
+latticeFiles = dict() # lattice fingerprint -> file
+latticeCache = dict()
+
+def LatticeFingerprint(lattice) -> str:
+    '''Hash of the lattice contents, leaving out the `KickAngle` and `K` values that `ShareLattice` sends separately.'''
+    digest = hashlib.sha256(repr(sorted(vars(lattice).items())).encode())
+    for element in lattice:
+        digest.update(type(element).__name__.encode())
+        for name, value in sorted(vars(element).items()):
+            if name == 'KickAngle':
+                continue
+            value = np.asarray(value)
+            if name == 'PolynomB' and hasattr(element, 'K') and value.size > 1:
+                # `K` is stored as PolynomB[1].
+                value = value.copy()
+                value[1] = 0
+            digest.update(name.encode())
+            digest.update(repr(value).encode() if value.dtype == object else np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+def ShareLattice(lattice) -> dict:
+    '''Returns a compact, picklable reference to `lattice` for spawned workers, to be rebuilt with `AttachLattice`.\n
+    The lattice is written to a file in a private temporary directory once per distinct content. After that only the parameters changed
+    inside the app (`KickAngle` and `K`) are packed into a single array, so starting an action no longer pickles every element.
+    Any other change to the lattice gives a new fingerprint and so a new file.'''
+    global latticeDirectory
+    key = LatticeFingerprint(lattice)
+    if key not in latticeFiles:
+        if latticeDirectory is None:
+            latticeDirectory = tempfile.mkdtemp(prefix = 'pipelines-lattice-')
+            atexit.register(shutil.rmtree, latticeDirectory, ignore_errors = True)
+        descriptor, latticeFiles[key] = tempfile.mkstemp(suffix = '.pkl', dir = latticeDirectory)
+        with os.fdopen(descriptor, 'wb') as f:
+            pickle.dump(lattice, f, protocol = pickle.HIGHEST_PROTOCOL)
+    parameters = np.full((len(lattice), 3), np.nan)
+    for idx, element in enumerate(lattice):
+        if hasattr(element, 'KickAngle'):
+            parameters[idx, :2] = element.KickAngle
+        if hasattr(element, 'K'):
+            parameters[idx, 2] = element.K
+    return {'file': latticeFiles[key], 'parameters': parameters}
+
+def AttachLattice(reference: dict):
+    '''Rebuilds a lattice from a reference made by `ShareLattice`. The lattice file is only read the first time a process sees it.\n
+    Each file holds a different lattice, so reading a new one drops the cached lattices of earlier files.'''
+    file, parameters = reference['file'], reference['parameters']
+    if file not in latticeCache:
+        latticeCache.clear()
+        with open(file, 'rb') as f:
+            latticeCache[file] = pickle.load(f)
+    lattice = latticeCache[file]
+    for idx in np.flatnonzero(~np.isnan(parameters).all(axis = 1)):
+        if not np.isnan(parameters[idx, 0]):
+            lattice[idx].KickAngle[:] = parameters[idx, :2]
+        if not np.isnan(parameters[idx, 2]):
+            lattice[idx].K = parameters[idx, 2]
+    return lattice
+
 class Simulator:
     '''Handles offline simulations with the lattice.'''
-    def __init__(self, numParticles = 10000, lattice = None, inputTwiss = None, window = None):
+    def __init__(self, numParticles = 10000, lattice = None, inputTwiss = None, window = None, commonRandomNumbers = False, seed = 0):
         self.parent = window
         self.lattice = lattice if lattice is not None else shared.lattice
         self.numParticles = numParticles
+        # Common random numbers track the same particles on every call so differences between calls come from the lattice alone.
+        self.commonRandomNumbers = commonRandomNumbers
+        self.seed = seed
+        # Lattice indices read from the tracking output. None tracks the whole lattice and records every element.
+        self.observedIndices = None
         if inputTwiss is None:
             self.inputTwiss = {
                 'betax': 3.731,
@@ -30,10 +148,35 @@ class Simulator:
         pOut, _ = self.TrackBeam()
         return self.CalculateSurvivingFraction(pOut)
 
+    def SetObservedIndices(self, indices = None):
+        '''Only track up to the furthest of `indices` and only record the beam at those elements.\n
+        Tracking output columns then follow the sorted unique indices, use `Column` to look them up. Pass None to track the whole lattice again.'''
+        if indices is None or len(indices) == 0:
+            self.observedIndices = None
+            return
+        self.observedIndices = np.unique(np.array(indices, dtype = int))
+        self.columns = {idx: col for col, idx in enumerate(self.observedIndices)}
+        self.truncatedLattice = None
+
+    def Column(self, index):
+        '''Returns the column of the tracking output holding the beam at lattice element `index`.'''
+        return index if self.observedIndices is None else self.columns[index]
+
+    def TrackedLattice(self):
+        '''Returns the lattice to track and the refpts to record.'''
+        if self.observedIndices is None:
+            return self.lattice, np.arange(len(self.lattice))
+        # A slice shares its elements with the full lattice, so setting element attributes on either is seen by both.
+        # Refpts are element entrances, so the furthest observed element itself does not need tracking.
+        if self.truncatedLattice is None or self.truncatedLatticeSource is not self.lattice:
+            self.truncatedLattice = self.lattice[:self.observedIndices[-1]]
+            self.truncatedLatticeSource = self.lattice
+        return self.truncatedLattice, self.observedIndices
+
     def TrackBeam(self, numParticles):
-        sigmaMat = at.sigma_matrix(**self.inputTwiss)
-        beam = at.beam(numParticles, sigmaMat)
-        pOut, *_ = self.lattice.track(beam, refpts = np.arange(len(self.lattice)), nturns = 1);
+        beam = GetBeam(self.inputTwiss, numParticles, self.seed if self.commonRandomNumbers else None)
+        lattice, refpts = self.TrackedLattice()
+        pOut, *_ = lattice.track(beam, refpts = refpts, nturns = 1);
         return pOut, _
 
     def CalculateSurvivingFraction(self, pOut, returnMask = False):
@@ -61,4 +204,76 @@ class Simulator:
         for _ in range(len(newLattice) - 1, -1, -1):
             if newLattice[_].Length > 0:
                 newLattice.insert(_, aperture)
-        return newLattice
\ No newline at end of file
+        return newLattice
+class CheckpointSimulator(Simulator):
+    '''Simulator that resumes tracking from the first decision element whose parameters changed since the last call.\n
+    The particle state at the entrance of each decision element (see `SetCheckpointIndices`) is cached on every call, along with the previous tracking output.
+    Checkpoints are only valid when the same particles enter the lattice each call, so this falls back to full tracking unless `commonRandomNumbers` is set.
+    Only the decision elements should change between calls, changes anywhere else need `Invalidate` to be called.'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpointIndices = np.empty(0, dtype = int)
+        self.Invalidate()
+
+    def SetCheckpointIndices(self, indices):
+        '''Lattice indices of the elements whose parameters change between calls.'''
+        self.checkpointIndices = np.unique(np.array(indices, dtype = int))
+        self.Invalidate()
+
+    def SetObservedIndices(self, indices = None):
+        super().SetObservedIndices(indices)
+        self.Invalidate()
+
+    def Invalidate(self):
+        '''Discard all checkpoints so the next call tracks the whole line.'''
+        self.checkpoints = dict()
+        self.elementStates = dict()
+        self.lastOutput = None
+        self.lastNumParticles = None
+
+    def ElementState(self, index):
+        return {k: np.array(v, copy = True) for k, v in vars(self.lattice[index]).items()}
+
+    def ElementChanged(self, index):
+        previous = self.elementStates.get(index, None)
+        if previous is None:
+            return True
+        current = vars(self.lattice[index])
+        if previous.keys() != current.keys():
+            return True
+        return any(not np.array_equal(previous[k], current[k]) for k in previous)
+
+    def ResumeIndex(self, numParticles, end):
+        '''Returns the lattice index to resume tracking from, 0 for the whole line or None if nothing upstream of `end` has changed.'''
+        if self.lastOutput is None or numParticles != self.lastNumParticles:
+            return 0
+        for index in self.checkpointIndices[self.checkpointIndices < end]:
+            if self.ElementChanged(index):
+                return index if index in self.checkpoints else 0
+        return None
+
+    def TrackBeam(self, numParticles):
+        if not self.commonRandomNumbers:
+            return super().TrackBeam(numParticles)
+        lattice, refpts = self.TrackedLattice()
+        end = len(lattice)
+        start = self.ResumeIndex(numParticles, end)
+        if start is None:
+            return self.lastOutput.copy(), []
+        particles = GetBeam(self.inputTwiss, numParticles, self.seed) if start == 0 else self.checkpoints[start].copy(order = 'F')
+        # Record downstream checkpoints alongside the observed elements in one pass.
+        checkpointIndices = self.checkpointIndices[(self.checkpointIndices >= start) & (self.checkpointIndices < end)]
+        observedIndices = refpts[refpts >= start]
+        points = np.union1d(checkpointIndices, observedIndices)
+        segmentOut, *_ = self.lattice[start:end].track(particles, refpts = points - start, nturns = 1)
+        columns = {index: col for col, index in enumerate(points)}
+        for index in checkpointIndices:
+            self.checkpoints[index] = np.asfortranarray(segmentOut[:, :, columns[index], 0])
+        # Observed elements upstream of the resume point have the same beam as last time.
+        pOut = np.empty((6, numParticles, len(refpts), 1)) if start == 0 else self.lastOutput
+        pOut[:, :, len(refpts) - len(observedIndices):] = segmentOut[:, :, [columns[index] for index in observedIndices]]
+        for index in self.checkpointIndices:
+            self.elementStates[index] = self.ElementState(index)
+        self.lastOutput = pOut
+        self.lastNumParticles = numParticles
+        return pOut.copy(), []
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the repository is the `pipelines` package, so its parent directory has to be importable for the package's relative imports to resolve.
+sys.path.insert(0, str(Path(__file__).absolute().parents[2]))
@@ -0,0 +1,75 @@
+import numpy as np
+from queue import Queue
+from threading import Thread, Event as ThreadingEvent
+from multiprocessing import Event
+from multiprocessing.shared_memory import SharedMemory
+import pytest
+from pipelines.utils import multiprocessing as workers
+
+'''
+Persistent workers of a batch run, as started by the Single Task GP for offline optimisation.
+'''
+
+class BatchEntity:
+    '''Stands in for a block: just the shared data handling that persistent workers rely on.'''
+    def __init__(self):
+        self.ID = 'batch-test'
+        self.dataReady = ThreadingEvent()
+
+    def CreateEmptySharedData(self, emptyArray, attrName = 'data'):
+        setattr(self, f'{attrName}SharedMemory', SharedMemory(create = True, size = emptyArray.nbytes))
+        setattr(self, attrName, np.ndarray(emptyArray.shape, dtype = emptyArray.dtype, buffer = getattr(self, f'{attrName}SharedMemory').buf))
+
+    def MarkDataReady(self):
+        self.dataReady.set()
+
+def Evaluate(pause, stop, error, sharedMemoryName, shape, params, dtype = np.float64):
+    sharedMemory = SharedMemory(name = sharedMemoryName)
+    data = np.ndarray(shape, dtype = dtype, buffer = sharedMemory.buf)
+    data[:] = params['x']
+    result = data.copy()
+    del data
+    sharedMemory.close()
+    return result
+
+@pytest.fixture
+def pool():
+    workers.workerPool = workers.WorkerPool(size = 0, idleTimeout = 60)
+    yield workers.workerPool
+    workers.workerPool.Shutdown()
+    workers.workerPool = None
+
+def test_stopping_a_batch_releases_worker_segments(pool):
+    entity = BatchEntity()
+    batchSize = 3
+    attrNames = ['data'] + [f'batchData{w}' for w in range(1, batchSize)]
+    emptyArray = np.empty(2)
+    inQueues, outQueues = [Queue() for _ in range(batchSize)], [Queue() for _ in range(batchSize)]
+    workers.runningActions[entity.ID] = [Event(), Event(), Event(), 0.]
+    threads = [
+        Thread(target = workers.CreatePersistentWorkerProcess, args = (entity, emptyArray, inQueues[w], outQueues[w], Evaluate), kwargs = {'dtype': np.float64, 'attrName': attrNames[w]})
+        for w in range(batchSize)
+    ]
+    for thread in threads:
+        thread.start()
+    for w in range(batchSize):
+        inQueues[w].put({'x': float(w)})
+    for w in range(batchSize):
+        assert np.all(outQueues[w].get(timeout = 120) == w)
+        outQueues[w].task_done()
+    names = {attrName: getattr(entity, f'{attrName}SharedMemory').name for attrName in attrNames}
+
+    stopper = Thread(target = workers.StopPersistentWorkers, args = (entity, inQueues, threads, attrNames[1:]), daemon = True)
+    stopper.start()
+    stopper.join(timeout = 30)
+    assert not stopper.is_alive(), 'stopping the batch workers hung'
+    assert entity.ID not in workers.runningActions
+    for attrName in attrNames[1:]:
+        assert not hasattr(entity, f'{attrName}SharedMemory')
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name = names[attrName])
+    # the first slot is the block's own data, which outlives the run.
+    assert np.all(entity.data == 0)
+    del entity.data
+    entity.dataSharedMemory.close()
+    entity.dataSharedMemory.unlink()
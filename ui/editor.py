@@ -234,7 +234,7 @@ class Editor(Entity, QGraphicsView):
             self.areaEnabled = False
         if self.mouseButtonPressed == Qt.RightButton:
             if not self.menu.ID in shared.PVs.keys() or not shared.PVs[self.menu.ID]['rect'].contains(mousePos):
-                self.menu.Show(mousePos - shared.editorMenuOffset)
+                self.menu.Show(mousePos - QPoint(*shared.editorMenuOffset))
             event.accept()
             return
         elif not self.canDrag:
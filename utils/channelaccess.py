@@ -0,0 +1,71 @@
+import asyncio
+import aioca
+from threading import Thread, Lock
+
+'''
+Channel access service shared by every block. A single asyncio event loop, running on one daemon thread, owns all
+camonitor subscriptions so blocks no longer need a polling thread each or create a new event loop for every request.
+Subscription callbacks and watchers run on the service loop so they must be quick and must not block.
+'''
+
+loop = None
+lock = Lock()
+# key is the subscriber (e.g. an entity ID), value is the list of aioca subscriptions it holds.
+subscriptions = dict()
+# key is the subscriber, value is a callback invoked every `refreshPeriod` seconds on the service loop.
+watchers = dict()
+refreshPeriod = .5 # in seconds
+
+def GetLoop():
+    '''Returns the service event loop, starting it on first use.'''
+    global loop
+    with lock:
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            Thread(target = loop.run_forever, daemon = True).start()
+            asyncio.run_coroutine_threadsafe(Refresh(), loop)
+    return loop
+
+def Run(coroutine, timeout = None):
+    '''Runs `coroutine` on the service loop and blocks until it returns. Must not be called from the service loop itself.'''
+    return asyncio.run_coroutine_threadsafe(coroutine, GetLoop()).result(timeout)
+
+def RunInBackground(func, *args):
+    '''Runs a blocking `func(*args)` on the service loop's executor, e.g. to follow up on a subscription callback.'''
+    return GetLoop().run_in_executor(None, func, *args)
+
+def Subscribe(key, names: list, callback, **kwargs):
+    '''Subscribes `callback(value, index)` to camonitor updates for every PV in `names`, replacing any subscriptions already held by `key`.\n
+    Remaining `kwargs` are passed to `aioca.camonitor`.'''
+    async def CreateSubscriptions():
+        CloseSubscriptions(key)
+        subscriptions[key] = aioca.camonitor(names, callback, **kwargs)
+    Run(CreateSubscriptions())
+
+def Unsubscribe(key):
+    '''Closes every subscription held by `key`.'''
+    async def Close():
+        CloseSubscriptions(key)
+    Run(Close())
+
+def CloseSubscriptions(key):
+    for subscription in subscriptions.pop(key, []):
+        subscription.close()
+
+def Watch(key, callback):
+    '''Calls `callback()` every `refreshPeriod` seconds until it returns False, at which point `key` is also unsubscribed.'''
+    GetLoop()
+    watchers[key] = callback
+
+async def Refresh():
+    while True:
+        for key, callback in list(watchers.items()):
+            try:
+                keepWatching = callback()
+            except Exception as e:
+                print(e)
+                keepWatching = True
+            if keepWatching is False:
+                watchers.pop(key, None)
+                CloseSubscriptions(key)
+        await asyncio.sleep(refreshPeriod)
@@ -166,6 +166,17 @@ def Paste(mousePos = None, offsets = None, modifyActionBuffer = True):
             magnitudeOnly = block.settings.get('magnitudeOnly', None),
             threshold = block.settings.get('threshold', None),
             onControl = block.settings.get('onControl', None),
+            trackingMode = block.settings.get('trackingMode', None),
+            engine = block.settings.get('engine', None),
+            parallel = block.settings.get('parallel', None),
+            order = block.settings.get('order', None),
+            beamSampling = block.settings.get('beamSampling', None),
+            retracking = block.settings.get('retracking', None),
+            batchSize = block.settings.get('batchSize', None),
+            simRepeats = block.settings.get('simRepeats', None),
+            refitPeriod = block.settings.get('refitPeriod', None),
+            latencyBudget = block.settings.get('latencyBudget', None),
+            localModelPoints = block.settings.get('localModelPoints', None),
         )
         entity.settings['components'] = deepcopy(block.settings['components'])
         if hasattr(entity, 'set'):
@@ -499,7 +510,7 @@ def ShowMenu(pos: QPoint):
 
 # functions to invoke when calling the above functions, to determine which arguments to pass. They all should have a return value.
 def GetMousePos():
-    return editor.currentPos - shared.editorMenuOffset
+    return editor.currentPos - QPoint(*shared.editorMenuOffset)
 
 # A dict of commands, with values being dicts of format {shortcut = , func = }
 commands = {
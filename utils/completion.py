@@ -0,0 +1,93 @@
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+from threading import Lock
+
+'''
+Completion notifications between blocks. A block marks its data as ready once its result has been written (see `Entity.MarkDataReady`),
+and callbacks registered with `WhenReady` run on the main thread as soon as every block they wait on is ready, rather than on the next poll.
+Blocks whose results are written without a notification are still picked up by a fallback check every `fallbackPeriod`.
+A block whose run fails or is stopped marks its data as failed instead (see `Entity.MarkDataFailed`), which drops the callbacks waiting on it.
+'''
+
+lock = Lock()
+# list of [set of entities still being waited on, callback, callback on failure or None].
+waiters = []
+fallbackPeriod = 200 # in ms
+
+class Dispatcher(QObject):
+    '''Runs callbacks emitted from any thread on the main thread.'''
+    callSignal = Signal(object)
+    fallbackSignal = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.fallbackTimer = None
+        self.callSignal.connect(self.Call)
+        self.fallbackSignal.connect(self.StartFallback)
+
+    @Slot(object)
+    def Call(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            print('An error occurred inside a completion callback, here it is:', f'{e}')
+
+    @Slot()
+    def StartFallback(self):
+        if self.fallbackTimer is None:
+            self.fallbackTimer = QTimer(self)
+            self.fallbackTimer.timeout.connect(Recheck)
+        if not self.fallbackTimer.isActive():
+            self.fallbackTimer.start(fallbackPeriod)
+
+    def StopFallback(self):
+        if self.fallbackTimer is not None:
+            self.fallbackTimer.stop()
+
+# created on import, which happens on the main thread, so queued callbacks run there.
+dispatcher = Dispatcher()
+
+def WhenReady(entities: list, callback, onFailure = None):
+    '''Calls `callback()` on the main thread once every entity in `entities` has written its data, immediately if they all already have.\n
+    If one of them fails first, `callback` is dropped and `onFailure()` is called on the main thread instead, if given.'''
+    with lock:
+        pending = {e for e in entities if not e.DataWritten()}
+        if len(pending) > 0:
+            waiters.append([pending, callback, onFailure])
+    if len(pending) > 0:
+        dispatcher.fallbackSignal.emit()
+        return
+    dispatcher.callSignal.emit(callback)
+
+def Notify(entity):
+    '''Wakes every callback that was only waiting on `entity`. Called by `Entity.MarkDataReady` from any thread.'''
+    Release(lambda e: e is entity)
+
+def Fail(entity):
+    '''Drops every callback waiting on `entity`, whose data will not be written, and calls their failure callbacks. Called by `Entity.MarkDataFailed` from any thread.'''
+    with lock:
+        failed = [waiter for waiter in waiters if entity in waiter[0]]
+        for waiter in failed:
+            waiters.remove(waiter)
+    for _, _, onFailure in failed:
+        if onFailure is not None:
+            dispatcher.callSignal.emit(onFailure)
+
+def Recheck():
+    # Fallback for blocks whose results are written without a notification, runs on the main thread.
+    Release(lambda e: e.DataWritten())
+    with lock:
+        finished = len(waiters) == 0
+    if finished:
+        dispatcher.StopFallback()
+
+def Release(isReady):
+    with lock:
+        ready = []
+        for waiter in waiters:
+            waiter[0] = {e for e in waiter[0] if not isReady(e)}
+            if len(waiter[0]) == 0:
+                ready.append(waiter)
+        for waiter in ready:
+            waiters.remove(waiter)
+    for _, callback, _ in ready:
+        dispatcher.callSignal.emit(callback)
@@ -1,6 +1,7 @@
 from multiprocessing.shared_memory import SharedMemory
-from threading import current_thread
+from threading import current_thread, Event
 import numpy as np
+from . import completion
 from .. import shared
 
 class Entity:
@@ -15,6 +16,7 @@ class Entity:
         if self.type == 'SVD':
             print('At instantiation, SVD has this data:', self.data)
         self.sharingData = False
+        self.dataReady = Event() # set once this entity's result has been written, see `MarkDataReady`.
         self.settings = dict(name = self.name, type = self.type)
         componentsSpecified = False
         for k, v in kwargs.items(): # Assign entity-specific attributes.
@@ -39,8 +41,24 @@ class Entity:
         setattr(self, attrName, np.ndarray(emptyArray.shape, dtype = emptyArray.dtype, buffer = getattr(self, sharedMemoryName).buf))
         data = getattr(self, attrName)
         data[:] = np.inf
+        if attrName == 'data':
+            self.dataReady.clear()
         self.sharingData = True
 
+    def MarkDataReady(self):
+        '''Flags this entity's data as written, immediately waking anything waiting on it through `completion.WhenReady`. Safe to call from any thread.'''
+        self.dataReady.set()
+        completion.Notify(self)
+
+    def MarkDataFailed(self):
+        '''Flags that this entity's run ended without writing its data, dropping anything waiting on it through `completion.WhenReady`. Safe to call from any thread.'''
+        self.dataReady.clear()
+        completion.Fail(self)
+
+    def DataWritten(self) -> bool:
+        '''True once this entity's data has been marked ready, or no longer holds any placeholder (inf) values.'''
+        return self.dataReady.is_set() or (isinstance(self.data, np.ndarray) and not np.isinf(self.data).any())
+
     def Register(self, overrideID = None):
         '''Registers this object as an entity inside the shared entity list.'''
         self.ID = overrideID
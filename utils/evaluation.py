@@ -0,0 +1,16 @@
+from threading import Lock
+
+'''
+Lazy evaluation of composition blocks. A composition only computes its value when a consumer asks for it through `Start()`,
+and remembers it for the rest of the evaluation tick. Anything that writes an input value (PV readbacks, setpoints, numbers,
+simulated readings) calls `Invalidate()`, moving the tick on so compositions recompute the next time they are asked.
+'''
+
+lock = Lock()
+tick = 0
+
+def Invalidate():
+    '''Moves the evaluation tick on, call whenever an input value changes.'''
+    global tick
+    with lock:
+        tick += 1
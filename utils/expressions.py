@@ -0,0 +1,105 @@
+import numpy as np
+from .. import shared
+
+'''
+Compiled objective and constraint expressions. The composition graph feeding a block (PVs, numbers, compositions and filters)
+is traced once and flattened into a list of NumPy operations over the columns of a single array of fundamental readings,
+so evaluating an objective for a batch of candidates or repeats is one call on a (..., numFundamentals) array rather than a walk
+over block objects for every reading.
+'''
+
+pvBlockTypes = ['PV', 'Corrector', 'BPM', 'BCM']
+
+def Stack(registers):
+    return np.stack(np.broadcast_arrays(*registers))
+
+def Triggered(control):
+    # matches `Control.Start`, a control signal is triggered by any non-zero, NaN or infinite value.
+    return ~(np.isfinite(control) & (control == 0))
+
+operations = {
+    'input': lambda registers, readings, column: readings[..., column],
+    'constant': lambda registers, readings, value: np.full(readings.shape[:-1], value, dtype = float),
+    'abs': lambda registers, readings, _: np.abs(registers[0]),
+    'sum': lambda registers, readings, _: np.sum(Stack(registers), axis = 0),
+    'prod': lambda registers, readings, _: np.prod(Stack(registers), axis = 0),
+    'invert': lambda registers, readings, _: np.where(~np.isinf(registers[0]) & (registers[0] != 0), np.inf, 1.),
+    'lessThan': lambda registers, readings, threshold: np.where(np.isfinite(registers[0]) & (registers[0] < threshold), registers[0], 0.),
+    'greaterThan': lambda registers, readings, threshold: np.where(np.isfinite(registers[0]) & (registers[0] > threshold), registers[0], 0.),
+    'control': lambda registers, readings, onControl: np.where(
+        np.where(np.any(Stack([Triggered(c) for c in registers[1:]]), axis = 0), onControl, not onControl),
+        registers[0], np.nan,
+    ),
+}
+
+class Expression:
+    '''A composition graph flattened into NumPy operations. Call with an array of readings of shape (..., numFundamentals),
+    ordered as the `columns` it was compiled with, to get the value of the expression for every leading index.'''
+    def __init__(self, name = ''):
+        self.name = name
+        # list of (operation, indices of the registers it reads, parameter), in the order they are evaluated.
+        self.operations = []
+        self.output = None # register holding the value of the expression.
+
+    def Add(self, operation, inputs = (), parameter = None) -> int:
+        self.operations.append((operation, list(inputs), parameter))
+        return len(self.operations) - 1
+
+    def __call__(self, readings):
+        readings = np.asarray(readings, dtype = float)
+        registers = []
+        for operation, inputs, parameter in self.operations:
+            registers.append(operations[operation]([registers[i] for i in inputs], readings, parameter))
+        return registers[self.output]
+
+    def __len__(self):
+        return len(self.operations)
+
+def Compile(ID, columns: dict, name = None) -> Expression:
+    '''Flattens the graph feeding into entity `ID`. `columns` maps the ID of every fundamental block to its column in the readings.\n
+    Raises a ValueError if the graph contains a block that cannot be compiled, in which case it should be evaluated through `Start()`.'''
+    expression = Expression(name if name is not None else shared.entities[ID].name)
+    expression.output = Trace(ID, columns, expression, dict())
+    return expression
+
+def Inputs(entity, socket = None) -> list:
+    return [ID for ID, link in entity.linksIn.items() if shared.entities[ID].type != 'Group' and (socket is None or link['socket'] == socket)]
+
+def Trace(ID, columns: dict, expression: Expression, registers: dict) -> int:
+    '''Adds the operations computing entity `ID` to `expression` after those of its inputs, returning its register.
+    `registers` holds entities already traced so a block shared by several branches is only computed once.'''
+    if ID in registers:
+        return registers[ID]
+    entity = shared.entities[ID]
+    if entity.type in pvBlockTypes:
+        if ID not in columns:
+            raise ValueError(f'{entity.name} is not one of the fundamental readings.')
+        register = expression.Add('input', parameter = columns[ID])
+        if entity.settings.get('magnitudeOnly', False):
+            register = expression.Add('abs', [register])
+    elif entity.type == 'Number':
+        register = expression.Add('constant', parameter = float(entity.data[0]))
+    elif entity.type in ['Add', 'Multiply']:
+        inputs = [Trace(linkID, columns, expression, registers) for linkID in Inputs(entity)]
+        if len(inputs) == 0:
+            raise ValueError(f'{entity.name} has no inputs.')
+        register = expression.Add('sum' if entity.type == 'Add' else 'prod', inputs)
+    elif entity.type in ['Absolute', 'Invert', '< (Filter)', '> (Filter)']:
+        inputs = Inputs(entity)
+        if len(inputs) == 0:
+            raise ValueError(f'{entity.name} has no input.')
+        operation = {'Absolute': 'abs', 'Invert': 'invert', '< (Filter)': 'lessThan', '> (Filter)': 'greaterThan'}[entity.type]
+        register = expression.Add(operation, [Trace(inputs[0], columns, expression, registers)], entity.settings.get('threshold', None))
+    elif entity.type == 'Control':
+        inputs = Inputs(entity, 'in')
+        if len(inputs) == 0:
+            register = expression.Add('constant', parameter = np.nan)
+        else:
+            controls = [Trace(linkID, columns, expression, registers) for linkID in Inputs(entity, 'control')]
+            register = Trace(inputs[0], columns, expression, registers)
+            if len(controls) > 0:
+                register = expression.Add('control', [register, *controls], entity.settings['onControl'])
+    else:
+        raise ValueError(f'{entity.name} ({entity.type}) blocks cannot be compiled.')
+    registers[ID] = register
+    return register
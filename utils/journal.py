@@ -0,0 +1,60 @@
+import os
+import json
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from . import startup
+
+'''
+Append-only run journals. Every evaluation of a run is written once, as a JSON record on its own line, by a background thread
+that flushes it to disk straight away. The optimiser thread never waits on I/O, and a session killed part way through a run still
+leaves every completed evaluation in a readable file. `Read` loads a journal back into a DataFrame.
+'''
+
+pd = startup.Lazy('pandas')
+
+class RunJournal:
+    '''Appends rows of a DataFrame to `path` as newline-delimited JSON records, on a background thread.'''
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        self.numRows = 0 # rows handed to the journal so far.
+        self.queue = Queue()
+        self.writer = Thread(target = self.Write, daemon = True)
+        self.writer.start()
+
+    def Append(self, rows: 'pd.DataFrame'):
+        '''Queues `rows` to be written and returns straight away.'''
+        if len(rows) == 0:
+            return
+        self.numRows += len(rows)
+        self.queue.put(rows)
+
+    def Write(self):
+        with open(self.path, 'a', encoding = 'utf-8') as f:
+            while True:
+                rows = self.queue.get()
+                if rows is None:
+                    break
+                try:
+                    f.write(rows.to_json(orient = 'records', lines = True).rstrip('\n') + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                except Exception as e:
+                    print(f'Failed to write to the run journal {self.path}, here is the error:', f'{e}')
+
+    def Close(self):
+        '''Waits for every queued row to be written.'''
+        self.queue.put(None)
+        self.writer.join()
+
+def Read(path) -> 'pd.DataFrame':
+    '''Returns the records of the journal at `path`, ignoring a final record cut short by a crash.'''
+    records = []
+    with open(path, encoding = 'utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return pd.DataFrame.from_records(records)
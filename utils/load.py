@@ -6,6 +6,7 @@ import multiprocessing
 from pathlib import Path
 import numpy as np
 from .commands import blockTypes, CreateBlock, ToggleGroup
+from . import startup
 from ..blocks.composition.composition import Composition
 from ..blocks.kernels.kernel import Kernel
 from ..lattice.latticeutils import LoadLattice, GetLatticeInfo
@@ -86,6 +87,7 @@ def Load(path):
                     editorSettings = v
                     break
             def PopulateScene():
+                phaseStart = startup.Elapsed()
                 groups = dict() # process groups separately
                 for ID, v in settings.items():
                     if v['type'] == 'Group':
@@ -97,6 +99,7 @@ def Load(path):
                         '''Block type, name, position, size, (optional) override ID.'''
                         if not 'position' in v:
                             continue
+                        blockStart = startup.Elapsed()
                         proxy, entity = CreateBlock(
                             blockTypes[v['type']], 
                             v['name'], 
@@ -120,6 +123,17 @@ def Load(path):
                             magnitudeOnly = v.get('magnitudeOnly', None),
                             threshold = v.get('threshold', None),
                             onControl = v.get('onControl', None),
+                            trackingMode = v.get('trackingMode', None),
+                            engine = v.get('engine', None),
+                            parallel = v.get('parallel', None),
+                            order = v.get('order', None),
+                            beamSampling = v.get('beamSampling', None),
+                            retracking = v.get('retracking', None),
+                            batchSize = v.get('batchSize', None),
+                            simRepeats = v.get('simRepeats', None),
+                            refitPeriod = v.get('refitPeriod', None),
+                            latencyBudget = v.get('latencyBudget', None),
+                            localModelPoints = v.get('localModelPoints', None),
                             hyperparameters = v.get('hyperparameters', None),
                         )
                         if 'alignment' in v:
@@ -141,6 +155,7 @@ def Load(path):
                             entity.settings['components'] = v['components']
                             if hasattr(entity, 'set'):
                                 entity.set.setText(f'{v['components']['value']['value']:.3f}')
+                        startup.Record(f'Populate scene: {v['type']} block {ID}', blockStart, startup.Elapsed())
                         # if 'hyperparameters' in v:
                         #     for h in v['hyperparameters']:
                         #         v['hyperparameters'][h]['value'] = np.array(v['hyperparameters'][h]['value'])
@@ -158,14 +173,17 @@ def Load(path):
                         showing = v.get('showing', True),
                         note = v.get('note', ''),
                     )
-                LinkBlocks()
+                with startup.Phase('Link blocks'):
+                    LinkBlocks()
                 for ID in groups:
                     shared.entities[ID].dropdown.pressed.connect(lambda _ID = ID: ToggleGroup(shared.entities[_ID]))
                     if not shared.entities[ID].settings['showing']:
                         shared.entities[ID].settings['showing'] = True
                         ToggleGroup(shared.entities[ID])
+                startup.Record('Populate scene', phaseStart, startup.Elapsed())
                 print(f'Previous session state loaded in {time.time() - t:.2f} seconds.')
                 shared.workspace.assistant.PushMessage(f'Loaded saved session from {path}')
+                startup.Complete('Session loaded')
             def CenterEditor():
                 shared.activeEditor.positionInSceneCoords = QPoint(editorSettings['positionInSceneCoords'][0], editorSettings['positionInSceneCoords'][1])
                 shared.activeEditor.centerOn(shared.activeEditor.positionInSceneCoords.x(), shared.activeEditor.positionInSceneCoords.y())
@@ -183,4 +201,5 @@ def Load(path):
         if not os.path.exists(configPath):
             os.mkdir(configPath)
         (configPath / '.gitignore').write_text('# Store any custom YAML settings files in this folder.')
-        shared.workspace.assistant.PushMessage(f'No saved session found.')
\ No newline at end of file
+        shared.workspace.assistant.PushMessage(f'No saved session found.')
+        startup.Complete('Session loaded')
\ No newline at end of file
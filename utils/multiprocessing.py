@@ -1,18 +1,22 @@
 import gc # garbage collection
 import sys
+import time
+import importlib
 # from multiprocessing import Queue, Process, Event, Value
 # from threading import Event
 import aioca
 import asyncio
 import multiprocessing as mp
 from multiprocessing import Process
-from threading import Thread
+from threading import Thread, Lock
 mp.set_start_method('spawn', force = True) # force linux machines to call __getstate__ and __setstate__ methods attached to actions.
 from .. import shared
 
 # Dict of running actions -- key is the parent entity ID, value is list where idx 0 is pause event and index 1 is stop event.
 runningActions = dict()
 workers = dict()
+workerPool = None
+eventSyncPeriod = .05 # in seconds, how often a pooled worker's events are synced with the entity it is running for.
 
 # Max wait time for save before main thread override
 maxWait = .25 # in seconds
@@ -39,7 +43,9 @@ def StopAction(entity, restart = False):
             runningActions[entity.ID][1].set()
             if restart:
                 entity.resetApplied.set()
-            entity.actionFinished.set()
+            # only persistent actions wait on `actionFinished`, one-off actions started by `PerformAction` do not have it.
+            if hasattr(entity, 'actionFinished'):
+                entity.actionFinished.set()
         entity.title.setText(entity.name)
         gc.collect()
         return True
@@ -52,14 +58,109 @@ def StopActions():
     for ID in IDs:
         runningActions[ID][1].set()
 
-def PersistentWorkerProcess(pause, stop, error, sharedMemoryName, shape, action, pipe, **kwargs):
+def ActionProcess(pause, stop, error, sharedMemoryName, shape, dtype, action = None, **kwargs):
+    '''Runs a one-off `action`, either inside a pooled worker or its own process. Lives at module level so spawned processes can import it.'''
+    try:
+        action.Run(pause, stop, error, sharedMemoryName, shape, dtype, **kwargs)
+    except Exception as e:
+        error.set()
+        print('An error occurred inside an action process, here it is:', f'{e}')
+
+def PerformAction(entity, emptyArray, postProcessedDataName = None, emptyPostProcessedDataArray = None, **kwargs) -> bool:
+    '''Runs `entity.offlineAction` once in a worker borrowed from the app's `WorkerPool`, writing into a fresh shared `data` array shaped like `emptyArray`.\n
+    If `postProcessedDataName` is given a second shared array named after it is made from `emptyPostProcessedDataArray` and passed to the action.
+    The entity is marked ready once the action returns, or failed if it raised an error or was stopped. Returns False without starting anything if the entity is already running an action.'''
+    if entity.ID in runningActions:
+        return False
+    # the previous run's arrays are replaced, so release them first.
+    for attrName in ['data', postProcessedDataName]:
+        if attrName is not None and hasattr(entity, f'{attrName}SharedMemory'):
+            getattr(entity, f'{attrName}SharedMemory').unlink()
+    entity.CreateEmptySharedData(emptyArray)
+    if postProcessedDataName is not None:
+        entity.CreateEmptySharedData(emptyPostProcessedDataArray, attrName = postProcessedDataName)
+        postProcessed = getattr(entity, postProcessedDataName)
+        kwargs.update(
+            postProcessedSharedMemoryName = getattr(entity, f'{postProcessedDataName}SharedMemory').name,
+            postProcessedShape = postProcessed.shape,
+            postProcessedDType = postProcessed.dtype,
+        )
+    kwargs['action'] = entity.offlineAction
+    if kwargs.get('numWorkers', 1) > 1:
+        # pooled workers are daemonic and cannot start the action's own worker processes, so it gets a fresh process instead.
+        pool, ctx = None, mp.get_context('spawn')
+        pause, stop, error, progress = ctx.Event(), ctx.Event(), ctx.Event(), ctx.Value('d', 0.)
+        process = ctx.Process(target = ActionProcess, args = (pause, stop, error, entity.dataSharedMemory.name, entity.data.shape, entity.data.dtype), kwargs = dict(kwargs, progress = progress))
+        process.start()
+        Wait = process.join
+    else:
+        pool = GetWorkerPool()
+        worker = pool.Borrow()
+        # the worker's own events and progress are handed to the entity for the length of the run, so nothing needs relaying.
+        pause, stop, error, progress = worker.pause, worker.stop, worker.error, worker.progress
+        worker.pipe.send(('borrow', ActionProcess, entity.dataSharedMemory.name, entity.data.shape, dict(kwargs, reportProgress = True)))
+        worker.pipe.send(('run', entity.data.dtype))
+
+        def Wait():
+            while not worker.pipe.poll(eventSyncPeriod):
+                if not worker.process.is_alive():
+                    error.set()
+                    return
+            worker.pipe.recv()
+    runningActions[entity.ID] = [pause, stop, error, progress]
+    if hasattr(entity, 'runningCircle'):
+        entity.runningCircle.Start()
+        # imported here so headless runs, which also import this module, do not pull in Qt.
+        from . import completion
+        completion.WhenReady([entity], entity.runningCircle.Stop, onFailure = entity.runningCircle.Stop)
+
+    def Finish():
+        Wait()
+        # read before the worker is returned, which clears its events.
+        failed = error.is_set() or stop.is_set()
+        runningActions.pop(entity.ID, None)
+        if pool is not None:
+            pool.Return(worker)
+        # a failed or stopped run leaves partial data behind, so waiters are dropped rather than woken.
+        entity.MarkDataFailed() if failed else entity.MarkDataReady()
+    Thread(target = Finish, daemon = True).start()
+    return True
+
+# Modules imported by pooled workers before they are first borrowed, so actions skip the import cost.
+preloadModules = ['numpy', 'at', 'torch', 'xopt', f'{__package__.rsplit('.', 1)[0]}.simulator']
+
+def PooledWorkerProcess(pause, stop, error, progress, pipe, idleTimeout):
+    '''Long-lived worker owned by the `WorkerPool`. An action is attached when the worker is borrowed and dropped when it is returned.\n
+    `pause`, `stop` and `error` belong to this worker and mirror those of the borrowing entity while it is borrowed.
+    `progress` is passed to the action as a keyword if it was borrowed with `reportProgress`.
+    The worker exits if it is left idle for `idleTimeout` seconds.'''
+    for module in preloadModules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f'Pooled worker could not preload {module}: {e}')
+    action = None
     while True:
         try:
-            params = pipe.recv()
-            if params is None:
+            if action is None and not pipe.poll(idleTimeout):
                 break
-            result = action(pause, stop, error, sharedMemoryName, shape, params, **kwargs)
-            pipe.send(result)
+            message = pipe.recv()
+            if message is None:
+                break
+            if message[0] == 'borrow':
+                _, action, sharedMemoryName, shape, kwargs = message
+                if kwargs.pop('reportProgress', False):
+                    kwargs['progress'] = progress
+            elif message[0] == 'return':
+                action = None
+                gc.collect()
+            else:
+                try:
+                    result = action(pause, stop, error, sharedMemoryName, shape, message[1], **kwargs)
+                except Exception as e:
+                    print('An error occurred inside a pooled worker, here it is:', f'{e}')
+                    result = None
+                pipe.send(result)
         except:
             break
     try:
@@ -68,29 +169,139 @@ def PersistentWorkerProcess(pause, stop, error, sharedMemoryName, shape, action,
         pass
     sys.exit(0)
 
-def CreatePersistentWorkerProcess(entity, emptyArray, inQueue, outQueue, action, **kwargs):
-    '''`signals` should be a dict of QtCore Signals.'''
-    ctx = mp.get_context('spawn')
-    outPipe, inPipe = ctx.Pipe()
-    entity.CreateEmptySharedData(emptyArray)
-    Process(target = PersistentWorkerProcess, args = (*runningActions[entity.ID][:-1], entity.dataSharedMemory.name, emptyArray.shape, action, inPipe), kwargs = kwargs).start()
+class PooledWorker:
+    '''Handle on a pooled worker process held by the main process.'''
+    def __init__(self, ctx, idleTimeout):
+        self.pause, self.stop, self.error, self.progress = ctx.Event(), ctx.Event(), ctx.Event(), ctx.Value('d', 0.)
+        self.pipe, workerPipe = ctx.Pipe()
+        self.process = ctx.Process(target = PooledWorkerProcess, args = (self.pause, self.stop, self.error, self.progress, workerPipe, idleTimeout), daemon = True)
+        self.process.start()
+        self.lastReturned = time.time()
+
+    def SyncEvents(self, pause, stop, error):
+        '''Mirrors the pause and stop state of the borrowing entity into this worker, and any error raised by the worker back out.'''
+        self.pause.set() if pause.is_set() else self.pause.clear()
+        self.stop.set() if stop.is_set() else self.stop.clear()
+        if self.error.is_set():
+            error.set()
+
+class WorkerPool:
+    '''Pre-imported worker processes that actions borrow and return, so restarting a block does not pay for a fresh interpreter.\n
+    `size` workers are kept warm. Extra workers are spawned on demand when every warm worker is borrowed, and any worker idle for
+    longer than `idleTimeout` seconds exits.'''
+    def __init__(self, size, idleTimeout):
+        self.size = size
+        self.idleTimeout = idleTimeout
+        self.ctx = mp.get_context('spawn')
+        self.idle = []
+        self.lock = Lock()
+
+    def Start(self):
+        '''Tops the pool back up to `size` idle workers.'''
+        with self.lock:
+            self.Prune()
+            for _ in range(self.size - len(self.idle)):
+                self.idle.append(PooledWorker(self.ctx, self.idleTimeout))
+
+    def Prune(self):
+        # drop workers that have exited, or are about to, from their idle timeout.
+        self.idle = [w for w in self.idle if w.process.is_alive() and time.time() - w.lastReturned < self.idleTimeout - 1]
+
+    def Borrow(self) -> PooledWorker:
+        with self.lock:
+            self.Prune()
+            worker = self.idle.pop() if len(self.idle) > 0 else PooledWorker(self.ctx, self.idleTimeout)
+        Thread(target = self.Start, daemon = True).start() # replace the borrowed worker in the background.
+        return worker
+
+    def Return(self, worker: PooledWorker):
+        try:
+            worker.pipe.send(('return',))
+        except:
+            return
+        worker.pause.clear()
+        worker.stop.clear()
+        worker.error.clear()
+        worker.progress.value = 0.
+        worker.lastReturned = time.time()
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(worker)
+                return
+        try:
+            worker.pipe.send(None)
+        except:
+            pass
+
+    def Shutdown(self):
+        with self.lock:
+            for worker in self.idle:
+                try:
+                    worker.pipe.send(None)
+                except:
+                    pass
+            self.idle = []
+
+def GetWorkerPool() -> WorkerPool:
+    '''Returns the app's worker pool, creating it on first use from `shared.workerPoolSize` and `shared.workerPoolIdleTimeout`.'''
+    global workerPool
+    if workerPool is None:
+        workerPool = WorkerPool(shared.workerPoolSize, shared.workerPoolIdleTimeout)
+    return workerPool
+
+def CreatePersistentWorkerProcess(entity, emptyArray, inQueue, outQueue, action, attrName = 'data', **kwargs):
+    '''`signals` should be a dict of QtCore Signals.\n
+    `attrName` names the shared data array of this worker, so an entity can run several workers each with their own result slot.
+    The worker process is borrowed from the app's `WorkerPool` and returned once `None` is received on `inQueue`.'''
+    entity.CreateEmptySharedData(emptyArray, attrName = attrName)
+    pause, stop, error = runningActions[entity.ID][:3]
+    pool = GetWorkerPool()
+    worker = pool.Borrow()
+    worker.SyncEvents(pause, stop, error)
+    worker.pipe.send(('borrow', action, getattr(entity, f'{attrName}SharedMemory').name, emptyArray.shape, kwargs))
     while True:
         params = inQueue.get()
-        outPipe.send(params)
+        inQueue.task_done()
         if params is None:
             break
-        result = outPipe.recv()
+        worker.SyncEvents(pause, stop, error)
+        if attrName == 'data':
+            entity.dataReady.clear()
+        worker.pipe.send(('run', params))
+        # keep the worker's events in step with the entity while the action runs.
+        while not worker.pipe.poll(eventSyncPeriod):
+            worker.SyncEvents(pause, stop, error)
+            if not worker.process.is_alive():
+                break
+        result = worker.pipe.recv() if worker.process.is_alive() or worker.pipe.poll() else None
+        if attrName == 'data':
+            entity.MarkDataReady() # wake anything waiting on this result straight away.
         outQueue.put(result)
         try:
             runningActions[entity.ID][-1] += 1
         except:
             break
-    outPipe.close()
+    worker.SyncEvents(pause, stop, error)
+    pool.Return(worker)
     try:
         runningActions.pop(entity.ID)
     except:
         pass
 
+def StopPersistentWorkers(entity, inQueues, threads, attrNames = []):
+    '''Sends `None` to every persistent worker and waits for the `threads` running them to finish, so each pooled process is back in the pool.\n
+    The shared arrays named in `attrNames` are then released, as nothing can write to them any more.'''
+    for inQueue in inQueues:
+        inQueue.put(None)
+    for thread in threads:
+        thread.join()
+    for attrName in attrNames:
+        if hasattr(entity, f'{attrName}SharedMemory'):
+            delattr(entity, attrName)
+            getattr(entity, f'{attrName}SharedMemory').close()
+            getattr(entity, f'{attrName}SharedMemory').unlink()
+            delattr(entity, f'{attrName}SharedMemory')
+
 # def PersistentWorkerThread(pause, stop, error, action, inQueue, outQueue, loop, **kwargs):
 def PersistentWorkerThread(pause, stop, error, action, inQueue, outQueue, **kwargs):
     while True:
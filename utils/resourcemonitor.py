@@ -12,6 +12,10 @@ class ResourceMonitor(QThread):
         super().__init__()
         self.running = False
         self.stopEvent = Event()
+        self.hasGPU = False
+
+    def InitGPU(self):
+        '''NVML is initialised on the monitor thread so a slow driver query does not hold up start-up.'''
         try:
             nvmlInit()
             self.GPUHandle = nvmlDeviceGetHandleByIndex(0)
@@ -63,6 +67,7 @@ class ResourceMonitor(QThread):
             )
 
     def FetchResourceValues(self):
+        self.InitGPU()
         while True:
             self.PollGPU()
             self.PollRAM()
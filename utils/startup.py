@@ -0,0 +1,182 @@
+import sys
+import os
+import json
+import time
+import builtins
+import importlib
+from datetime import datetime
+from threading import Thread, Lock, current_thread
+
+'''
+Start-up timeline and deferred initialisation. The editor is made interactive first, heavy modules only needed
+by some blocks (e.g. the optimisation stack used by GP blocks) are imported in the background afterwards,
+and every phase is recorded so start-up regressions show up in the report printed once start-up is complete.
+Modules only needed once a figure is drawn or a lattice is loaded (matplotlib, pyat, pandas) are held as `Lazy` stand-ins.
+
+Run `python -m pipelines --profile-startup[=path]` to also time each top-level import and write the timeline as JSON.
+'''
+
+t0 = time.perf_counter()
+startedAt = datetime.now()
+lock = Lock()
+# list of (phase, start, end, thread name) in seconds since start-up.
+timeline = []
+# modules imported in the background once the editor is interactive, in order.
+deferredModules = ['torch', 'gpytorch', 'botorch', 'xopt']
+# module name -> function called once, the first time `Import` finds that module loaded, e.g. to apply settings.
+importHooks = dict()
+# start-up is complete, and the report is made, once every one of these stages has completed.
+pendingStages = {'Session loaded', 'Preload'}
+profileFlag = '--profile-startup'
+profiling = False
+reportPath = None
+originalImport = builtins.__import__
+
+def Elapsed() -> float:
+    return time.perf_counter() - t0
+
+class Phase:
+    '''Context manager recording how long the enclosed start-up phase takes, e.g. `with Phase('Load lattice'):`.'''
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = Elapsed()
+        return self
+
+    def __exit__(self, *args):
+        Record(self.name, self.start, Elapsed())
+
+def Record(name, start, end = None):
+    '''Adds a phase to the timeline. Without an `end` the phase is a single point in time.'''
+    with lock:
+        timeline.append((name, start, start if end is None else end, current_thread().name))
+
+def Mark(name):
+    Record(name, Elapsed())
+
+def Import(name):
+    '''Imports `name` on first use, recording the time taken in the timeline if it had not already been imported.\n
+    Runs the `importHooks` of any module that has been loaded by now.'''
+    start = Elapsed()
+    module = importlib.import_module(name)
+    end = Elapsed()
+    if end - start > 1e-3:
+        Record(f'Import {name}', start, end)
+    with lock:
+        hooks = [importHooks.pop(hookName) for hookName in list(importHooks) if hookName in sys.modules]
+    for hook in hooks:
+        hook()
+    return module
+
+class Lazy:
+    '''Stand-in for a heavy module, imported through `Import` the first time one of its attributes is used, e.g. `pd = startup.Lazy('pandas')`.'''
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = Import(self._name)
+        return getattr(self._module, attr)
+
+def Preload(modules = None):
+    '''Imports `modules` (`deferredModules` by default) on a background thread so they are ready by the time a block needs them.'''
+    def ImportAll():
+        for name in modules if modules is not None else deferredModules:
+            try:
+                Import(name)
+            except Exception as e:
+                print(f'Unable to preload {name}: {e}')
+        Complete('Preload')
+    Thread(target = ImportAll, daemon = True).start()
+
+def RunDeferred(func, *args, name = None):
+    '''Runs a blocking `func(*args)` on a background thread, recording it in the timeline. Results should be passed back to the UI with a signal.'''
+    def Run():
+        with Phase(name if name is not None else func.__name__):
+            func(*args)
+    Thread(target = Run, daemon = True).start()
+
+def Complete(stage):
+    '''Marks a start-up stage as complete, reporting the timeline once every stage in `pendingStages` has completed.'''
+    Mark(stage)
+    with lock:
+        if stage not in pendingStages:
+            return
+        pendingStages.discard(stage)
+        finished = len(pendingStages) == 0
+    if finished:
+        StopProfilingImports()
+        Report()
+
+def Report():
+    '''Prints the start-up timeline, ordered by when each phase started, and writes it to `reportPath` when profiling.'''
+    with lock:
+        phases = sorted(timeline, key = lambda phase: phase[1])
+    print('Start-up timeline (seconds since start-up):')
+    for name, start, end, _ in phases:
+        duration = f'{end - start:7.3f} s' if end > start else '      -  '
+        print(f'  {start:7.3f} -> {end:7.3f}  {duration}  {name}')
+    if profiling:
+        WriteReport(phases)
+
+def WriteReport(phases):
+    report = {
+        'startedAt': startedAt.isoformat(),
+        'totalSeconds': max((end for _, _, end, _ in phases), default = 0),
+        'phases': [
+            {
+                'name': name,
+                'start': start,
+                'end': end,
+                'duration': end - start,
+                'thread': thread,
+            }
+            for name, start, end, thread in phases
+        ],
+    }
+    try:
+        with open(reportPath, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print(f'Start-up profile written to {reportPath}')
+    except OSError as e:
+        print(f'Unable to write the start-up profile to {reportPath}: {e}')
+
+def ProfileImports():
+    '''Records every top-level import made from now on, i.e. not those made by a module while it is itself being imported.'''
+    depth = dict() # import nesting depth per thread.
+    def TimedImport(name, globals = None, locals = None, fromlist = (), level = 0):
+        thread = current_thread().name
+        if depth.get(thread, 0) > 0:
+            return originalImport(name, globals, locals, fromlist, level)
+        depth[thread] = 1
+        start = Elapsed()
+        try:
+            return originalImport(name, globals, locals, fromlist, level)
+        finally:
+            depth[thread] = 0
+            end = Elapsed()
+            if end - start > 1e-3: # skip modules that were already imported.
+                Record(f'Import {'.' * level}{name}', start, end)
+    builtins.__import__ = TimedImport
+
+def StopProfilingImports():
+    builtins.__import__ = originalImport
+
+def ParseArguments(args: list) -> list:
+    '''Handles `--profile-startup[=path]` and returns the remaining command line arguments.'''
+    global profiling, reportPath
+    remaining = []
+    for arg in args:
+        if arg == profileFlag or arg.startswith(f'{profileFlag}='):
+            profiling = True
+            reportPath = arg.split('=', 1)[1] if '=' in arg else os.path.join(os.getcwd(), f'startup-profile-{startedAt.strftime('%Y%m%d-%H%M%S')}.json')
+        else:
+            remaining.append(arg)
+    return remaining
+
+# parse as early as possible so imports made by the app itself can be profiled.
+if profileFlag in ' '.join(sys.argv):
+    sys.argv[1:] = ParseArguments(sys.argv[1:])
+    ProfileImports()
@@ -0,0 +1,48 @@
+import numpy as np
+from threading import Lock
+
+'''
+Incremental tracking of the best result of a run. Blocks feed every new evaluation to a `BestTracker` as it arrives, which keeps the best
+feasible value and the candidate that produced it, and the average of the most recent values in a fixed-size ring buffer. Each update
+costs the same however long the run is, so UI updates stay quick over thousands of evaluations.
+'''
+
+class BestTracker:
+    '''Best feasible value of a run and its candidate, plus a running average over the last `window` values.\n
+    `maximise` chooses whether larger or smaller values are better. NaN values are never the best and are ignored by the average.'''
+    def __init__(self, maximise = True, window = 5):
+        self.maximise = maximise
+        self.lock = Lock()
+        self.recent = np.full(max(int(window), 1), np.nan) # ring buffer of the most recent values.
+        self.Reset()
+
+    def Reset(self):
+        with self.lock:
+            self.best = None
+            self.bestCandidate = None
+            self.bestIndex = None
+            self.numUpdates = 0
+            self.recent[:] = np.nan
+
+    def Update(self, value, candidate = None, feasible = True) -> bool:
+        '''Records one evaluation, returning True if it is the new best. Infeasible evaluations count towards the average but can never be the best.'''
+        value = float(value)
+        with self.lock:
+            self.recent[self.numUpdates % len(self.recent)] = value
+            index = self.numUpdates
+            self.numUpdates += 1
+            if not feasible or np.isnan(value):
+                return False
+            if self.best is not None and (value <= self.best if self.maximise else value >= self.best):
+                return False
+            self.best = value
+            self.bestCandidate = None if candidate is None else np.array(candidate, dtype = float)
+            self.bestIndex = index
+            return True
+
+    @property
+    def average(self) -> float:
+        '''Average of the most recent values, NaN before any value has been recorded.'''
+        with self.lock:
+            recent = self.recent[~np.isnan(self.recent)]
+        return float(np.mean(recent)) if len(recent) > 0 else np.nan